@@ -1,29 +1,73 @@
+from dotenv import load_dotenv
+load_dotenv()  # ต้องมาก่อน import โมดูลที่อ่าน env ตอน import
+
 from flask import Flask
 from models import db
 from views_auth import auth_bp
 from views_main import main_bp
 from views_tasks import tasks_bp
 from utils import get_env
-from dotenv import load_dotenv
-
-load_dotenv()
+from summary import rebuild_summaries_command
+from migrations import schema_cli, upgrade
+from startup_profile import startup_profile_command
+from outbox import outbox_cli
+from passwords import password_bench_command
+from search import search_cli
+from rollups import rebuild_rollups_command
+from seed import seed_command
+from bench import bench_command
+from storage import storage_cli
+from archive import archive_cli
+from assets import assets_cli
+from coalesce import updates_cli
+import http_cache
+import assets
+import compression
+import fragments
+import profiling
+import replicas
 
 def create_app():
+    # factory ไม่มี side effect กับ DB/เครือข่าย -> ใช้กับ gunicorn --preload ได้
     app = Flask(__name__)
     app.config['SECRET_KEY'] = get_env('SECRET_KEY', 'dev-change-this')
     app.config['SQLALCHEMY_DATABASE_URI'] = get_env('DATABASE_URL', 'sqlite:///app.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_BINDS'] = replicas.binds()
+    # ให้ nginx/apache ส่งไฟล์แนบ local เอง (ต้องตั้ง X-Sendfile ที่ proxy ด้วย)
+    app.config['USE_X_SENDFILE'] = get_env('USE_X_SENDFILE', '0') == '1'
 
     db.init_app(app)
-    with app.app_context():
-        db.create_all()
+    compression.init_app(app)   # after_request ตัวแรก = ทำงานหลังสุด
+    assets.init_app(app)
+    replicas.init_app(app, db)
+    http_cache.init_app(app)
+    profiling.init_app(app)
+    fragments.init_app(app)
 
     app.register_blueprint(auth_bp)
     app.register_blueprint(main_bp)
     app.register_blueprint(tasks_bp)
+
+    app.cli.add_command(rebuild_summaries_command)
+    app.cli.add_command(schema_cli)
+    app.cli.add_command(startup_profile_command)
+    app.cli.add_command(outbox_cli)
+    app.cli.add_command(password_bench_command)
+    app.cli.add_command(search_cli)
+    app.cli.add_command(rebuild_rollups_command)
+    app.cli.add_command(seed_command)
+    app.cli.add_command(bench_command)
+    app.cli.add_command(storage_cli)
+    app.cli.add_command(archive_cli)
+    app.cli.add_command(assets_cli)
+    app.cli.add_command(updates_cli)
     return app
 
 app = create_app()
 
 if __name__ == "__main__":
+    # dev server: migrate ก่อนรัน (production รัน `flask --app app schema upgrade` ตอน deploy)
+    with app.app_context():
+        upgrade()
     app.run(debug=True)
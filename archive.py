@@ -0,0 +1,262 @@
+# archive.py
+# -*- coding: utf-8 -*-
+# Hot/cold: โปรเจกต์ที่งานเสร็จหมด (derive_project_status == 'done') และไม่มีใครแตะมา ARCHIVE_AFTER_DAYS วัน
+# ย้ายอัปเดต+ลิงก์ของแต่ละ task ออกจากตาราง hot ไปเป็นก้อน zlib(JSON) หนึ่งแถวต่อ task ใน TaskArchive
+# - TaskFile ยังอยู่ที่เดิม (เป็นบัญชีไฟล์ของ storage/outbox) แค่ task_update_id ย้ายไปจำใน archive
+# - หน้า feed / update_detail / search / sync / export อ่าน archive แทนเมื่อ Task.archived (แตกก้อนเมื่อถูกขอเท่านั้น)
+# - เขียนอะไรเพิ่มใน task (อัปเดต/สถานะ/% /แนบไฟล์) -> restore() คืนแถวกลับตาราง hot ด้วย id เดิมก่อน
+import json, zlib
+from datetime import datetime, timedelta
+import click
+from flask import g, has_request_context
+from flask.cli import with_appcontext
+from sqlalchemy import select, update, delete, exists, bindparam, inspect
+from sqlalchemy.orm.attributes import set_committed_value
+from models import db, Task, TaskUpdate, TaskUpdateLink, TaskFile, FileUpload, ProjectSummary, TaskArchive
+from utils import get_env
+
+ARCHIVE_AFTER_DAYS = int(get_env("ARCHIVE_AFTER_DAYS", 30))
+BATCH_TASKS = 50          # commit ทุกกี่ task (ไม่ถือ lock นาน)
+FORMAT_VERSION = 1
+
+def _iso(ts):
+    return ts.isoformat() if ts else None
+
+def _dt(raw):
+    return datetime.fromisoformat(raw) if raw else None
+
+def pack(entries):
+    doc = {"v": FORMAT_VERSION, "updates": entries}
+    return zlib.compress(json.dumps(doc, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 9)
+
+def unpack(data):
+    doc = json.loads(zlib.decompress(data).decode("utf-8"))
+    if doc.get("v") != FORMAT_VERSION:
+        raise ValueError(f"unknown archive format {doc.get('v')!r}")
+    return doc["updates"]
+
+# --- archive ---
+
+def done_projects(days=ARCHIVE_AFTER_DAYS):
+    # งานเสร็จหมด (ตัวนับใน ProjectSummary) และไม่มี task ไหนแก้หลัง cutoff; ยังมี task ที่ไม่ได้ archive
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    ps = ProjectSummary
+    recent = exists().where(Task.project_id == ps.project_id, Task.last_updated >= cutoff)
+    pending = exists().where(Task.project_id == ps.project_id, Task.archived.is_(False))
+    return db.session.execute(
+        select(ps.project_id)
+        .where(ps.done_count > 0, ps.todo_count == 0, ps.doing_count == 0, ps.blocked_count == 0,
+               ~recent, pending)
+        .order_by(ps.project_id)).scalars().all()
+
+def _lock_task(task_id):
+    # SELECT ... FOR UPDATE แถว task (Postgres): archive_task กับ write path ที่ ensure_hot ต้องรอกัน
+    # SQLite ไม่มี row lock (ทั้งไฟล์ล็อกตอนเขียนอยู่แล้ว) -> อ่านค่าปัจจุบันเฉย ๆ
+    q = select(Task.archived, Task.last_updated).where(Task.id == task_id)
+    if db.engine.dialect.name == 'postgresql':
+        q = q.with_for_update()
+    return db.session.execute(q).first()
+
+def archive_task(t, cutoff=None):
+    # ไม่ commit เอง; คืนจำนวนอัปเดตที่ย้าย หรือ None ถ้าข้าม:
+    # มีอัปโหลดค้างที่ชี้อัปเดตของ task นี้ หรือ task ถูกแก้หลัง cutoff ระหว่างที่ job กำลังไล่ (ล็อกแถวก่อนอ่าน)
+    cur = _lock_task(t.id)
+    if cur is None or cur.archived or (cutoff and cur.last_updated and cur.last_updated >= cutoff):
+        return None
+    update_ids = select(TaskUpdate.id).where(TaskUpdate.task_id == t.id)
+    if db.session.execute(select(FileUpload.id).where(FileUpload.task_update_id.in_(update_ids)).limit(1)).first():
+        return None
+    links, files = {}, {}
+    for l in db.session.execute(select(TaskUpdateLink).where(TaskUpdateLink.task_update_id.in_(update_ids))
+                                .order_by(TaskUpdateLink.id)).scalars():
+        links.setdefault(l.task_update_id, []).append(
+            {"id": l.id, "title": l.title, "url": l.url, "created_at": _iso(l.created_at)})
+    for fid, uid in db.session.execute(select(TaskFile.id, TaskFile.task_update_id)
+                                       .where(TaskFile.task_update_id.in_(update_ids))):
+        files.setdefault(uid, []).append(fid)
+    entries = [
+        {"id": u.id, "author_id": u.author_id, "content": u.content, "status": u.status,
+         "progress_percent": u.progress_percent, "created_at": _iso(u.created_at), "edited_at": _iso(u.edited_at),
+         "links": links.get(u.id, []), "files": files.get(u.id, [])}
+        for u in db.session.execute(select(TaskUpdate).where(TaskUpdate.task_id == t.id)
+                                    .order_by(TaskUpdate.created_at, TaskUpdate.id)).scalars()
+    ]
+    ids = [e["id"] for e in entries]
+    db.session.add(TaskArchive(
+        task_id=t.id, project_id=t.project_id, update_count=len(entries),
+        min_update_id=min(ids, default=None), max_update_id=max(ids, default=None),
+        first_at=_dt(entries[0]["created_at"]) if entries else None,
+        last_at=_dt(entries[-1]["created_at"]) if entries else None,
+        data=pack(entries)))
+    if ids:
+        db.session.execute(update(TaskFile).where(TaskFile.task_update_id.in_(ids))
+                           .values(task_update_id=None).execution_options(synchronize_session=False))
+        db.session.execute(delete(TaskUpdateLink).where(TaskUpdateLink.task_update_id.in_(ids))
+                           .execution_options(synchronize_session=False))
+        # ลบเฉพาะแถวที่อยู่ในก้อนแล้วเท่านั้น
+        db.session.execute(delete(TaskUpdate).where(TaskUpdate.id.in_(ids))
+                           .execution_options(synchronize_session=False))
+    t.archived = True
+    return len(entries)
+
+def archive_projects(days=ARCHIVE_AFTER_DAYS, project_ids=None, echo=None):
+    result = {"projects": 0, "tasks": 0, "updates": 0, "skipped": 0}
+    cutoff = datetime.utcnow() - timedelta(days=days) if project_ids is None else None
+    for pid in (done_projects(days) if project_ids is None else project_ids):
+        tasks = Task.query.filter(Task.project_id == pid, Task.archived.is_(False)).order_by(Task.id).all()
+        for n, t in enumerate(tasks, start=1):
+            moved = archive_task(t, cutoff)
+            if moved is None:
+                result["skipped"] += 1
+            else:
+                result["tasks"] += 1
+                result["updates"] += moved
+            if n % BATCH_TASKS == 0:
+                db.session.commit()
+        db.session.commit()
+        result["projects"] += 1
+        if echo:
+            echo(f"project {pid}: archived {len(tasks)} task(s)")
+    return result
+
+# --- restore (task ถูกเปิดกลับมาแก้) ---
+
+def restore(t):
+    # ไม่ commit เอง: อยู่ transaction เดียวกับการเขียนที่ทำให้ต้อง restore
+    arc = db.session.get(TaskArchive, t.id)
+    if arc is not None:
+        entries = unpack(arc.data)
+        if entries:
+            db.session.execute(TaskUpdate.__table__.insert(), [
+                {"id": e["id"], "task_id": t.id, "author_id": e["author_id"], "content": e["content"],
+                 "status": e["status"], "progress_percent": e["progress_percent"], "created_at": _dt(e["created_at"]),
+                 "edited_at": _dt(e.get("edited_at"))}
+                for e in entries])
+            links = [{"id": l["id"], "task_update_id": e["id"], "title": l["title"], "url": l["url"],
+                      "created_at": _dt(l["created_at"])} for e in entries for l in e["links"]]
+            if links:
+                db.session.execute(TaskUpdateLink.__table__.insert(), links)
+            moved = [{"fid": fid, "uid": e["id"]} for e in entries for fid in e["files"]]
+            if moved:
+                # ไฟล์ที่ถูกลบไประหว่าง archive จะไม่เจอแถว (ไม่เป็นไร)
+                tf = TaskFile.__table__
+                db.session.execute(tf.update().where(tf.c.id == bindparam("fid"))
+                                   .values(task_update_id=bindparam("uid")), moved)
+        db.session.delete(arc)
+    t.archived = False
+    _forget(t.id)
+
+def ensure_hot(t):
+    # Postgres: ล็อกแถวแล้วอ่าน archived ใหม่ (job อาจ archive ไปหลังจาก request นี้โหลด t มา)
+    if db.engine.dialect.name == 'postgresql':
+        cur = _lock_task(t.id)
+        if cur is not None and cur.archived and not t.archived:
+            set_committed_value(t, "archived", True)
+    if t.archived:
+        restore(t)
+
+# --- read ---
+
+def _memo():
+    # แตกก้อนครั้งเดียวต่อ request
+    return g.setdefault("_task_archives", {}) if has_request_context() else {}
+
+def _forget(task_id):
+    _memo().pop(task_id, None)
+
+def entries(task_ids):
+    # {task_id: [entry ... เรียงเก่า -> ใหม่]} เฉพาะ task ที่มี archive
+    memo = _memo()
+    todo = [tid for tid in task_ids if tid not in memo]
+    if todo:
+        for tid, data in db.session.execute(select(TaskArchive.task_id, TaskArchive.data)
+                                            .where(TaskArchive.task_id.in_(todo))):
+            memo[tid] = unpack(data)
+    return {tid: memo[tid] for tid in task_ids if tid in memo}
+
+def to_update(task_id, e):
+    # object ชั่วคราว (ไม่ผูก session) ให้ template ใช้แบบเดียวกับแถวจริง
+    return TaskUpdate(id=e["id"], task_id=task_id, author_id=e["author_id"], content=e["content"],
+                      status=e["status"], progress_percent=e["progress_percent"], created_at=_dt(e["created_at"]),
+                      edited_at=_dt(e.get("edited_at")))
+
+def to_links(e):
+    return [TaskUpdateLink(id=l["id"], task_update_id=e["id"], title=l["title"], url=l["url"],
+                           created_at=_dt(l["created_at"])) for l in e["links"]]
+
+def page(task_id, cursor=None, limit=20):
+    # เหมือน keyset (created_at, id) desc ของ feed แต่เดินใน archive; คืน [entry], มีหน้าถัดไปไหม
+    items = entries([task_id]).get(task_id, [])
+    rows = []
+    for e in reversed(items):
+        if cursor and (_dt(e["created_at"]), e["id"]) >= cursor:
+            continue
+        rows.append(e)
+        if len(rows) > limit:
+            break
+    return rows[:limit], len(rows) > limit
+
+def archived_file_ids(task_id):
+    return {fid for e in entries([task_id]).get(task_id, []) for fid in e["files"]}
+
+def find_updates(update_ids):
+    # {update_id: (task_id, entry)} จาก archive ที่ช่วง id ครอบคลุม (update_detail, sync)
+    wanted = set(update_ids)
+    if not wanted:
+        return {}
+    lo, hi = min(wanted), max(wanted)
+    task_ids = db.session.execute(
+        select(TaskArchive.task_id).where(TaskArchive.min_update_id <= hi, TaskArchive.max_update_id >= lo)
+    ).scalars().all()
+    out = {}
+    for tid, items in entries(task_ids).items():
+        for e in items:
+            if e["id"] in wanted:
+                out[e["id"]] = (tid, e)
+    return out
+
+def available(conn):
+    # backfill ของ migration ก่อนหน้า 8 (search / rollups) รันบน schema ที่ยังไม่มี archive
+    insp = inspect(conn)
+    return insp.has_table(TaskArchive.__tablename__) and "archived" in {c["name"] for c in insp.get_columns("task")}
+
+def iter_entries(conn, project_id=None):
+    # (task_id, project_id, entry) ทีละ archive สำหรับงาน rebuild (search / rollups)
+    if not available(conn):
+        return
+    stmt = select(TaskArchive.task_id, TaskArchive.project_id, TaskArchive.data).order_by(TaskArchive.task_id)
+    if project_id is not None:
+        stmt = stmt.where(TaskArchive.project_id == project_id)
+    for tid, pid, data in conn.execute(stmt.execution_options(yield_per=100)):
+        for e in unpack(data):
+            yield tid, pid, e
+
+# --- CLI ---
+
+@click.group('archive')
+def archive_cli():
+    """ย้ายประวัติของโปรเจกต์ที่เสร็จแล้วไปเก็บแบบบีบอัด"""
+
+@archive_cli.command('run')
+@click.option('--days', default=ARCHIVE_AFTER_DAYS, show_default=True, help="เสร็จและไม่มีใครแตะมากี่วัน")
+@click.option('--dry-run', is_flag=True, help="แสดงโปรเจกต์ที่เข้าเกณฑ์เท่านั้น")
+@with_appcontext
+def run_command(days, dry_run):
+    if dry_run:
+        for pid in done_projects(days):
+            click.echo(f"would archive project {pid}")
+        return
+    r = archive_projects(days, echo=click.echo)
+    click.echo(f"archived {r['updates']} update(s) from {r['tasks']} task(s) in {r['projects']} project(s)"
+               + (f"; skipped {r['skipped']} task(s) with uploads in progress or edited meanwhile"
+                  if r['skipped'] else ""))
+
+@archive_cli.command('restore')
+@click.argument('project_id', type=int)
+@with_appcontext
+def restore_command(project_id):
+    tasks = Task.query.filter(Task.project_id == project_id, Task.archived.is_(True)).all()
+    for t in tasks:
+        restore(t)
+    db.session.commit()
+    click.echo(f"restored {len(tasks)} task(s)")
@@ -0,0 +1,116 @@
+# assets.py
+# -*- coding: utf-8 -*-
+# Static asset ที่มี hash ของเนื้อไฟล์ในชื่อ -> cache ได้ตลอด (immutable) เปลี่ยนไฟล์ = เปลี่ยน URL เอง
+# build ครั้งเดียวตอน deploy: `flask --app app assets build`
+#   static/theme.css -> static/dist/theme.<hash>.css (+ .gz, + .br ถ้ามี brotli) และ static/dist/manifest.json
+# url_for('static', filename='theme.css') ถูกเปลี่ยนเป็นชื่อใน manifest อัตโนมัติ; ยังไม่ build = ใช้ไฟล์เดิมตามปกติ
+import hashlib, json, mimetypes, os, shutil
+import click
+from flask import current_app, request, send_from_directory
+from flask.cli import with_appcontext
+import compression
+
+DIST = "dist"
+MANIFEST = "manifest.json"
+HASH_LENGTH = 10
+IMMUTABLE = "public, max-age=31536000, immutable"
+_SUFFIX = {"br": ".br", "gzip": ".gz"}
+
+def _dist_root(app):
+    return os.path.join(app.static_folder, DIST)
+
+def _sources(static_root):
+    dist = os.path.join(static_root, DIST)
+    for dirpath, dirs, files in os.walk(static_root):
+        dirs[:] = sorted(d for d in dirs if os.path.join(dirpath, d) != dist)
+        for name in sorted(files):
+            yield os.path.relpath(os.path.join(dirpath, name), static_root).replace(os.sep, "/")
+
+def hashed_name(rel, data):
+    base, ext = os.path.splitext(rel)
+    return f"{base}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{ext}"
+
+def build(app, echo=None):
+    # สร้าง dist ใหม่ทั้งก้อน (ไฟล์ชื่อเดิมเนื้อเดิม = hash เดิม URL เดิม cache ของ browser ยังใช้ได้)
+    root = _dist_root(app)
+    shutil.rmtree(root, ignore_errors=True)
+    manifest = {}
+    for rel in _sources(app.static_folder):
+        with open(os.path.join(app.static_folder, rel), "rb") as fh:
+            data = fh.read()
+        out_rel = hashed_name(rel, data)
+        out = os.path.join(root, out_rel)
+        os.makedirs(os.path.dirname(out), exist_ok=True)
+        with open(out, "wb") as fh:
+            fh.write(data)
+        variants = []
+        if mimetypes.guess_type(rel)[0] in compression.MIMETYPES and len(data) >= compression.MIN_SIZE:
+            for enc in compression.encodings():
+                # บีบแรงสุดครั้งเดียวตอน build (ต่อ request ไม่ต้องบีบอีก)
+                body = compression.compress(data, enc, gzip_level=9, brotli_quality=11)
+                if len(body) < len(data):
+                    with open(out + _SUFFIX[enc], "wb") as fh:
+                        fh.write(body)
+                    variants.append(f"{enc} {len(body)}")
+        manifest[rel] = f"{DIST}/{out_rel}"
+        if echo:
+            echo(f"{rel} -> {manifest[rel]} ({len(data)} bytes{', ' if variants else ''}{', '.join(variants)})")
+    with open(os.path.join(root, MANIFEST), "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, indent=2, sort_keys=True)
+    return manifest
+
+def load_manifest(app):
+    try:
+        with open(os.path.join(_dist_root(app), MANIFEST), encoding="utf-8") as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return {}
+
+def manifest_digest(app):
+    # ใส่ใน ETag ของหน้า: build asset ใหม่ = URL ในหน้าเปลี่ยน
+    return hashlib.sha1(json.dumps(app.extensions.get("assets", {}), sort_keys=True).encode()).hexdigest()[:12]
+
+def _serve(filename):
+    app = current_app
+    hashed = set(app.extensions.get("assets", {}).values())
+    if filename not in hashed:
+        return app.send_static_file(filename)
+    mimetype = mimetypes.guess_type(filename)[0]
+    # ไฟล์ .br ที่ build ไว้ส่งได้แม้เครื่องนี้ไม่มีแพ็กเกจ brotli
+    offered = [enc for enc in _SUFFIX
+               if os.path.exists(os.path.join(app.static_folder, filename + _SUFFIX[enc]))]
+    enc = compression.choose(request.accept_encodings, offered) if offered else None
+    if enc is not None:
+        resp = send_from_directory(app.static_folder, filename + _SUFFIX[enc], mimetype=mimetype)
+        resp.headers["Content-Encoding"] = enc
+    else:
+        resp = app.send_static_file(filename)
+    if offered:
+        resp.vary.add("Accept-Encoding")
+    resp.headers["Cache-Control"] = IMMUTABLE
+    return resp
+
+def init_app(app):
+    app.extensions["assets"] = load_manifest(app)
+
+    @app.url_defaults
+    def _fingerprint(endpoint, values):
+        if endpoint == "static":
+            hashed = app.extensions["assets"].get(values.get("filename"))
+            if hashed:
+                values["filename"] = hashed
+
+    app.view_functions["static"] = _serve
+
+# --- CLI ---
+
+@click.group('assets')
+def assets_cli():
+    """Static asset ที่มี hash ในชื่อไฟล์"""
+
+@assets_cli.command('build')
+@with_appcontext
+def build_command():
+    manifest = build(current_app, echo=click.echo)
+    current_app.extensions["assets"] = manifest
+    click.echo(f"built {len(manifest)} asset(s) into static/{DIST}/")
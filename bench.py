@@ -0,0 +1,263 @@
+# bench.py
+# -*- coding: utf-8 -*-
+# วัด latency (p50/p95/p99), throughput และจำนวน SQL ต่อ request ของ route หลัก
+# ในโปรเซส (Flask test client, นับ SQL ได้) หรือยิง gunicorn ที่รันอยู่ด้วย --url (นับ SQL ไม่ได้)
+# ใช้กับ DB จาก seed.py: `flask --app app bench --save benchmarks/baseline.json`
+#                       `flask --app app bench --compare benchmarks/baseline.json`
+# route POST เขียนลง DB จริง -> seed DB ใหม่ก่อนวัดทุกครั้งเพื่อให้เทียบกับ baseline ได้ตรง
+import json, math, os, subprocess, threading, time
+import urllib.error, urllib.parse, urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import event, func
+from models import db, User, Project, ProjectMember, Task, TaskUpdate, TaskUpdateLink, TaskFile
+from seed import SEED_PASSWORD
+
+# (ชื่อ, method, path template, body) — {pid}/{tid} เวียนไปตามงานในโปรเจกต์ที่ใช้วัด
+ROUTES = [
+    ("projects", "GET", "/projects", None),
+    ("project_detail", "GET", "/projects/{pid}", None),
+    ("task_feed", "GET", "/tasks/{tid}", None),
+    ("task_feed_page", "GET", "/tasks/{tid}/updates", None),
+    ("burnup", "GET", "/projects/{pid}/burnup.json", None),
+    ("create_update", "POST", "/tasks/{tid}/updates",
+     {"content": "bench update", "progress_percent": "{n}", "status": "doing"}),
+    ("change_status", "POST", "/tasks/{tid}/status", {"status": "doing"}),
+    ("change_progress", "POST", "/tasks/{tid}/progress", {"progress": "{n}"}),
+    ("bulk_update", "POST", "/tasks/bulk", "bulk"),
+    ("create_task", "POST", "/projects/{pid}/tasks/create", {"title": "bench task"}),
+]
+BULK_SIZE = 20
+
+# --- ตัวนับ SQL ต่อ thread ---
+
+_local = threading.local()
+
+def _count_query(*_args, **_kw):
+    _local.queries = getattr(_local, "queries", 0) + 1
+
+def _percentile(sorted_values, p):
+    # nearest-rank
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, math.ceil(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+# --- ตัวส่ง request: test client หรือ HTTP จริง ---
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+class _TestClientTransport:
+    counts_queries = True
+
+    def __init__(self, app):
+        self.app = app
+        self._clients = threading.local()
+
+    def _client(self):
+        c = getattr(self._clients, "c", None)
+        if c is None:
+            c = self._clients.c = self.app.test_client(use_cookies=False)
+        return c
+
+    def request(self, method, path, cookie=None, form=None, json_body=None):
+        headers = {"Cookie": cookie} if cookie else {}
+        resp = self._client().open(path, method=method, headers=headers, data=form, json=json_body)
+        return resp.status_code, resp.headers.getlist("Set-Cookie")
+
+class _HttpTransport:
+    counts_queries = False
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+        self._opener = urllib.request.build_opener(_NoRedirect)
+
+    def request(self, method, path, cookie=None, form=None, json_body=None):
+        headers, data = {}, None
+        if cookie:
+            headers["Cookie"] = cookie
+        if json_body is not None:
+            data, headers["Content-Type"] = json.dumps(json_body).encode(), "application/json"
+        elif form is not None:
+            data = urllib.parse.urlencode(form).encode()
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        req = urllib.request.Request(self.base_url + path, data=data, headers=headers, method=method)
+        try:
+            with self._opener.open(req) as resp:
+                resp.read()
+                return resp.status, resp.headers.get_all("Set-Cookie") or []
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code, e.headers.get_all("Set-Cookie") or []
+
+def _login(transport, username, password):
+    # เก็บ cookie จาก login ครั้งเดียวแล้วส่งซ้ำทุก request (ไม่รับ cookie ใหม่ -> flash ไม่สะสม)
+    status, cookies = transport.request("POST", "/auth/login", form={"username": username, "password": password})
+    session = next((c.split(";", 1)[0] for c in cookies if c.startswith("session=")), None)
+    if status != 302 or not session:
+        raise click.ClickException(f"login as {username} failed (status {status})")
+    return session
+
+# --- วัด ---
+
+def _target(username):
+    # โปรเจกต์ที่ผู้ใช้เป็น owner และมีงานมากที่สุด + รายการงานในโปรเจกต์นั้น
+    u = User.query.filter_by(username=username).first()
+    if u is None:
+        raise click.ClickException(f"user {username} not found; run `flask seed` first")
+    row = (db.session.query(ProjectMember.project_id, func.count(Task.id))
+           .join(Task, Task.project_id == ProjectMember.project_id)
+           .filter(ProjectMember.user_id == u.id, ProjectMember.role == "owner")
+           .group_by(ProjectMember.project_id).order_by(func.count(Task.id).desc()).first())
+    if row is None:
+        raise click.ClickException(f"{username} owns no project with tasks")
+    task_ids = [r[0] for r in db.session.query(Task.id).filter_by(project_id=row[0]).order_by(Task.id)]
+    db.session.remove()
+    return row[0], task_ids
+
+def _fill(value, **kw):
+    if isinstance(value, dict):
+        return {k: v.format(**kw) for k, v in value.items()}
+    return value
+
+def run_route(transport, cookie, route, pid, task_ids, requests, warmup, concurrency):
+    name, method, path, body = route
+    counter = iter(range(10 ** 9))
+    lock = threading.Lock()
+
+    def one(_i):
+        with lock:
+            n = next(counter)
+        tid = task_ids[n % len(task_ids)]
+        url = path.format(pid=pid, tid=tid)
+        form = json_body = None
+        if body == "bulk":
+            ids = [task_ids[(n * BULK_SIZE + k) % len(task_ids)] for k in range(BULK_SIZE)]
+            json_body = {"tasks": [{"id": t, "progress": (n + k) % 101} for k, t in enumerate(ids)]}
+        elif body is not None:
+            form = _fill(body, n=n % 101)
+        _local.queries = 0
+        started = time.perf_counter()
+        status, _cookies = transport.request(method, url, cookie=cookie, form=form, json_body=json_body)
+        return time.perf_counter() - started, _local.queries, status
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(warmup)))
+        wall = time.perf_counter()
+        samples = list(pool.map(one, range(requests)))
+        wall = time.perf_counter() - wall
+
+    latencies = sorted(s[0] * 1000 for s in samples)
+    errors = sum(1 for s in samples if s[2] >= 400)
+    result = {
+        "method": method, "path": path, "requests": requests,
+        "p50_ms": round(_percentile(latencies, 50), 2),
+        "p95_ms": round(_percentile(latencies, 95), 2),
+        "p99_ms": round(_percentile(latencies, 99), 2),
+        "mean_ms": round(sum(latencies) / len(latencies), 2),
+        "rps": round(requests / wall, 1),
+        "errors": errors,
+    }
+    if transport.counts_queries:
+        result["queries"] = round(sum(s[1] for s in samples) / len(samples), 2)
+    return result
+
+def dataset_counts():
+    return {m.__tablename__: db.session.query(func.count(m.id)).scalar()
+            for m in (User, Project, ProjectMember, Task, TaskUpdate, TaskUpdateLink, TaskFile)}
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def run(transport, username, requests, warmup, concurrency, only=(), echo=print):
+    pid, task_ids = _target(username)
+    cookie = _login(transport, username, SEED_PASSWORD)
+    dataset = dataset_counts()   # ก่อน POST จะเพิ่มแถว
+    db.session.remove()
+    routes = {}
+    for route in ROUTES:
+        if only and route[0] not in only:
+            continue
+        routes[route[0]] = r = run_route(transport, cookie, route, pid, task_ids, requests, warmup, concurrency)
+        echo(_format_row(route[0], r))
+    return {
+        "meta": {"commit": _git_commit(), "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+                 "mode": "http" if isinstance(transport, _HttpTransport) else "test_client",
+                 "database": db.engine.dialect.name, "requests": requests, "concurrency": concurrency,
+                 "project_id": pid, "dataset": dataset},
+        "routes": routes,
+    }
+
+# --- รายงาน / เทียบ baseline ---
+
+def _format_row(name, r):
+    q = f"{r['queries']:7.1f}" if "queries" in r else "      -"
+    return (f"{name:16} p50 {r['p50_ms']:8.2f}  p95 {r['p95_ms']:8.2f}  p99 {r['p99_ms']:8.2f} ms"
+            f"  {r['rps']:7.1f} req/s  sql {q}  err {r['errors']}")
+
+def compare(baseline, current, threshold=0.2, echo=print):
+    # regression = p95 ช้าลงเกิน threshold หรือ SQL ต่อ request เพิ่ม; คืนรายชื่อ route ที่แย่ลง
+    for key in ("dataset", "mode", "database", "concurrency"):
+        if baseline["meta"].get(key) != current["meta"].get(key):
+            echo(f"warning: {key} differs from baseline; latency comparison is approximate")
+    worse = []
+    for name, cur in current["routes"].items():
+        base = baseline["routes"].get(name)
+        if base is None:
+            echo(f"{name:16} (new)")
+            continue
+        p95 = (cur["p95_ms"] - base["p95_ms"]) / base["p95_ms"] if base["p95_ms"] else 0.0
+        q_base, q_cur = base.get("queries"), cur.get("queries")
+        more_sql = q_base is not None and q_cur is not None and q_cur > q_base + 0.5
+        bad = p95 > threshold or more_sql
+        sql = f"  sql {q_base} -> {q_cur}" if q_base is not None and q_cur is not None else ""
+        echo(f"{name:16} p95 {base['p95_ms']:8.2f} -> {cur['p95_ms']:8.2f} ms ({p95:+.0%}){sql}"
+             f"{'  REGRESSION' if bad else ''}")
+        if bad:
+            worse.append(name)
+    return worse
+
+@click.command('bench')
+@click.option('--requests', 'n_requests', default=200, show_default=True, help="ต่อ route")
+@click.option('--warmup', default=20, show_default=True)
+@click.option('--concurrency', default=1, show_default=True)
+@click.option('--route', 'only', multiple=True, help="เฉพาะ route นี้ (ซ้ำได้)")
+@click.option('--url', default=None, help="ยิง server ที่รันอยู่ เช่น http://127.0.0.1:8000 (ไม่นับ SQL)")
+@click.option('--user', 'username', default="user00001", show_default=True)
+@click.option('--save', 'save_path', type=click.Path(dir_okay=False), default=None, help="เขียนผลเป็น JSON")
+@click.option('--compare', 'compare_path', type=click.Path(exists=True, dir_okay=False), default=None)
+@click.option('--threshold', default=0.2, show_default=True, help="p95 ช้าลงได้ไม่เกิน (0.2 = 20%)")
+@with_appcontext
+def bench_command(n_requests, warmup, concurrency, only, url, username, save_path, compare_path, threshold):
+    """Benchmark route หลักกับข้อมูลจาก `flask seed` (POST จะเขียนลง DB จริง)"""
+    if url:
+        transport = _HttpTransport(url)
+    else:
+        transport = _TestClientTransport(current_app._get_current_object())
+        event.listen(db.engine, "before_cursor_execute", _count_query)
+    try:
+        result = run(transport, username, n_requests, warmup, concurrency, only, echo=click.echo)
+    finally:
+        if not url:
+            event.remove(db.engine, "before_cursor_execute", _count_query)
+    if save_path:
+        os.makedirs(os.path.dirname(os.path.abspath(save_path)), exist_ok=True)
+        with open(save_path, "w", encoding="utf-8") as fh:
+            json.dump(result, fh, indent=2, sort_keys=True)
+            fh.write("\n")
+        click.echo(f"saved {save_path}")
+    if compare_path:
+        with open(compare_path, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        worse = compare(baseline, result, threshold, echo=click.echo)
+        if worse:
+            raise SystemExit(1)
@@ -0,0 +1,162 @@
+# coalesce.py
+# -*- coding: utf-8 -*-
+# รวมอัปเดตที่ระบบเขียนเอง (เปลี่ยนสถานะ / ปรับ %) ที่ถูกกดรัว ๆ ให้เหลือแถวเดียว
+# เงื่อนไข: แถวล่าสุดของ task เป็นอัปเดตอัตโนมัติของคนเดียวกัน ห่างจากครั้งก่อนไม่เกิน UPDATE_COALESCE_SECONDS
+#   และไม่มีลิงก์/ไฟล์/อัปโหลดผูกอยู่ -> แก้แถวเดิม (สถานะ/% ล่าสุด) แทนการเพิ่มแถว
+# created_at ของแถวที่ถูกรวมไม่ขยับ (feed ใช้ (created_at, id) เป็น cursor) เวลาที่แก้ไปอยู่ใน edited_at
+# โพสต์ที่คนเขียนเอง (create_update) ไม่ถูกรวม; `flask updates compact` ทำแบบเดียวกันย้อนหลัง
+from datetime import datetime, timedelta
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import select, func, union_all, bindparam
+from models import db, Task, TaskUpdate, TaskUpdateLink, TaskFile, FileUpload
+from utils import get_env
+import search
+import sync
+
+WINDOW_SECONDS = int(get_env("UPDATE_COALESCE_SECONDS", 120))    # 0 = ปิด (เพิ่มแถวทุกครั้งแบบเดิม)
+BATCH_TASKS = 200         # compact: commit ทุกกี่ task
+
+def content_for(status, progress):
+    # ข้อความเดียวกับที่ change_status / change_progress / bulk เขียน
+    parts = []
+    if status is not None:
+        parts.append(f"เปลี่ยนสถานะเป็น {status}")
+    if progress is not None:
+        parts.append(f"อัปเดตความคืบหน้าเป็น {progress}%")
+    return " • ".join(parts)
+
+def touched_at(row):
+    # เวลาเขียนครั้งล่าสุดของแถว (ใช้วัดช่วงรวม)
+    return row.edited_at or row.created_at
+
+def is_system(content, status, progress):
+    # แถวเก่าไม่มีธง: ข้อความตรงกับที่ระบบสร้างจากค่าในแถวเอง = อัปเดตอัตโนมัติ
+    return (status is not None or progress is not None) and content == content_for(status, progress)
+
+def _attached(update_ids):
+    # แถวที่มีลิงก์/ไฟล์/อัปโหลดค้างชี้อยู่ ห้ามแก้หรือลบ
+    if not update_ids:
+        return set()
+    return set(db.session.execute(union_all(
+        select(TaskUpdateLink.task_update_id).where(TaskUpdateLink.task_update_id.in_(update_ids)),
+        select(TaskFile.task_update_id).where(TaskFile.task_update_id.in_(update_ids)),
+        select(FileUpload.task_update_id).where(FileUpload.task_update_id.in_(update_ids)),
+    )).scalars())
+
+# --- write path ---
+
+def write(t, author_id, status=None, progress=None, now=None, window=None):
+    # คืน (TaskUpdate, merged); ไม่ commit เอง (task ต้อง ensure_hot มาก่อน)
+    now = now or datetime.utcnow()
+    window = WINDOW_SECONDS if window is None else window
+    if window > 0:
+        last = (TaskUpdate.query.filter(TaskUpdate.task_id == t.id)
+                .order_by(TaskUpdate.created_at.desc(), TaskUpdate.id.desc()).first())
+        if (last is not None and last.author_id == author_id
+                and touched_at(last) >= now - timedelta(seconds=window)
+                and is_system(last.content, last.status, last.progress_percent)
+                and not _attached([last.id])):
+            if status is not None:
+                last.status = status
+            if progress is not None:
+                last.progress_percent = progress
+            last.content = content_for(last.status, last.progress_percent)
+            last.edited_at = now
+            db.session.flush()
+            return last, True
+    upd = TaskUpdate(task_id=t.id, author_id=author_id, content=content_for(status, progress),
+                     status=status, progress_percent=progress, created_at=now)
+    db.session.add(upd)
+    db.session.flush()
+    return upd, False
+
+# --- compaction ย้อนหลัง ---
+
+def _runs(rows, window, attached):
+    # rows เรียง (created_at, id) ของ task เดียว -> [[row ...]] ช่วงที่รวมได้ (ยาว > 1)
+    gap = timedelta(seconds=window)
+    runs, cur = [], []
+    for r in rows:
+        ok = r.id not in attached and is_system(r.content, r.status, r.progress_percent)
+        if ok and cur and r.author_id == cur[-1].author_id and r.created_at - touched_at(cur[-1]) <= gap:
+            cur.append(r)
+            continue
+        if len(cur) > 1:
+            runs.append(cur)
+        cur = [r] if ok else []
+    if len(cur) > 1:
+        runs.append(cur)
+    return runs
+
+def compact_task(t, window=WINDOW_SECONDS):
+    # ไม่ commit เอง; แถวแรกของแต่ละช่วงเก็บค่าสุดท้าย (created_at เดิม, edited_at = เวลาล่าสุด) ที่เหลือลบ
+    # คืนจำนวนแถวที่ลบ
+    rows = db.session.execute(
+        select(TaskUpdate.id, TaskUpdate.author_id, TaskUpdate.content, TaskUpdate.status,
+               TaskUpdate.progress_percent, TaskUpdate.created_at, TaskUpdate.edited_at)
+        .where(TaskUpdate.task_id == t.id)
+        .order_by(TaskUpdate.created_at, TaskUpdate.id)).all()
+    runs = _runs(rows, window, _attached([r.id for r in rows]))
+    if not runs:
+        return 0
+    kept, dropped = [], []
+    for run in runs:
+        status = next((r.status for r in reversed(run) if r.status is not None), None)
+        progress = next((r.progress_percent for r in reversed(run) if r.progress_percent is not None), None)
+        kept.append({"kid": run[0].id, "status": status, "progress_percent": progress,
+                     "content": content_for(status, progress), "edited_at": touched_at(run[-1])})
+        dropped += [r.id for r in run[1:]]
+    upd = TaskUpdate.__table__
+    db.session.execute(upd.delete().where(upd.c.id.in_(dropped)))
+    # executemany: คีย์ที่เหลือใน dict คือคอลัมน์ที่ SET
+    db.session.execute(upd.update().where(upd.c.id == bindparam("kid")), kept)
+    search.remove_updates(dropped)
+    for k in kept:
+        search.index_update(TaskUpdate(id=k["kid"], task_id=t.id, content=k["content"]), t.project_id)
+    sync.record(t.project_id, "update", [k["kid"] for k in kept])
+    sync.record(t.project_id, "update", dropped, op=sync.DELETE)
+    return len(dropped)
+
+def candidates(project_id=None):
+    # task ที่ยังไม่ archive และมีอัปเดตมากกว่าหนึ่งแถว
+    stmt = (select(TaskUpdate.task_id).group_by(TaskUpdate.task_id).having(func.count(TaskUpdate.id) > 1))
+    q = Task.query.filter(Task.archived.is_(False), Task.id.in_(stmt))
+    if project_id is not None:
+        q = q.filter(Task.project_id == project_id)
+    return q.order_by(Task.id).all()
+
+def compact(window=WINDOW_SECONDS, project_id=None):
+    result = {"tasks": 0, "removed": 0}
+    for n, t in enumerate(candidates(project_id), start=1):
+        removed = compact_task(t, window)
+        if removed:
+            result["tasks"] += 1
+            result["removed"] += removed
+        if n % BATCH_TASKS == 0:
+            db.session.commit()
+    db.session.commit()
+    return result
+
+# --- CLI ---
+
+@click.group('updates')
+def updates_cli():
+    """รวมอัปเดตสถานะ/% ที่ถูกกดรัว ๆ"""
+
+@updates_cli.command('compact')
+@click.option('--window', default=WINDOW_SECONDS, show_default=True, type=int,
+              help="รวมแถวที่ห่างจากแถวก่อนหน้าไม่เกินกี่วินาที")
+@click.option('--project', 'project_id', type=int, default=None, help="เฉพาะโปรเจกต์นี้")
+@click.option('--changelog/--no-changelog', default=True, show_default=True,
+              help="ลบรายการ change log ที่มีรายการใหม่กว่าของแถวเดียวกันแล้ว")
+@with_appcontext
+def compact_command(window, project_id, changelog):
+    if window <= 0:
+        raise click.BadParameter("ต้องมากกว่า 0", param_hint="--window")
+    r = compact(window, project_id)
+    click.echo(f"merged {r['removed']} update(s) in {r['tasks']} task(s)")
+    if changelog:
+        n = sync.compact()
+        db.session.commit()
+        click.echo(f"pruned {n} superseded change log row(s)")
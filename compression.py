@@ -0,0 +1,70 @@
+# compression.py
+# -*- coding: utf-8 -*-
+# บีบอัด response ที่เป็นข้อความ (หน้า HTML ภาษาไทย + inline JS, JSON) ตาม Accept-Encoding: br > gzip
+# ข้าม: ไฟล์ (send_file), stream (SSE/export), 206/304, ที่บีบมาแล้ว, ชนิดที่ไม่ใช่ข้อความ, ขนาดเล็กกว่า COMPRESS_MIN_SIZE
+# brotli เป็น optional (ไม่มีแพ็กเกจ = gzip อย่างเดียว); ปิดทั้งหมดด้วย COMPRESS_RESPONSES=0 (เช่นให้ proxy ทำแทน)
+import gzip
+from flask import request
+from utils import get_env
+
+try:
+    import brotli
+except ImportError:   # pragma: no cover - ขึ้นกับเครื่อง
+    brotli = None
+
+MIN_SIZE = int(get_env("COMPRESS_MIN_SIZE", 1024))
+GZIP_LEVEL = int(get_env("COMPRESS_GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(get_env("COMPRESS_BROTLI_QUALITY", 5))   # ต่อ request: เร็วพอ (build time ใช้ 11)
+MIMETYPES = frozenset((
+    "text/html", "text/css", "text/plain", "text/csv", "text/javascript", "application/javascript",
+    "application/json", "image/svg+xml",
+))
+
+def enabled():
+    return get_env("COMPRESS_RESPONSES", "1").lower() in ("1", "true", "yes")
+
+def encodings():
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+def choose(accept_encodings, offered=None):
+    # encoding ที่ client รับ (q > 0) ตามลำดับที่เราชอบ; None = ส่งแบบไม่บีบ
+    for enc in offered or encodings():
+        if accept_encodings[enc] > 0:
+            return enc
+    return None
+
+def compress(data, enc, gzip_level=GZIP_LEVEL, brotli_quality=BROTLI_QUALITY):
+    if enc == "br":
+        return brotli.compress(data, quality=brotli_quality)
+    return gzip.compress(data, compresslevel=gzip_level, mtime=0)
+
+def _eligible(resp):
+    return (resp.status_code == 200
+            and not resp.direct_passthrough
+            and not resp.is_streamed
+            and "Content-Encoding" not in resp.headers
+            and resp.mimetype in MIMETYPES
+            and request.method != "HEAD")
+
+def init_app(app):
+    # ลงทะเบียนก่อน after_request อื่น -> Flask เรียกทีหลังสุด (บีบ body ที่เสร็จแล้ว)
+    if not enabled():
+        return
+
+    @app.after_request
+    def _compress_response(resp):
+        if not _eligible(resp):
+            return resp
+        data = resp.get_data()
+        if len(data) < MIN_SIZE:
+            return resp
+        resp.vary.add("Accept-Encoding")
+        enc = choose(request.accept_encodings)
+        if enc is None:
+            return resp
+        body = compress(data, enc)
+        if len(body) >= len(data):
+            return resp
+        resp.set_data(body)
+        resp.headers["Content-Encoding"] = enc
+        return resp
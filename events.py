@@ -0,0 +1,148 @@
+# events.py
+# -*- coding: utf-8 -*-
+# Live update ผ่าน Server-Sent Events: write path publish event สั้น ๆ -> หน้าเว็บ patch DOM เอง
+# backend เปลี่ยนได้ด้วย PUBSUB_BACKEND="module.Class" (ต้องมี publish/listen แบบเดียวกับ InProcessPubSub)
+# InProcessPubSub เห็นแค่ event ของ worker ตัวเอง: WEB_CONCURRENCY > 1 ต้องใช้ backend ที่ข้าม process ได้
+# (ไม่งั้น event หายเงียบ ๆ ครึ่งหนึ่ง; gunicorn.conf.py เตือนตอน start)
+import importlib, json, random, threading, time
+from collections import OrderedDict, deque
+from flask import Response
+from sqlalchemy import event as sa_event
+from sqlalchemy.orm import Session
+from models import db
+from utils import get_env
+
+class InProcessPubSub:
+    # pub/sub ใน process เดียว (single node / test): ring buffer ต่อ channel + Condition ปลุกผู้ฟัง
+    def __init__(self, backlog=200, max_channels=10000):
+        self.backlog, self.max_channels = backlog, max_channels
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._channels = OrderedDict()
+
+    def publish(self, channel, event):
+        with self._cond:
+            self._seq += 1
+            buf = self._channels.get(channel)
+            if buf is None:
+                buf = self._channels[channel] = deque(maxlen=self.backlog)
+                while len(self._channels) > self.max_channels:
+                    self._channels.popitem(last=False)
+            else:
+                self._channels.move_to_end(channel)
+            buf.append((self._seq, event))
+            self._cond.notify_all()
+            return self._seq
+
+    def last_id(self):
+        with self._cond:
+            return self._seq
+
+    def listen(self, channels, last_id, timeout):
+        # คืน [(seq, channel, event)] ที่ใหม่กว่า last_id; ไม่มีอะไรภายใน timeout -> []
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                out = [(seq, ch, ev)
+                       for ch in channels
+                       for seq, ev in self._channels.get(ch, ())
+                       if seq > last_id]
+                remaining = deadline - time.monotonic()
+                if out or remaining <= 0:
+                    return sorted(out, key=lambda e: e[0])
+                self._cond.wait(remaining)
+
+_backend = None
+
+def backend():
+    global _backend
+    if _backend is None:
+        path = get_env("PUBSUB_BACKEND", "events.InProcessPubSub")
+        mod, _, cls = path.rpartition('.')
+        _backend = getattr(importlib.import_module(mod), cls)()
+    return _backend
+
+def set_backend(b):
+    global _backend
+    _backend = b
+
+# --- publish helpers ---
+# เรียกได้ก่อน commit: event ถูกพักไว้ใน session.info แล้วส่งจริงหลัง commit สำเร็จ (rollback = ทิ้ง)
+
+def publish(channels, event):
+    db.session.info.setdefault('pending_events', []).append((tuple(channels), event))
+
+@sa_event.listens_for(Session, "after_commit")
+def _flush_events(session):
+    pending = session.info.pop('pending_events', None)
+    for channels, ev in pending or ():
+        for ch in channels:
+            backend().publish(ch, ev)
+
+@sa_event.listens_for(Session, "after_rollback")
+def _drop_events(session):
+    session.info.pop('pending_events', None)
+
+def task_changed(t, kind="task"):
+    publish((f"project:{t.project_id}", f"task:{t.id}"), {
+        "type": kind,
+        "task_id": t.id,
+        "status": t.status,
+        "progress": t.progress_percent,
+        "last_updated": t.last_updated.isoformat() if t.last_updated else None,
+    })
+
+def tasks_changed(rows, project_ids):
+    # rows จาก bulk update: [{"id", "status", "progress_percent", "last_updated"}]
+    for r in rows:
+        ev = {"type": "task", "task_id": r["id"], "status": r["status"],
+              "progress": r["progress_percent"], "last_updated": r["last_updated"].isoformat()}
+        publish((f"project:{project_ids[r['id']]}", f"task:{r['id']}"), ev)
+
+def update_changed(task_id, update_id):
+    publish((f"task:{task_id}",), {"type": "update", "task_id": task_id, "update_id": update_id})
+
+# --- SSE stream ---
+
+STREAM_MAX_SECONDS = float(get_env("SSE_MAX_SECONDS", 300))
+KEEPALIVE_SECONDS = 15.0
+# stream หนึ่งถือ 1 thread ของ gthread worker ตลอดที่เปิด (รอ Condition เฉย ๆ ไม่กิน CPU)
+# gunicorn.conf.py เพิ่ม thread ให้ stream อีก MAX_STREAMS ต่อ worker แยกจาก GUNICORN_THREADS ที่ทำหน้าเว็บ
+# -> stream เต็มแล้วหน้าอื่นยังมี thread ครบ; เกินโควตาไม่รอคิว
+MAX_STREAMS = int(get_env("SSE_MAX_STREAMS", 32))
+BUSY_RETRY_MS = 30000
+_streams = threading.BoundedSemaphore(MAX_STREAMS)
+
+def _format(seq, event):
+    return f"id: {seq}\nevent: {event['type']}\ndata: {json.dumps(event, separators=(',', ':'))}\n\n"
+
+def stream(channels, last_event_id=None):
+    if not _streams.acquire(blocking=False):
+        # เต็มแล้ว: ตอบ 200 + retry แล้วปิดทันที EventSource จะต่อใหม่เองหลัง retry
+        # (status อื่นที่ไม่ใช่ 200 = EventSource เลิกต่อถาวร); สุ่มเพิ่มไม่ให้ทุกแท็บกลับมาพร้อมกัน
+        retry = BUSY_RETRY_MS + random.randint(0, BUSY_RETRY_MS // 2)
+        return Response(f"retry: {retry}\n\n", mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+    b = backend()
+    try:
+        last_id = int(last_event_id) if last_event_id else b.last_id()
+    except ValueError:
+        last_id = b.last_id()
+
+    def gen(last_id=last_id):
+        yield "retry: 3000\n\n"
+        # ปิดเองเป็นรอบ ๆ ไม่ให้ thread ถูกจองนานเกิน; client ต่อใหม่พร้อม Last-Event-ID
+        ends = time.monotonic() + STREAM_MAX_SECONDS
+        while time.monotonic() < ends:
+            batch = b.listen(channels, last_id, KEEPALIVE_SECONDS)
+            if not batch:
+                yield ": keepalive\n\n"
+                continue
+            for seq, _ch, ev in batch:
+                last_id = seq
+                yield _format(seq, ev)
+
+    resp = Response(gen(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # server เรียก close() เสมอ (แม้ client หลุดก่อน generator เริ่ม) -> คืนโควตาตรงนี้
+    resp.call_on_close(_streams.release)
+    return resp
@@ -0,0 +1,86 @@
+# fragments.py
+# -*- coding: utf-8 -*-
+# แคช HTML ย่อยของหน้า (การ์ดงานใน project_detail, การ์ดอัปเดตใน task_feed) ใน process
+# คีย์ = (ชนิด, id ของแถว, ส่วนที่ขึ้นกับผู้ดู เช่น is_manager); เก็บคู่กับ version ของแถว
+# version ไม่ตรง = แถวเปลี่ยนแล้ว render ใหม่ทับที่เดิม (ไม่มีของเก่าค้าง) ; เต็มแล้วทิ้งตัวที่ใช้น้อยสุด (LRU)
+# ใช้ใน template:  {% call cached_fragment('task_card', t.id, (t.last_updated, t.status), is_manager) %}...{% endcall %}
+from collections import OrderedDict
+from threading import Lock
+from markupsafe import Markup
+from flask import abort
+from utils import get_env
+import profiling
+
+class FragmentCache:
+    def __init__(self, maxsize=5000, max_bytes=32 * 1024 * 1024):
+        self.maxsize, self.max_bytes = maxsize, max_bytes
+        self._data = OrderedDict()      # key -> (version, html)
+        self._bytes = 0
+        self._lock = Lock()
+        self.hits = self.misses = self.stale = self.evictions = 0
+
+    def get(self, key, version):
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is not None and hit[0] == version:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return hit[1]
+            self.misses += 1
+            if hit is not None:
+                self.stale += 1
+            return None
+
+    def set(self, key, version, html):
+        if self.maxsize <= 0 or len(html) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[1])
+            self._data[key] = (version, html)
+            self._bytes += len(html)
+            while len(self._data) > self.maxsize or self._bytes > self.max_bytes:
+                _k, (_v, dropped) = self._data.popitem(last=False)
+                self._bytes -= len(dropped)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            looked = self.hits + self.misses
+            return {"entries": len(self._data), "bytes": self._bytes,
+                    "maxsize": self.maxsize, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses, "stale": self.stale,
+                    "evictions": self.evictions,
+                    "hit_rate": round(self.hits / looked, 4) if looked else None}
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+            self.hits = self.misses = self.stale = self.evictions = 0
+
+cache = FragmentCache(
+    maxsize=int(get_env("FRAGMENT_CACHE_SIZE", 5000)),          # 0 = ปิด
+    max_bytes=int(get_env("FRAGMENT_CACHE_MAX_BYTES", 32 * 1024 * 1024)),
+)
+
+def cached_fragment(kind, row_id, version, variant=None, caller=None):
+    # body ของ {% call %} render เฉพาะตอน miss
+    if cache.maxsize <= 0:
+        return caller()
+    key = (kind, row_id, variant)
+    html = cache.get(key, version)
+    if html is None:
+        html = str(caller())
+        cache.set(key, version, html)
+    return Markup(html)
+
+def init_app(app):
+    app.jinja_env.globals["cached_fragment"] = cached_fragment
+
+    @app.get("/_debug/fragment-stats")
+    def fragment_stats():
+        if not profiling.debug_allowed(app):
+            abort(404)
+        return cache.stats()
@@ -0,0 +1,28 @@
+# gunicorn.conf.py
+# -*- coding: utf-8 -*-
+import os
+
+# โหลดแอปครั้งเดียวใน master แล้ว fork (worker ใหม่ไม่ต้อง import ซ้ำ -> scale/restart เร็วขึ้น)
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1"
+
+workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+
+# gthread: stream SSE ถือแค่ thread เดียว ไม่ใช่ทั้ง worker process
+# thread ทำหน้าเว็บ (GUNICORN_THREADS) + thread สำหรับ stream (SSE_MAX_STREAMS, ดู events.MAX_STREAMS)
+# stream เต็มโควตาแล้วยังเหลือ GUNICORN_THREADS ไว้ให้หน้าอื่นเสมอ
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.environ.get("GUNICORN_THREADS", 8)) + int(os.environ.get("SSE_MAX_STREAMS", 32))
+
+def when_ready(server):
+    # pub/sub ใน process ส่ง event ให้เฉพาะ stream ของ worker เดียวกัน
+    if workers > 1 and os.environ.get("PUBSUB_BACKEND", "events.InProcessPubSub") == "events.InProcessPubSub":
+        server.log.warning("WEB_CONCURRENCY=%s with the in-process pub/sub backend: live events published "
+                           "in one worker never reach streams held by the others; set PUBSUB_BACKEND", workers)
+
+def post_fork(server, worker):
+    # connection pool ห้ามแชร์ข้าม process หลัง fork
+    from app import app
+    from models import db
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
@@ -0,0 +1,61 @@
+# http_cache.py
+# -*- coding: utf-8 -*-
+# Conditional GET: view คำนวณ validator ถูก ๆ จากข้อมูลที่มีอยู่แล้ว แล้วตอบ 304 ก่อน query หนัก/render
+import hashlib, os
+from flask import g, request, session, current_app
+from utils import current_user
+import assets
+
+_template_salt = None
+
+def _salt():
+    # เปลี่ยน template/deploy แล้ว ETag ต้องเปลี่ยนตาม
+    global _template_salt
+    if _template_salt is None:
+        h = hashlib.sha1((os.environ.get("RELEASE") or "").encode())
+        h.update(assets.manifest_digest(current_app).encode())
+        root = os.path.join(current_app.root_path, current_app.template_folder or "templates")
+        for dirpath, _dirs, files in sorted(os.walk(root)):
+            for name in sorted(files):
+                with open(os.path.join(dirpath, name), "rb") as fh:
+                    h.update(name.encode()); h.update(fh.read())
+        _template_salt = h.hexdigest()[:12]
+    return _template_salt
+
+def make_etag(*parts):
+    u = current_user()
+    raw = "|".join(str(p) for p in (_salt(), u.id if u else "-", request.endpoint) + parts)
+    return 'W/"%s"' % hashlib.sha1(raw.encode()).hexdigest()[:20]
+
+def not_modified(*parts, last_modified=None):
+    # คืน response 304 ถ้า client มีของล่าสุดแล้ว ไม่งั้นจำ validator ไว้ให้ after_request ใส่ header
+    etag = make_etag(*parts)
+    g._http_validator = (etag, last_modified)
+    if '_flashes' in session:
+        # มี flash ค้างอยู่ ต้อง render จริงเพื่อแสดงข้อความ
+        return None
+    fresh = False
+    if request.if_none_match:
+        fresh = request.if_none_match.contains_weak(etag.split('"')[1])
+    elif last_modified is not None and request.if_modified_since is not None:
+        fresh = last_modified.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None)
+    if not fresh:
+        return None
+    resp = current_app.response_class(status=304)
+    _apply_headers(resp, etag, last_modified)
+    return resp
+
+def _apply_headers(resp, etag, last_modified):
+    resp.headers['ETag'] = etag
+    if last_modified is not None:
+        resp.last_modified = last_modified
+    # ต้อง revalidate ทุกครั้ง และห้าม proxy กลางทางเก็บ (หน้าเฉพาะผู้ใช้)
+    resp.headers['Cache-Control'] = 'private, no-cache'
+
+def init_app(app):
+    @app.after_request
+    def _set_validator_headers(resp):
+        v = g.pop('_http_validator', None)
+        if v and resp.status_code == 200 and 'ETag' not in resp.headers:
+            _apply_headers(resp, *v)
+        return resp
@@ -0,0 +1,245 @@
+# migrations.py
+# -*- coding: utf-8 -*-
+# ตัวรัน schema migration แบบมีเวอร์ชัน (แทน db.create_all() ตอน import)
+# รันครั้งเดียวตอน deploy: `flask --app app schema upgrade` ไม่ใช่ตอน gunicorn worker boot
+import click
+from datetime import datetime
+from flask.cli import with_appcontext
+from sqlalchemy import MetaData, Table, Column, Integer, String, DateTime, select, text, inspect
+from sqlalchemy.schema import CreateTable
+from models import db, Task, TaskUpdate, TaskUpdateLink, TaskFile, ProjectMember, Project, FileDeletion, TaskDailyRollup, ProjectDailyRollup, FileUpload, ChangeLog, TaskArchive
+
+_meta = MetaData()
+schema_migrations = Table(
+    'schema_migrations', _meta,
+    Column('version', Integer, primary_key=True),
+    Column('name', String(120), nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+# กัน worker/release หลายตัวรันพร้อมกันบน Postgres
+PG_LOCK_KEY = 0x776D6D67
+
+MIGRATIONS = []
+
+def migration(version, name):
+    def deco(fn):
+        MIGRATIONS.append((version, name, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return deco
+
+def _create_index(conn, table, name):
+    for ix in table.indexes:
+        if ix.name == name:
+            ix.create(conn, checkfirst=True)
+            return
+    raise KeyError(name)
+
+def _sqlite_autoincrement(conn, table):
+    # SQLite ใช้ rowid ที่ถูกลบแล้วซ้ำได้ถ้าไม่มี AUTOINCREMENT และเพิ่มทีหลังไม่ได้ -> สร้างตารางใหม่แล้วย้ายข้อมูล
+    ddl = conn.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :n"),
+                       {'n': table.name}).scalar()
+    if ddl is None or 'AUTOINCREMENT' in ddl.upper():
+        return
+    tmp = f"{table.name}__new"
+    for name in [r[0] for r in conn.execute(text(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :n AND sql IS NOT NULL"),
+            {'n': table.name})]:
+        conn.execute(text(f'DROP INDEX "{name}"'))
+    create = str(CreateTable(table).compile(conn)).replace(f"CREATE TABLE {table.name} ", f"CREATE TABLE {tmp} ", 1)
+    conn.execute(text(create))
+    # ย้ายเฉพาะคอลัมน์ที่ตารางเดิมมี (คอลัมน์ที่ migration หลัง ๆ เพิ่มได้ค่า default ในตารางใหม่)
+    have = {c['name'] for c in inspect(conn).get_columns(table.name)}
+    cols = ", ".join(c.name for c in table.columns if c.name in have)
+    conn.execute(text(f"INSERT INTO {tmp} ({cols}) SELECT {cols} FROM {table.name}"))
+    conn.execute(text(f"DROP TABLE {table.name}"))
+    conn.execute(text(f"ALTER TABLE {tmp} RENAME TO {table.name}"))
+    for ix in table.indexes:
+        ix.create(conn)
+
+# --- migrations ---
+
+@migration(1, "baseline tables")
+def _m001_baseline(conn):
+    # ฐานข้อมูลเดิมที่สร้างด้วย create_all จะข้ามตารางที่มีอยู่แล้ว
+    db.metadata.create_all(conn)
+
+@migration(2, "hot-path composite and unique indexes")
+def _m002_hot_path_indexes(conn):
+    # สมาชิกซ้ำ (project_id, user_id) ต้องหายก่อนสร้าง unique index
+    conn.execute(text(
+        "DELETE FROM project_member WHERE id NOT IN ("
+        " SELECT keep_id FROM (SELECT MIN(id) AS keep_id FROM project_member"
+        " GROUP BY project_id, user_id) AS keep)"
+    ))
+    conn.execute(text(
+        "UPDATE project_summary SET member_count = ("
+        " SELECT COUNT(*) FROM project_member WHERE project_member.project_id = project_summary.project_id)"
+    ))
+    _create_index(conn, ProjectMember.__table__, 'uq_project_member_project_user')
+    _create_index(conn, ProjectMember.__table__, 'ix_project_member_user_project')
+    _create_index(conn, TaskUpdate.__table__, 'ix_task_update_task_created')
+    _create_index(conn, TaskFile.__table__, 'ix_task_file_task_created')
+    _create_index(conn, Task.__table__, 'ix_task_project_last_updated')
+    # index คอลัมน์เดียวที่เป็น prefix ของ composite ข้างบน -> ซ้ำซ้อน และทำให้ planner เลือกผิด
+    for name in ('ix_project_member_user_id', 'ix_task_update_task_id',
+                 'ix_task_file_task_id', 'ix_task_project_id'):
+        conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+@migration(3, "file deletion outbox")
+def _m003_file_deletion_outbox(conn):
+    FileDeletion.__table__.create(conn, checkfirst=True)
+
+@migration(4, "full-text search index")
+def _m004_search_index(conn):
+    import search
+    search.create_schema(conn)
+    search.backfill(conn)
+
+@migration(5, "daily progress rollups")
+def _m005_daily_rollups(conn):
+    import rollups
+    # DB ใหม่ได้คอลัมน์นี้จาก baseline (create_all) อยู่แล้ว
+    if 'progress_sum' not in {c['name'] for c in inspect(conn).get_columns('project_summary')}:
+        conn.execute(text("ALTER TABLE project_summary ADD COLUMN progress_sum INTEGER NOT NULL DEFAULT 0"))
+    conn.execute(text(
+        "UPDATE project_summary SET progress_sum = ("
+        " SELECT COALESCE(SUM(progress_percent), 0) FROM task WHERE task.project_id = project_summary.project_id)"
+    ))
+    TaskDailyRollup.__table__.create(conn, checkfirst=True)
+    ProjectDailyRollup.__table__.create(conn, checkfirst=True)
+    rollups.backfill(conn)
+
+@migration(6, "resumable file uploads")
+def _m006_file_uploads(conn):
+    FileUpload.__table__.create(conn, checkfirst=True)
+
+@migration(7, "delta sync change log")
+def _m007_change_log(conn):
+    import sync
+    ChangeLog.__table__.create(conn, checkfirst=True)
+    sync.backfill(conn)
+
+@migration(8, "task history archive")
+def _m008_task_archive(conn):
+    # DB ใหม่ได้คอลัมน์นี้จาก baseline (create_all) อยู่แล้ว
+    if 'archived' not in {c['name'] for c in inspect(conn).get_columns('task')}:
+        conn.execute(text("ALTER TABLE task ADD COLUMN archived BOOLEAN NOT NULL DEFAULT false"))
+    TaskArchive.__table__.create(conn, checkfirst=True)
+    if conn.dialect.name == 'sqlite':
+        _sqlite_autoincrement(conn, TaskUpdate.__table__)
+        _sqlite_autoincrement(conn, TaskUpdateLink.__table__)
+
+@migration(9, "task update edit time")
+def _m009_task_update_edited_at(conn):
+    if 'edited_at' not in {c['name'] for c in inspect(conn).get_columns('task_update')}:
+        conn.execute(text("ALTER TABLE task_update ADD COLUMN edited_at TIMESTAMP"))
+
+@migration(10, "change log transaction order")
+def _m010_change_log_txid(conn):
+    # แถวเดิมได้ txid = 0 -> เรียงก่อนทุกแถวใหม่ ตามลำดับ seq เดิม
+    if 'txid' not in {c['name'] for c in inspect(conn).get_columns('change_log')}:
+        conn.execute(text("ALTER TABLE change_log ADD COLUMN txid BIGINT NOT NULL DEFAULT 0"))
+    for name in ('ix_change_log_project_seq', 'ix_change_log_user_seq'):
+        conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+    for ix in ChangeLog.__table__.indexes:
+        ix.create(conn, checkfirst=True)
+
+# --- runner ---
+
+def _applied_versions(conn):
+    return {r[0] for r in conn.execute(select(schema_migrations.c.version))}
+
+def upgrade(target=None, echo=print):
+    engine = db.engine
+    is_pg = engine.dialect.name == 'postgresql'
+    _meta.create_all(engine)
+    ran = []
+    for version, name, fn in MIGRATIONS:
+        if target is not None and version > target:
+            break
+        with engine.begin() as conn:
+            if is_pg:
+                conn.execute(text("SELECT pg_advisory_xact_lock(:k)"), {'k': PG_LOCK_KEY})
+            if version in _applied_versions(conn):
+                continue
+            echo(f"applying {version:04d} {name}")
+            fn(conn)
+            conn.execute(schema_migrations.insert().values(
+                version=version, name=name, applied_at=datetime.utcnow()))
+        ran.append(version)
+    return ran
+
+def pending():
+    engine = db.engine
+    _meta.create_all(engine)
+    with engine.connect() as conn:
+        done = _applied_versions(conn)
+    return [(v, n) for v, n, _fn in MIGRATIONS if v not in done]
+
+# --- EXPLAIN check ---
+
+def _hot_queries():
+    # query หลักของหน้า feed / project / projects กับ index ที่ควรถูกใช้
+    return [
+        ("task_feed updates",
+         TaskUpdate.query.filter(TaskUpdate.task_id == 1)
+         .order_by(TaskUpdate.created_at.desc(), TaskUpdate.id.desc()).limit(21),
+         {'ix_task_update_task_created'}),
+        ("task_feed loose files",
+         TaskFile.query.filter(TaskFile.task_id == 1, TaskFile.task_update_id.is_(None))
+         .order_by(TaskFile.created_at.desc()),
+         {'ix_task_file_task_created'}),
+        ("project_detail tasks",
+         Task.query.filter_by(project_id=1).order_by(Task.last_updated.desc()),
+         {'ix_task_project_last_updated'}),
+        ("projects membership join",
+         db.session.query(Project, ProjectMember.role)
+         .join(ProjectMember, Project.id == ProjectMember.project_id)
+         .filter(ProjectMember.user_id == 1),
+         {'ix_project_member_user_project'}),
+        ("membership lookup",
+         ProjectMember.query.filter_by(project_id=1, user_id=1),
+         {'uq_project_member_project_user', 'ix_project_member_user_project'}),
+    ]
+
+def explain_hot_queries():
+    engine = db.engine
+    prefix = "EXPLAIN QUERY PLAN " if engine.dialect.name == 'sqlite' else "EXPLAIN "
+    results = []
+    with engine.connect() as conn:
+        for label, query, expected in _hot_queries():
+            sql = str(query.statement.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+            plan = "\n".join(" ".join(str(c) for c in row) for row in conn.execute(text(prefix + sql)))
+            results.append((label, plan, any(ix in plan for ix in expected)))
+    return results
+
+@click.group('schema')
+def schema_cli():
+    """Schema migrations"""
+
+@schema_cli.command('upgrade')
+@click.option('--to', 'target', type=int, default=None, help="หยุดที่เวอร์ชันนี้")
+@with_appcontext
+def upgrade_command(target):
+    ran = upgrade(target, echo=click.echo)
+    click.echo(f"applied {len(ran)} migration(s)" if ran else "schema is up to date")
+
+@schema_cli.command('status')
+@with_appcontext
+def status_command():
+    todo = pending()
+    for v, n in todo:
+        click.echo(f"pending {v:04d} {n}")
+    click.echo(f"{len(MIGRATIONS) - len(todo)}/{len(MIGRATIONS)} applied")
+
+@schema_cli.command('explain')
+@with_appcontext
+def explain_command():
+    ok = True
+    for label, plan, used in explain_hot_queries():
+        click.echo(f"[{'ok' if used else 'NO INDEX'}] {label}\n{plan}\n")
+        ok = ok and used
+    if not ok:
+        raise SystemExit(1)
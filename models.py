@@ -1,9 +1,11 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import check_password_hash
+from passwords import hash_password, needs_rehash
+from replicas import RoutingSession
 import secrets
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 
 class User(db.Model):
   id = db.Column(db.Integer, primary_key=True)
@@ -11,8 +13,9 @@ class User(db.Model):
   display_name = db.Column(db.String(80), nullable=False)
   password_hash = db.Column(db.String(255), nullable=False)
   created_at = db.Column(db.DateTime, default=datetime.utcnow)
-  def set_password(self, raw: str): self.password_hash = generate_password_hash(raw)
+  def set_password(self, raw: str): self.password_hash = hash_password(raw)
   def check_password(self, raw: str): return check_password_hash(self.password_hash, raw)
+  def password_needs_rehash(self): return needs_rehash(self.password_hash)
 
 class Project(db.Model):
   id = db.Column(db.Integer, primary_key=True)
@@ -24,15 +27,22 @@ class Project(db.Model):
   created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class ProjectMember(db.Model):
+  __table_args__ = (
+    db.Index('uq_project_member_project_user', 'project_id', 'user_id', unique=True),
+    db.Index('ix_project_member_user_project', 'user_id', 'project_id'),
+  )
   id = db.Column(db.Integer, primary_key=True)
   project_id = db.Column(db.Integer, db.ForeignKey('project.id'), nullable=False, index=True)
-  user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+  user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
   role = db.Column(db.String(16), default="member")  # owner|member|ba
   joined_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class Task(db.Model):
+  __table_args__ = (
+    db.Index('ix_task_project_last_updated', 'project_id', 'last_updated'),
+  )
   id = db.Column(db.Integer, primary_key=True)
-  project_id = db.Column(db.Integer, db.ForeignKey('project.id'), nullable=False, index=True)
+  project_id = db.Column(db.Integer, db.ForeignKey('project.id'), nullable=False)
   title = db.Column(db.String(200), nullable=False)
   assignee_name = db.Column(db.String(120))
   progress_percent = db.Column(db.Integer, default=0)  # 0..100
@@ -40,17 +50,24 @@ class Task(db.Model):
   status = db.Column(db.String(32), default="todo")    # todo|doing|done|blocked
   reference_url = db.Column(db.String(500))            # legacy, hidden in UI
   created_by_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+  archived = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())  # ประวัติอยู่ใน TaskArchive
 
 class TaskUpdate(db.Model):
+  __table_args__ = (
+    db.Index('ix_task_update_task_created', 'task_id', 'created_at', 'id'),
+    {'sqlite_autoincrement': True},   # id ที่ archive ไปแล้วต้องไม่ถูกใช้ซ้ำ (restore ใส่ id เดิมกลับ)
+  )
   id = db.Column(db.Integer, primary_key=True)
-  task_id = db.Column(db.Integer, db.ForeignKey('task.id'), nullable=False, index=True)
+  task_id = db.Column(db.Integer, db.ForeignKey('task.id'), nullable=False)
   author_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
   content = db.Column(db.Text, nullable=False)
   progress_percent = db.Column(db.Integer)  # optional
   status = db.Column(db.String(32))         # optional
   created_at = db.Column(db.DateTime, default=datetime.utcnow)
+  edited_at = db.Column(db.DateTime)        # แก้ครั้งล่าสุดจากการรวม (coalesce); created_at คงเดิมเพราะเป็น cursor ของ feed
 
 class TaskUpdateLink(db.Model):
+  __table_args__ = {'sqlite_autoincrement': True}
   id = db.Column(db.Integer, primary_key=True)
   task_update_id = db.Column(db.Integer, db.ForeignKey('task_update.id'), nullable=False, index=True)
   title = db.Column(db.String(200))
@@ -58,8 +75,11 @@ class TaskUpdateLink(db.Model):
   created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class TaskFile(db.Model):
+  __table_args__ = (
+    db.Index('ix_task_file_task_created', 'task_id', 'created_at'),
+  )
   id = db.Column(db.Integer, primary_key=True)
-  task_id = db.Column(db.Integer, db.ForeignKey('task.id'), nullable=False, index=True)
+  task_id = db.Column(db.Integer, db.ForeignKey('task.id'), nullable=False)
   task_update_id = db.Column(db.Integer, db.ForeignKey('task_update.id'))
   file_name = db.Column(db.String(255), nullable=False)
   content_type = db.Column(db.String(120))
@@ -68,3 +88,94 @@ class TaskFile(db.Model):
   public_id = db.Column(db.String(255))
   secure_url = db.Column(db.String(1000))
   created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ProjectSummary(db.Model):
+  # ตัวนับต่อโปรเจกต์ (อัปเดตใน transaction เดียวกับการเขียน) ใช้แทนการสแกน Task ทุกแถว
+  project_id = db.Column(db.Integer, db.ForeignKey('project.id'), primary_key=True)
+  todo_count = db.Column(db.Integer, nullable=False, default=0)
+  doing_count = db.Column(db.Integer, nullable=False, default=0)
+  done_count = db.Column(db.Integer, nullable=False, default=0)
+  blocked_count = db.Column(db.Integer, nullable=False, default=0)
+  member_count = db.Column(db.Integer, nullable=False, default=0)
+  progress_sum = db.Column(db.Integer, nullable=False, default=0)  # รวม progress_percent ของทุก task (ไว้หาค่าเฉลี่ย)
+  updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class FileDeletion(db.Model):
+  # outbox: ไฟล์บน CDN ที่ต้องลบ (เขียนใน transaction เดียวกับการลบ TaskFile แล้วให้ worker ลบทีหลัง)
+  __table_args__ = (
+    db.Index('ix_file_deletion_status_next', 'status', 'next_attempt_at'),
+  )
+  id = db.Column(db.Integer, primary_key=True)
+  provider = db.Column(db.String(32), nullable=False, default="cloudinary")
+  public_id = db.Column(db.String(255), nullable=False)
+  resource_type = db.Column(db.String(16), nullable=False, default="raw")
+  status = db.Column(db.String(16), nullable=False, default="pending")  # pending|failed
+  attempts = db.Column(db.Integer, nullable=False, default=0)
+  last_error = db.Column(db.String(500))
+  next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+  created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class FileUpload(db.Model):
+  # อัปโหลดฝั่ง server ที่ยังไม่ครบ (ต่อได้); ข้อมูลอยู่ในไฟล์ staging ของ storage จนกว่าจะครบแล้วกลายเป็น TaskFile
+  id = db.Column(db.String(32), primary_key=True)
+  task_id = db.Column(db.Integer, db.ForeignKey('task.id'), nullable=False, index=True)
+  task_update_id = db.Column(db.Integer, db.ForeignKey('task_update.id'))
+  user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+  file_name = db.Column(db.String(255), nullable=False)
+  size_bytes = db.Column(db.Integer, nullable=False)       # ขนาดที่ประกาศตอนเริ่ม
+  received_bytes = db.Column(db.Integer, nullable=False, default=0)
+  created_at = db.Column(db.DateTime, default=datetime.utcnow)
+  updated_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+class TaskDailyRollup(db.Model):
+  # สถานะ/ความคืบหน้าของ task ณ สิ้นวัน + จำนวนอัปเดตในวันนั้น
+  task_id = db.Column(db.Integer, db.ForeignKey('task.id'), primary_key=True)
+  day = db.Column(db.Date, primary_key=True)
+  project_id = db.Column(db.Integer, db.ForeignKey('project.id'), nullable=False, index=True)
+  progress_percent = db.Column(db.Integer, nullable=False, default=0)
+  status = db.Column(db.String(32))
+  update_count = db.Column(db.Integer, nullable=False, default=0)
+
+class ProjectDailyRollup(db.Model):
+  # snapshot ของ ProjectSummary ณ สิ้นวัน + จำนวนอัปเดตในวันนั้น (ใช้วาด burn-up)
+  project_id = db.Column(db.Integer, db.ForeignKey('project.id'), primary_key=True)
+  day = db.Column(db.Date, primary_key=True)
+  task_count = db.Column(db.Integer, nullable=False, default=0)
+  progress_sum = db.Column(db.Integer, nullable=False, default=0)
+  todo_count = db.Column(db.Integer, nullable=False, default=0)
+  doing_count = db.Column(db.Integer, nullable=False, default=0)
+  done_count = db.Column(db.Integer, nullable=False, default=0)
+  blocked_count = db.Column(db.Integer, nullable=False, default=0)
+  update_count = db.Column(db.Integer, nullable=False, default=0)
+
+class ChangeLog(db.Model):
+  # log การเปลี่ยนแปลงสำหรับ delta sync (/api/sync); (txid, seq) = sync token
+  # txid = transaction ที่เขียน (Postgres; SQLite = 0) seq อย่างเดียวไม่เรียงตามลำดับ commit
+  __table_args__ = (
+    db.Index('ix_change_log_project_txid_seq', 'project_id', 'txid', 'seq'),
+    db.Index('ix_change_log_user_txid_seq', 'user_id', 'txid', 'seq'),
+    {'sqlite_autoincrement': True},   # ห้ามใช้ seq ซ้ำหลังลบแถวท้าย ๆ (token ของ client จะข้ามแถวใหม่)
+  )
+  seq = db.Column(db.BigInteger().with_variant(db.Integer, "sqlite"), primary_key=True)
+  txid = db.Column(db.BigInteger, nullable=False, default=0, server_default='0')
+  project_id = db.Column(db.Integer, nullable=False)  # ไม่มี FK: tombstone ของโปรเจกต์ที่ลบแล้วต้องอยู่ต่อ
+  user_id = db.Column(db.Integer)                     # ไม่ว่าง = เห็นเฉพาะผู้ใช้นี้ (เข้า/ออก/ลบโปรเจกต์)
+  kind = db.Column(db.String(16), nullable=False)     # project|member|task|update|file
+  ref_id = db.Column(db.Integer, nullable=False)
+  op = db.Column(db.String(8), nullable=False, default="upsert")  # upsert|delete
+  created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class TaskArchive(db.Model):
+  # ประวัติอัปเดต+ลิงก์ของ task ในโปรเจกต์ที่เสร็จนานแล้ว บีบอัดเป็นก้อนเดียว (แถว TaskUpdate/TaskUpdateLink ถูกลบออก)
+  __table_args__ = (
+    db.Index('ix_task_archive_update_range', 'min_update_id', 'max_update_id'),
+  )
+  task_id = db.Column(db.Integer, db.ForeignKey('task.id'), primary_key=True)
+  project_id = db.Column(db.Integer, db.ForeignKey('project.id'), nullable=False, index=True)
+  update_count = db.Column(db.Integer, nullable=False, default=0)
+  min_update_id = db.Column(db.Integer)   # หา archive จาก update id (update_detail / sync)
+  max_update_id = db.Column(db.Integer)
+  first_at = db.Column(db.DateTime)
+  last_at = db.Column(db.DateTime)
+  data = db.Column(db.LargeBinary, nullable=False)   # zlib(JSON)
+  archived_at = db.Column(db.DateTime, default=datetime.utcnow)
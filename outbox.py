@@ -0,0 +1,173 @@
+# outbox.py
+# -*- coding: utf-8 -*-
+# Outbox สำหรับลบไฟล์ใน storage (Cloudinary/local ตาม provider): view แค่เขียนแถว FileDeletion ใน transaction เดิม
+# แล้ว worker (`flask --app app outbox run`) มาลบทีละ batch พร้อม retry/backoff
+import time
+import click
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask.cli import with_appcontext
+from sqlalchemy import func, select, literal
+from models import db, FileDeletion, TaskFile
+from utils import get_env, cloudinary_uploader
+import storage
+
+BATCH_SIZE = 100          # Cloudinary delete_resources รับได้สูงสุด 100 id ต่อครั้ง
+MAX_ATTEMPTS = 8
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 6 * 3600
+
+class CloudinaryDeleter:
+    # ใช้ Admin API แบบ batch; คืน {public_id: error|None}
+    def delete_batch(self, public_ids, resource_type="raw"):
+        cloudinary_uploader()  # import + config SDK ครั้งแรก
+        import cloudinary.api
+        res = cloudinary.api.delete_resources(list(public_ids), resource_type=resource_type, invalidate=True)
+        deleted = res.get('deleted') or {}
+        return {pid: None if deleted.get(pid) in ('deleted', 'not_found') else (deleted.get(pid) or 'missing')
+                for pid in public_ids}
+
+class FakeDeleter:
+    # สำหรับทดสอบ/รัน offline: จำทุก batch และจำลอง error ราย id ได้
+    def __init__(self, fail=(), raise_exc=None):
+        self.fail = set(fail)
+        self.raise_exc = raise_exc
+        self.batches = []
+
+    def delete_batch(self, public_ids, resource_type="raw"):
+        self.batches.append((resource_type, list(public_ids)))
+        if self.raise_exc:
+            raise self.raise_exc
+        return {pid: ('fake failure' if pid in self.fail else None) for pid in public_ids}
+
+def enqueue(public_ids, provider="cloudinary", resource_type="raw"):
+    # ไม่ commit เอง: ต้องอยู่ transaction เดียวกับการลบ TaskFile
+    rows = [{"provider": provider, "public_id": pid, "resource_type": resource_type,
+             "status": "pending", "attempts": 0, "next_attempt_at": datetime.utcnow(),
+             "created_at": datetime.utcnow()}
+            for pid in public_ids if pid]
+    if rows:
+        db.session.execute(FileDeletion.__table__.insert(), rows)
+    return len(rows)
+
+def enqueue_task_files(*criteria):
+    # INSERT ... SELECT จาก task_file (set-based ใช้กับ purge_project)
+    now = datetime.utcnow()
+    sel = select(
+        TaskFile.provider, TaskFile.public_id, literal("raw"), literal("pending"),
+        literal(0), literal(now), literal(now),
+    ).where(*criteria, TaskFile.public_id.isnot(None), TaskFile.public_id != "",
+            TaskFile.provider.in_(storage.deletable_providers()))
+    res = db.session.execute(FileDeletion.__table__.insert().from_select(
+        ['provider', 'public_id', 'resource_type', 'status', 'attempts', 'next_attempt_at', 'created_at'], sel))
+    return res.rowcount
+
+def _backoff(attempts):
+    return timedelta(seconds=min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** max(0, attempts - 1)))
+
+def _claim(limit, skip_providers=()):
+    q = (FileDeletion.query
+         .filter(FileDeletion.status == 'pending', FileDeletion.next_attempt_at <= datetime.utcnow(),
+                 FileDeletion.provider.notin_(skip_providers))
+         .order_by(FileDeletion.next_attempt_at, FileDeletion.id)
+         .limit(limit))
+    if db.engine.dialect.name == 'postgresql':
+        q = q.with_for_update(skip_locked=True)
+    return q.all()
+
+def drain_once(deleter=None, max_batches=10, max_workers=4):
+    # ดึงงานที่ถึงเวลา -> แบ่ง batch ตาม provider/resource_type -> ส่งพร้อมกันใน thread pool ขนาดจำกัด
+    # ผลลัพธ์เขียนกลับใน thread หลัก (session ไม่ thread-safe); deleter = ใช้ตัวนี้กับทุก provider (ทดสอบ)
+    rows = _claim(BATCH_SIZE * max_batches, () if deleter else storage.undrainable_providers())
+    if not rows:
+        db.session.commit()
+        return {"claimed": 0, "deleted": 0, "retried": 0, "failed": 0}
+
+    batches = {}
+    for r in rows:
+        batches.setdefault((r.provider, r.resource_type), []).append(r)
+    chunks = [(key, group[i:i + BATCH_SIZE])
+              for key, group in batches.items()
+              for i in range(0, len(group), BATCH_SIZE)]
+
+    def call(chunk):
+        (provider, rtype), group = chunk
+        d = deleter or storage.backend(provider)
+        if d is None:
+            return None, f"unknown provider {provider!r}"
+        try:
+            return d.delete_batch([r.public_id for r in group], resource_type=rtype), None
+        except Exception as exc:
+            return None, f"{type(exc).__name__}: {exc}"
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks)))) as pool:
+        results = list(pool.map(call, chunks))
+
+    stats = {"claimed": len(rows), "deleted": 0, "retried": 0, "failed": 0}
+    now = datetime.utcnow()
+    for (_key, group), (outcome, batch_error) in zip(chunks, results):
+        for r in group:
+            error = batch_error if outcome is None else outcome.get(r.public_id, 'missing')
+            if error is None:
+                db.session.delete(r)
+                stats["deleted"] += 1
+                continue
+            r.attempts += 1
+            r.last_error = str(error)[:500]
+            if r.attempts >= MAX_ATTEMPTS:
+                r.status = 'failed'
+                stats["failed"] += 1
+            else:
+                r.next_attempt_at = now + _backoff(r.attempts)
+                stats["retried"] += 1
+    db.session.commit()
+    return stats
+
+def queue_stats():
+    now = datetime.utcnow()
+    counts = dict(db.session.query(FileDeletion.status, func.count(FileDeletion.id))
+                  .group_by(FileDeletion.status).all())
+    due = (db.session.query(func.count(FileDeletion.id))
+           .filter(FileDeletion.status == 'pending', FileDeletion.next_attempt_at <= now).scalar())
+    retrying = (db.session.query(func.count(FileDeletion.id))
+                .filter(FileDeletion.status == 'pending', FileDeletion.attempts > 0).scalar())
+    return {"pending": counts.get('pending', 0), "due": due, "retrying": retrying,
+            "failed": counts.get('failed', 0)}
+
+@click.group('outbox')
+def outbox_cli():
+    """คิวลบไฟล์บน CDN"""
+
+@outbox_cli.command('stats')
+@with_appcontext
+def stats_command():
+    for k, v in queue_stats().items():
+        click.echo(f"{k}: {v}")
+
+@outbox_cli.command('drain')
+@click.option('--workers', default=4, show_default=True)
+@with_appcontext
+def drain_command(workers):
+    click.echo(drain_once(max_workers=workers))
+
+@outbox_cli.command('run')
+@click.option('--interval', default=float(get_env("OUTBOX_INTERVAL", 10)), show_default=True)
+@click.option('--workers', default=4, show_default=True)
+@with_appcontext
+def run_command(interval, workers):
+    # loop ถาวรสำหรับ worker process; งานเหลือก็วนต่อทันที ไม่ต้องรอ interval
+    while True:
+        stats = drain_once(max_workers=workers)
+        if stats["claimed"]:
+            click.echo(f"{datetime.utcnow().isoformat()} {stats} queue={queue_stats()}")
+        else:
+            time.sleep(interval)
+
+@outbox_cli.command('retry-failed')
+@with_appcontext
+def retry_failed_command():
+    n = (FileDeletion.query.filter_by(status='failed')
+         .update({"status": "pending", "attempts": 0, "next_attempt_at": datetime.utcnow()},
+                 synchronize_session=False))
+    db.session.commit()
+    click.echo(f"requeued {n}")
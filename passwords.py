@@ -0,0 +1,99 @@
+# passwords.py
+# -*- coding: utf-8 -*-
+# hash/verify รหัสผ่านแบบปรับค่าได้ + รันใน thread pool ขนาดจำกัด
+# (login พร้อมกันเยอะ ๆ จะไม่กิน thread/CPU จนหน้าอื่นค้าง: เกินโควตา = ตอบ 429 ทันที ไม่ต่อคิว)
+import os, threading, time
+from concurrent.futures import ThreadPoolExecutor
+import click
+from werkzeug.security import generate_password_hash, check_password_hash
+
+def _env(name, default):
+    # เหมือน utils.get_env (import utils ตรงนี้ไม่ได้: models -> passwords -> utils -> models)
+    v = os.environ.get(name)
+    return v if v not in (None, "", "None") else default
+
+# werkzeug method string เช่น "scrypt:32768:8:1" หรือ "pbkdf2:sha256:600000"
+HASH_METHOD = _env("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+HASH_WORKERS = int(_env("PASSWORD_HASH_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+# login/register ที่กำลัง hash พร้อมกันได้ต่อ worker: ต่ำกว่าจำนวน request thread มาก (thread ที่เหลือทำหน้าอื่น)
+MAX_IN_FLIGHT = int(_env("PASSWORD_HASH_MAX_IN_FLIGHT",
+                         max(1, min(HASH_WORKERS, int(_env("GUNICORN_THREADS", 8)) // 4))))
+RETRY_AFTER_SECONDS = 2
+
+_DEFAULT_PARAMS = {"scrypt": ["32768", "8", "1"], "pbkdf2": ["sha256", "600000"]}
+
+def normalize_method(method):
+    # "scrypt" -> "scrypt:32768:8:1", "pbkdf2:sha256" -> "pbkdf2:sha256:600000" (ตาม default ของ werkzeug)
+    name, *params = method.split(":")
+    defaults = _DEFAULT_PARAMS.get(name, [])
+    return ":".join([name] + params + defaults[len(params):])
+
+class HashBusy(Exception):
+    pass
+
+_pool = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="pwhash")
+_slots = threading.BoundedSemaphore(MAX_IN_FLIGHT)
+
+def _bounded(fn, *args):
+    # เกิน MAX_IN_FLIGHT -> HashBusy ทันที (ไม่ถือ request thread ไว้รอ)
+    if not _slots.acquire(blocking=False):
+        raise HashBusy()
+    try:
+        return _pool.submit(fn, *args).result()
+    finally:
+        _slots.release()
+
+def hash_password(raw, method=None):
+    return generate_password_hash(raw, method=method or HASH_METHOD)
+
+def needs_rehash(pw_hash, method=None):
+    return pw_hash.split("$", 1)[0] != normalize_method(method or HASH_METHOD)
+
+def hash_password_bounded(raw):
+    return _bounded(hash_password, raw)
+
+def verify_password_bounded(pw_hash, raw):
+    return _bounded(check_password_hash, pw_hash, raw)
+
+_dummy = None
+
+def dummy_hash():
+    # ชื่อผู้ใช้ที่ไม่มีในระบบก็ต้อง verify ให้เสียเวลาเท่ากัน (ไม่งั้นจับเวลาแล้วรู้ว่าบัญชีไหนมีจริง)
+    global _dummy
+    if _dummy is None:
+        _dummy = hash_password(os.urandom(16).hex())
+    return _dummy
+
+def _bench_login(pw_hash):
+    try:
+        return verify_password_bounded(pw_hash, "benchmark-password")
+    except HashBusy:
+        return None
+
+@click.command('password-bench')
+@click.option('--method', default=None, help="default = PASSWORD_HASH_METHOD")
+@click.option('--seconds', default=3.0, show_default=True)
+def password_bench_command(method, seconds):
+    """วัด login (verify) ต่อวินาทีต่อ core และผ่าน pool จริง"""
+    method = method or HASH_METHOD
+    pw_hash = hash_password("benchmark-password", method)
+
+    n, started = 0, time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        check_password_hash(pw_hash, "benchmark-password")
+        n += 1
+    per_core = n / (time.perf_counter() - started)
+
+    n, busy, started = 0, 0, time.perf_counter()
+    with ThreadPoolExecutor(max_workers=MAX_IN_FLIGHT * 4) as clients:
+        while time.perf_counter() - started < seconds:
+            futs = [clients.submit(_bench_login, pw_hash) for _ in range(MAX_IN_FLIGHT * 4)]
+            results = [f.result() for f in futs]
+            n += results.count(True)
+            busy += results.count(None)
+    pooled = n / (time.perf_counter() - started)
+
+    click.echo(f"method: {normalize_method(method)}")
+    click.echo(f"single core: {per_core:.1f} logins/s ({1000 / per_core:.1f} ms each)")
+    click.echo(f"pool ({HASH_WORKERS} workers, {MAX_IN_FLIGHT} in flight, {os.cpu_count()} cpus): "
+               f"{pooled:.1f} logins/s, {busy} rejected as busy")
@@ -0,0 +1,172 @@
+# profiling.py
+# -*- coding: utf-8 -*-
+# วัดต่อ request (เปิดด้วย REQUEST_PROFILING=1): จำนวน SQL, เวลา DB, เวลา render Jinja
+# -> header Server-Timing (ดูใน DevTools), log JSON เมื่อช้า/สงสัย N+1, สถิติต่อ route ที่ /_debug/request-stats
+import hmac, json, threading, time
+from collections import Counter, deque
+from flask import g, has_request_context, request, abort, before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from utils import get_env
+
+SLOW_REQUEST_MS = float(get_env("SLOW_REQUEST_MS", 500))
+N_PLUS_ONE_THRESHOLD = int(get_env("N_PLUS_ONE_THRESHOLD", 5))   # statement เดียวกันซ้ำกี่ครั้งถึงเตือน
+SAMPLES_PER_ROUTE = 1000
+
+def enabled():
+    return get_env("REQUEST_PROFILING", "0").lower() in ("1", "true", "yes")
+
+class _RequestProfile:
+    __slots__ = ("started", "queries", "db", "render", "render_started", "render_queries", "statements")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db = 0.0
+        self.render = 0.0
+        self.render_started = None
+        self.render_queries = 0      # query ที่เกิดระหว่าง render = lazy load จาก template
+        self.statements = Counter()
+
+    def suspects(self):
+        return [(stmt, n) for stmt, n in self.statements.most_common() if n >= N_PLUS_ONE_THRESHOLD]
+
+def _current():
+    return g.get("_profile") if has_request_context() else None
+
+# --- SQLAlchemy hooks ---
+
+def _before_cursor(conn, _cursor, _statement, _params, _context, _executemany):
+    if _current() is not None:
+        conn.info.setdefault("_profile_started", []).append(time.perf_counter())
+
+def _after_cursor(conn, _cursor, statement, _params, _context, _executemany):
+    p = _current()
+    stack = conn.info.get("_profile_started")
+    if p is None or not stack:
+        return
+    p.db += time.perf_counter() - stack.pop()
+    p.queries += 1
+    p.statements[statement] += 1
+    if p.render_started is not None:
+        p.render_queries += 1
+
+# --- Jinja hooks ---
+
+def _render_started(_app, **_kw):
+    p = _current()
+    if p is not None and p.render_started is None:
+        p.render_started = time.perf_counter()
+
+def _render_finished(_app, **_kw):
+    p = _current()
+    if p is not None and p.render_started is not None:
+        p.render += time.perf_counter() - p.render_started
+        p.render_started = None
+
+# --- สถิติต่อ route (ใน process นี้) ---
+
+class RouteStats:
+    def __init__(self, samples=SAMPLES_PER_ROUTE):
+        self.samples = samples
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def add(self, endpoint, total_ms, db_ms, render_ms, queries, suspect):
+        with self._lock:
+            s = self._routes.get(endpoint)
+            if s is None:
+                s = self._routes[endpoint] = {"count": 0, "total_ms": 0.0, "db_ms": 0.0, "render_ms": 0.0,
+                                              "queries": 0, "max_ms": 0.0, "n_plus_one": 0,
+                                              "recent": deque(maxlen=self.samples)}
+            s["count"] += 1
+            s["total_ms"] += total_ms
+            s["db_ms"] += db_ms
+            s["render_ms"] += render_ms
+            s["queries"] += queries
+            s["max_ms"] = max(s["max_ms"], total_ms)
+            s["n_plus_one"] += 1 if suspect else 0
+            s["recent"].append(total_ms)
+
+    def snapshot(self):
+        with self._lock:
+            out = {}
+            for endpoint, s in self._routes.items():
+                n, recent = s["count"], sorted(s["recent"])
+                out[endpoint] = {
+                    "count": n,
+                    "mean_ms": round(s["total_ms"] / n, 2),
+                    "p50_ms": round(recent[len(recent) // 2], 2),
+                    "p95_ms": round(recent[min(len(recent) - 1, int(len(recent) * 0.95))], 2),
+                    "max_ms": round(s["max_ms"], 2),
+                    "db_ms": round(s["db_ms"] / n, 2),
+                    "render_ms": round(s["render_ms"] / n, 2),
+                    "queries": round(s["queries"] / n, 2),
+                    "n_plus_one_requests": s["n_plus_one"],
+                }
+            return out
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+stats = RouteStats()
+
+# --- Flask ---
+
+def debug_allowed(app):
+    # PROFILING_TOKEN ต้องตรง (header X-Profiling-Token หรือ ?token=); ไม่ตั้งไว้ = เปิดเฉพาะ debug/testing
+    token = get_env("PROFILING_TOKEN")
+    if token:
+        given = request.headers.get("X-Profiling-Token") or request.args.get("token")
+        return hmac.compare_digest(given or "", token)
+    return app.debug or app.testing
+
+def _server_timing(p, total):
+    return ", ".join((
+        f'db;dur={p.db * 1000:.1f};desc="{p.queries} queries"',
+        f'render;dur={p.render * 1000:.1f}',
+        f'total;dur={total * 1000:.1f}',
+    ))
+
+def init_app(app):
+    if not enabled():
+        return
+    event.listen(Engine, "before_cursor_execute", _before_cursor)
+    event.listen(Engine, "after_cursor_execute", _after_cursor)
+    before_render_template.connect(_render_started, app)
+    template_rendered.connect(_render_finished, app)
+
+    @app.before_request
+    def _start_profile():
+        g._profile = _RequestProfile()
+
+    @app.after_request
+    def _finish_profile(resp):
+        p = g.pop("_profile", None)
+        if p is None:
+            return resp
+        total = time.perf_counter() - p.started
+        resp.headers["Server-Timing"] = _server_timing(p, total)
+        endpoint = request.endpoint or "<unmatched>"
+        suspects = p.suspects()
+        stats.add(endpoint, total * 1000, p.db * 1000, p.render * 1000, p.queries, bool(suspects))
+        reasons = (["slow"] if total * 1000 >= SLOW_REQUEST_MS else []) + (["n_plus_one"] if suspects else [])
+        if reasons:
+            app.logger.warning("request_profile %s", json.dumps({
+                "reasons": reasons, "endpoint": endpoint, "method": request.method, "path": request.path,
+                "status": resp.status_code, "total_ms": round(total * 1000, 1),
+                "db_ms": round(p.db * 1000, 1), "queries": p.queries,
+                "render_ms": round(p.render * 1000, 1), "render_queries": p.render_queries,
+                "n_plus_one": [{"count": n, "statement": stmt[:300]} for stmt, n in suspects],
+            }, ensure_ascii=False))
+        return resp
+
+    @app.get("/_debug/request-stats")
+    def request_stats():
+        if not debug_allowed(app):
+            abort(404)
+        if request.args.get("reset"):
+            stats.reset()
+        return {"routes": stats.snapshot(), "slow_request_ms": SLOW_REQUEST_MS,
+                "n_plus_one_threshold": N_PLUS_ONE_THRESHOLD}
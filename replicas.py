@@ -0,0 +1,132 @@
+# replicas.py
+# -*- coding: utf-8 -*-
+# อ่านจาก read replica (REPLICA_DATABASE_URL) เฉพาะ request GET/HEAD ที่ยังไม่ได้เขียนอะไร
+# - flush / INSERT / UPDATE / DELETE / SELECT ... FOR UPDATE -> primary และใช้ primary ต่อจนจบ request
+#   text() ดูจากคำแรก: ไม่ใช่ SELECT/EXPLAIN ธรรมดา (หรือมี FOR UPDATE / advisory lock) = เขียน
+# - ผู้ใช้ที่เพิ่งเขียน (POST หรือ GET ที่เขียน) อ่านจาก primary ต่ออีก READ_YOUR_WRITES_SECONDS
+# - replica ต่อไม่ได้ -> ใช้ primary ไปก่อน แล้วลองใหม่ทุก REPLICA_RETRY_SECONDS
+# ทดสอบบนเครื่อง: DATABASE_URL=sqlite:///app.db REPLICA_DATABASE_URL=sqlite:///replica.db (สำเนาไฟล์)
+import os, threading, time
+from flask import current_app, has_request_context, request, session
+from flask_sqlalchemy.session import Session as _FlaskSession
+from sqlalchemy import event, exc
+from sqlalchemy.sql.elements import TextClause
+
+def _env(name, default):
+    # เหมือน utils.get_env (import utils ตรงนี้ไม่ได้: models -> replicas -> utils -> models)
+    v = os.environ.get(name)
+    return v if v not in (None, "", "None") else default
+
+BIND_KEY = "replica"
+STICKY_SECONDS = float(_env("READ_YOUR_WRITES_SECONDS", 5))
+RETRY_SECONDS = float(_env("REPLICA_RETRY_SECONDS", 5))
+_READ_METHODS = ("GET", "HEAD")
+
+# --- สุขภาพของ replica (ต่อ process) ---
+
+_lock = threading.Lock()
+_state = {}     # engine -> (ok, monotonic ที่ตรวจ); ยังไม่มี = ยังไม่เคยตรวจ
+
+def mark_down(engine, reason=None):
+    with _lock:
+        was_up = _state.get(engine, (None, 0.0))[0] is not False
+        _state[engine] = (False, time.monotonic())
+    if was_up and reason is not None and has_request_context():
+        current_app.logger.warning("replica unavailable, using primary: %s", reason)
+
+def available(engine):
+    with _lock:
+        ok, checked = _state.get(engine, (None, 0.0))
+    if ok or (ok is False and time.monotonic() - checked < RETRY_SECONDS):
+        return bool(ok)
+    # ครั้งแรก หรือครบเวลาลองใหม่: ต่อจริงหนึ่งครั้งก่อนส่ง query ไป
+    try:
+        with engine.connect() as conn:
+            conn.exec_driver_sql("SELECT 1")
+    except Exception as exc:
+        mark_down(engine, exc)
+        return False
+    with _lock:
+        _state[engine] = (True, time.monotonic())
+    return True
+
+def _on_replica_error(ctx):
+    # query บน replica ล้ม (เช่นขาดกลางทาง) -> request ถัดไปไป primary
+    if ctx.is_disconnect or ctx.connection is None:
+        mark_down(ctx.engine, ctx.original_exception)
+
+# --- session ---
+
+def use_primary():
+    # code ที่อ่านแล้วจะเขียนต่อ (เช่น rebuild summary) เรียกก่อนอ่าน ไม่ให้เขียนจากข้อมูลที่ replica ยังตามไม่ทัน
+    from models import db
+    db.session.info["primary"] = True
+
+_TEXT_READS = ("SELECT", "EXPLAIN")
+
+def _is_text_write(clause):
+    # TextClause.is_dml เป็น False เสมอ: ไม่แน่ใจ = ถือว่าเขียน (ส่ง primary ไม่ผิดแค่ช้ากว่า)
+    sql = clause.text.lstrip().upper()
+    return not sql.startswith(_TEXT_READS) or "FOR UPDATE" in sql or "PG_ADVISORY" in sql
+
+def _is_write(session, clause):
+    return (session._flushing
+            or getattr(clause, "is_dml", False)
+            or getattr(clause, "_for_update_arg", None) is not None
+            or (isinstance(clause, TextClause) and _is_text_write(clause)))
+
+def _sticky():
+    return session.get("_rw_until", 0) > time.time()
+
+class RoutingSession(_FlaskSession):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self._route_to_replica(clause):
+            return self._db.engines[BIND_KEY]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _connection_for_bind(self, engine, execution_options=None, **kw):
+        # ต่อ replica ไม่ติดกลาง request -> ใช้ primary แทนใน query นี้เลย ไม่ต้อง 500
+        try:
+            return super()._connection_for_bind(engine, execution_options, **kw)
+        except exc.DBAPIError as e:
+            replica = self._db.engines.get(BIND_KEY)
+            if replica is None or engine is not replica:
+                raise
+            mark_down(engine, e.orig)
+            self.info["primary"] = True
+            return super()._connection_for_bind(self._db.engines[None], execution_options, **kw)
+
+    def _route_to_replica(self, clause):
+        if not has_request_context() or self.info.get("primary"):
+            return False
+        if _is_write(self, clause):
+            # เขียนแล้ว: อ่านต่อจาก primary จนจบ request และจำไว้ทำ read-your-writes
+            self.info["primary"] = self.info["wrote"] = True
+            return False
+        if request.method not in _READ_METHODS or _sticky():
+            return False
+        engine = self._db.engines.get(BIND_KEY)
+        if engine is None or not available(engine):
+            return False
+        return True
+
+# --- Flask ---
+
+def binds():
+    # ใส่ใน SQLALCHEMY_BINDS ก่อน db.init_app
+    url = _env("REPLICA_DATABASE_URL", None)
+    return {BIND_KEY: url} if url else {}
+
+def init_app(app, db):
+    if BIND_KEY not in app.config.get("SQLALCHEMY_BINDS", {}):
+        return
+    with app.app_context():
+        # สร้าง engine เฉย ๆ ยังไม่ต่อ DB
+        event.listen(db.engines[BIND_KEY], "handle_error", _on_replica_error)
+
+    @app.after_request
+    def _remember_write(resp):
+        wrote = db.session.info.get("wrote") or (request.method not in _READ_METHODS and resp.status_code < 400)
+        if wrote:
+            session["_rw_until"] = time.time() + STICKY_SECONDS
+        return resp
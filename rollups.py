@@ -0,0 +1,202 @@
+# rollups.py
+# -*- coding: utf-8 -*-
+# สรุปรายวันต่อ task / ต่อโปรเจกต์ สำหรับกราฟ burn-up: write path upsert แถวของ "วันนี้" ทีละนิด
+# กราฟอ่านเฉพาะตาราง rollup ไม่ต้องไล่ TaskUpdate ทั้งโปรเจกต์
+import heapq
+from datetime import datetime, timedelta
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import select, func, literal
+from models import db, Task, TaskUpdate, ProjectSummary, TaskDailyRollup, ProjectDailyRollup, TaskArchive
+from summary import TASK_STATUSES
+from utils import get_env, upsert_insert
+import archive
+
+# "วัน" ตามเวลาท้องถิ่นของทีม (default = เวลาไทย UTC+7); เวลาใน DB เป็น UTC
+DAY_OFFSET = timedelta(hours=float(get_env("ROLLUP_UTC_OFFSET_HOURS", 7)))
+
+def day_of(ts):
+    return (ts + DAY_OFFSET).date()
+
+_SNAPSHOT_COLS = ['task_count', 'progress_sum'] + [f"{st}_count" for st in TASK_STATUSES]
+
+# --- incremental (อยู่ transaction เดียวกับ view; เรียกหลัง summary.* เพื่อให้ snapshot ตรงกัน) ---
+
+def record(t, updates=1):
+    record_tasks([(t.id, t.project_id, t.status, t.progress_percent, updates)])
+
+def record_tasks(rows, ts=None):
+    # rows: [(task_id, project_id, status, progress_percent, update_count)]
+    if not rows:
+        return
+    day = day_of(ts or datetime.utcnow())
+    tbl = TaskDailyRollup.__table__
+    stmt = upsert_insert(db.session, tbl)
+    db.session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[tbl.c.task_id, tbl.c.day],
+            set_={"status": stmt.excluded.status,
+                  "progress_percent": stmt.excluded.progress_percent,
+                  "update_count": tbl.c.update_count + stmt.excluded.update_count}),
+        [{"task_id": tid, "day": day, "project_id": pid, "status": st,
+          "progress_percent": prog or 0, "update_count": n} for tid, pid, st, prog, n in rows])
+
+    per_project = {}
+    for _tid, pid, _st, _prog, n in rows:
+        per_project[pid] = per_project.get(pid, 0) + n
+    for pid, n in per_project.items():
+        _snapshot_project(pid, day, n)
+
+def _snapshot_project(project_id, day, updates):
+    # INSERT ... SELECT จาก project_summary (ตัวนับล่าสุด) แล้วบวกจำนวนอัปเดตของวันเข้าไป
+    ps, tbl = ProjectSummary.__table__, ProjectDailyRollup.__table__
+    sel = select(
+        ps.c.project_id, literal(day, type_=tbl.c.day.type),
+        sum(ps.c[f"{st}_count"] for st in TASK_STATUSES), ps.c.progress_sum,
+        *[ps.c[f"{st}_count"] for st in TASK_STATUSES], literal(updates),
+    ).where(ps.c.project_id == project_id)
+    stmt = upsert_insert(db.session, tbl).from_select(['project_id', 'day'] + _SNAPSHOT_COLS + ['update_count'], sel)
+    set_ = {c: stmt.excluded[c] for c in _SNAPSHOT_COLS}
+    set_["update_count"] = tbl.c.update_count + stmt.excluded.update_count
+    db.session.execute(stmt.on_conflict_do_update(index_elements=[tbl.c.project_id, tbl.c.day], set_=set_))
+
+# --- backfill: replay TaskUpdate ตามเวลา (ใช้ตอน migrate / ซ่อม) ---
+
+def _project_events(conn, project_id, batch_size):
+    # task ที่ไม่มีอัปเดตเลย: เกิดวัน last_updated ด้วยค่าปัจจุบัน
+    # task ที่มีอัปเดต: ถือว่าเริ่ม todo/0 ในวันของอัปเดตแรก (Task ไม่มี created_at)
+    task, upd = Task.__table__, TaskUpdate.__table__
+    first = (select(upd.c.task_id, func.min(upd.c.created_at).label("first_at"))
+             .where(upd.c.task_id.in_(select(task.c.id).where(task.c.project_id == project_id)))
+             .group_by(upd.c.task_id).subquery())
+    src, first_at = task.outerjoin(first, first.c.task_id == task.c.id), first.c.first_at
+    if archive.available(conn):
+        # ก่อน migration 8 ยังไม่มีตาราง archive
+        arc = TaskArchive.__table__
+        src = src.outerjoin(arc, arc.c.task_id == task.c.id)
+        first_at = func.coalesce(first.c.first_at, arc.c.first_at)
+    births = []
+    for r in conn.execute(select(task.c.id, task.c.last_updated, task.c.status, task.c.progress_percent,
+                                 first_at.label("first_at"))
+                          .select_from(src)
+                          .where(task.c.project_id == project_id)):
+        if r.first_at is None:
+            births.append((r.last_updated or datetime.utcnow(), 0, r.id, r.status, r.progress_percent, 0))
+        else:
+            births.append((r.first_at, 0, r.id, "todo", 0, 0))
+    births.sort()
+    updates = conn.execute(
+        select(upd.c.created_at, upd.c.id, upd.c.task_id, upd.c.status, upd.c.progress_percent)
+        .join(task, task.c.id == upd.c.task_id)
+        .where(task.c.project_id == project_id)
+        .order_by(upd.c.created_at, upd.c.id)
+        .execution_options(yield_per=batch_size))
+    # task ที่ archive แล้วไม่มีแถว TaskUpdate: เล่นจากก้อน archive แทน (เก็บแค่ค่าที่ใช้ ไม่เก็บเนื้อหา)
+    archived = sorted((datetime.fromisoformat(e["created_at"]), e["id"], tid, e["status"], e["progress_percent"], 1)
+                      for tid, _pid, e in archive.iter_entries(conn, project_id))
+    # birth (id=0) มาก่อนอัปเดตที่เวลาเท่ากัน; อัปเดตนับ 1
+    return heapq.merge(births, ((r.created_at, r.id, r.task_id, r.status, r.progress_percent, 1) for r in updates),
+                       archived, key=lambda e: (e[0], e[1]))
+
+def backfill_project(conn, project_id, batch_size=1000):
+    conn.execute(TaskDailyRollup.__table__.delete().where(TaskDailyRollup.project_id == project_id))
+    conn.execute(ProjectDailyRollup.__table__.delete().where(ProjectDailyRollup.project_id == project_id))
+    state = {}                # task_id -> [status, progress]
+    touched = {}              # task_id -> จำนวนอัปเดตในวันปัจจุบัน
+    task_rows, project_rows = [], []
+    current_day, day_updates = None, 0
+
+    def close_day():
+        for tid, n in touched.items():
+            st, prog = state[tid]
+            task_rows.append({"task_id": tid, "day": current_day, "project_id": project_id,
+                              "status": st, "progress_percent": prog or 0, "update_count": n})
+        row = {"project_id": project_id, "day": current_day, "task_count": len(state),
+               "progress_sum": sum(p or 0 for _s, p in state.values()), "update_count": day_updates}
+        for st in TASK_STATUSES:
+            row[f"{st}_count"] = sum(1 for s, _p in state.values() if s == st)
+        project_rows.append(row)
+        touched.clear()
+
+    for ts, _id, tid, status, prog, counts in _project_events(conn, project_id, batch_size):
+        d = day_of(ts)
+        if d != current_day:
+            if current_day is not None:
+                close_day()
+                if len(task_rows) >= batch_size:
+                    conn.execute(TaskDailyRollup.__table__.insert(), task_rows); task_rows = []
+            current_day, day_updates = d, 0
+        cur = state.setdefault(tid, [status, prog])
+        if counts:
+            if status is not None: cur[0] = status
+            if prog is not None: cur[1] = prog
+        touched[tid] = touched.get(tid, 0) + counts
+        day_updates += counts
+    if current_day is not None:
+        close_day()
+    if task_rows:
+        conn.execute(TaskDailyRollup.__table__.insert(), task_rows)
+    if project_rows:
+        conn.execute(ProjectDailyRollup.__table__.insert(), project_rows)
+    return len(project_rows)
+
+def backfill(conn, project_ids=None, batch_size=1000):
+    if project_ids is None:
+        project_ids = [r[0] for r in conn.execute(select(Task.project_id).distinct())]
+    return sum(backfill_project(conn, pid, batch_size) for pid in project_ids)
+
+# --- read (กราฟ) ---
+
+def _fill(rows, start, end, key, empty):
+    # เติมวันที่ไม่มีแถวด้วยค่าของวันก่อนหน้า (snapshot ไม่เปลี่ยน) แต่จำนวนอัปเดต = 0
+    by_day = {r.day: r for r in rows if r.day >= start}
+    prev = next((r for r in reversed(rows) if r.day < start), None)
+    out, d = [], start
+    while d <= end:
+        r = by_day.get(d)
+        if r is not None:
+            prev = r
+            out.append(key(r, r.update_count))
+        else:
+            out.append(key(prev, 0) if prev is not None else dict(empty))
+        out[-1]["day"] = d.isoformat()
+        d += timedelta(days=1)
+    return out
+
+def _project_point(r, updates):
+    return {"tasks": r.task_count,
+            "avg_progress": round(r.progress_sum / r.task_count, 1) if r.task_count else 0,
+            **{st: getattr(r, f"{st}_count") for st in TASK_STATUSES},
+            "updates": updates}
+
+def project_series(project_id, days=90):
+    end = day_of(datetime.utcnow())
+    start = end - timedelta(days=days - 1)
+    # แถวสุดท้ายก่อน start (ไว้เป็นค่าตั้งต้น) + แถวในช่วง
+    seed = (ProjectDailyRollup.query.filter(ProjectDailyRollup.project_id == project_id,
+                                            ProjectDailyRollup.day < start)
+            .order_by(ProjectDailyRollup.day.desc()).limit(1).all())
+    rows = seed + (ProjectDailyRollup.query.filter(ProjectDailyRollup.project_id == project_id,
+                                                   ProjectDailyRollup.day >= start)
+                   .order_by(ProjectDailyRollup.day).all())
+    empty = {"tasks": 0, "avg_progress": 0, **dict.fromkeys(TASK_STATUSES, 0), "updates": 0}
+    return _fill(rows, start, end, _project_point, empty)
+
+def task_series(task_id, days=90):
+    end = day_of(datetime.utcnow())
+    start = end - timedelta(days=days - 1)
+    seed = (TaskDailyRollup.query.filter(TaskDailyRollup.task_id == task_id, TaskDailyRollup.day < start)
+            .order_by(TaskDailyRollup.day.desc()).limit(1).all())
+    rows = seed + (TaskDailyRollup.query.filter(TaskDailyRollup.task_id == task_id, TaskDailyRollup.day >= start)
+                   .order_by(TaskDailyRollup.day).all())
+    return _fill(rows, start, end,
+                 lambda r, n: {"status": r.status, "progress": r.progress_percent, "updates": n},
+                 {"status": None, "progress": None, "updates": 0})
+
+@click.command('rebuild-rollups')
+@click.option('--project', 'project_ids', type=int, multiple=True, help="เฉพาะโปรเจกต์นี้ (ซ้ำได้)")
+@with_appcontext
+def rebuild_rollups_command(project_ids):
+    with db.engine.begin() as conn:
+        n = backfill(conn, list(project_ids) or None)
+    click.echo(f"rebuilt {n} project-day rollups")
@@ -0,0 +1,209 @@
+# search.py
+# -*- coding: utf-8 -*-
+# ค้นหาชื่องาน/เนื้อหาอัปเดตด้วย inverted index: SQLite = FTS5, Postgres = tsvector + GIN
+# ภาษาไทยไม่มีช่องว่างระหว่างคำ -> ตัดเป็น bigram ของ "ตัวอักษร + สระ/วรรณยุกต์ที่เกาะอยู่"
+import re
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import select, text
+from models import db, Task, TaskUpdate
+import archive
+
+_WORD_RE = re.compile(r"[\u0E00-\u0E7F]+|[^\W_]+")
+_THAI_RE = re.compile(r"[\u0E00-\u0E7F]+")
+# สระบน/ล่าง ไม้ไต่คู้ วรรณยุกต์ การันต์ ฯลฯ (ต้องติดกับตัวอักษรข้างหน้า)
+_THAI_CLUSTER_RE = re.compile(r"[\u0E00-\u0E7F][\u0E31\u0E34-\u0E3A\u0E47-\u0E4E]*")
+
+def tokenize(raw):
+    tokens = []
+    for m in _WORD_RE.finditer((raw or "").lower()):
+        word = m.group()
+        if _THAI_RE.fullmatch(word):
+            clusters = _THAI_CLUSTER_RE.findall(word)
+            tokens.extend(clusters[i] + clusters[i + 1] for i in range(len(clusters) - 1))
+            # พยางค์สุดท้ายเก็บเดี่ยวด้วย ให้ค้นพยางค์เดียวแบบ prefix เจอได้ทุกตำแหน่ง
+            tokens.append(clusters[-1])
+        else:
+            tokens.append(word)
+    return tokens
+
+def _doc_id(kind, ref_id):
+    # id เดียวกันทุก backend: task = 2n, update = 2n+1 (ลบ/แทนที่ด้วย primary key ได้เลย)
+    return ref_id * 2 + (1 if kind == "update" else 0)
+
+def _is_pg(bind):
+    # bind = Session หรือ Connection
+    engine = bind.get_bind() if hasattr(bind, "get_bind") else bind
+    return engine.dialect.name == "postgresql"
+
+def _is_prefix(tok):
+    # คำไทยพยางค์เดียว: ใน index เป็นส่วนหน้าของ bigram -> ค้นแบบ prefix
+    return bool(_THAI_RE.fullmatch(tok)) and len(_THAI_CLUSTER_RE.findall(tok)) == 1
+
+def _tsvector_literal(tokens):
+    positions = {}
+    for i, tok in enumerate(tokens[:16383], start=1):
+        positions.setdefault(tok, []).append(str(i))
+    return " ".join("'%s':%s" % (tok.replace("\\", "\\\\").replace("'", "''"), ",".join(pos))
+                    for tok, pos in positions.items())
+
+def _tsquery_literal(tokens):
+    return " & ".join("'%s'%s" % (tok.replace("\\", "\\\\").replace("'", "''"), ":*" if _is_prefix(tok) else "")
+                      for tok in dict.fromkeys(tokens))
+
+# --- schema ---
+
+def create_schema(conn):
+    if _is_pg(conn):
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS search_document ("
+            " id BIGINT PRIMARY KEY, kind VARCHAR(16) NOT NULL,"
+            " project_id INTEGER NOT NULL, task_id INTEGER NOT NULL, tsv TSVECTOR NOT NULL)"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_search_document_tsv ON search_document USING GIN (tsv)"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_search_document_project ON search_document (project_id)"))
+    else:
+        conn.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5("
+            " body, kind UNINDEXED, project_id UNINDEXED, task_id UNINDEXED,"
+            " tokenize=\"unicode61 remove_diacritics 0 categories 'L* N* Co Mn Mc'\")"))
+
+def _write(bind, rows):
+    # rows: [(kind, ref_id, project_id, task_id, raw_text)]; bind = session หรือ connection
+    if not rows:
+        return
+    if _is_pg(bind):
+        bind.execute(text(
+            "INSERT INTO search_document (id, kind, project_id, task_id, tsv)"
+            " VALUES (:id, :kind, :project_id, :task_id, CAST(:tsv AS tsvector))"
+            " ON CONFLICT (id) DO UPDATE SET project_id = EXCLUDED.project_id,"
+            " task_id = EXCLUDED.task_id, tsv = EXCLUDED.tsv"),
+            [{"id": _doc_id(k, ref), "kind": k, "project_id": pid, "task_id": tid,
+              "tsv": _tsvector_literal(tokenize(raw))} for k, ref, pid, tid, raw in rows])
+    else:
+        params = [{"id": _doc_id(k, ref), "kind": k, "project_id": pid, "task_id": tid,
+                   "body": " ".join(tokenize(raw))} for k, ref, pid, tid, raw in rows]
+        bind.execute(text("DELETE FROM search_index WHERE rowid = :id"), [{"id": p["id"]} for p in params])
+        bind.execute(text(
+            "INSERT INTO search_index (rowid, body, kind, project_id, task_id)"
+            " VALUES (:id, :body, :kind, :project_id, :task_id)"), params)
+
+# --- sync จาก write path (อยู่ transaction เดียวกับ view) ---
+
+def index_task(t):
+    _write(db.session, [("task", t.id, t.project_id, t.id, f"{t.title} {t.assignee_name or ''}")])
+
+def index_tasks(rows):
+    # rows = dict ที่มี id/project_id/title/assignee_name (import ทีละ chunk)
+    _write(db.session, [("task", r["id"], r["project_id"], r["id"], f"{r['title']} {r['assignee_name'] or ''}")
+                        for r in rows])
+
+def index_update(upd, project_id):
+    # ทุกอัปเดตรวมถึงที่ระบบเขียนเอง (เปลี่ยนสถานะ/%) เหมือน backfill; แถวที่ถูกรวมเรียกซ้ำ = แทนที่
+    _write(db.session, [("update", upd.id, project_id, upd.task_id, upd.content)])
+
+def index_updates(rows):
+    # rows = [(update_id, project_id, task_id, content)] (bulk)
+    _write(db.session, [("update", uid, pid, tid, content) for uid, pid, tid, content in rows])
+
+def remove_updates(update_ids):
+    # อัปเดตที่ถูกรวมทิ้ง (coalesce.compact)
+    if not update_ids:
+        return
+    ids = [{"id": _doc_id("update", i)} for i in update_ids]
+    if _is_pg(db.session):
+        db.session.execute(text("DELETE FROM search_document WHERE id = :id"), ids)
+    else:
+        db.session.execute(text("DELETE FROM search_index WHERE rowid = :id"), ids)
+
+def remove_project(project_id):
+    if _is_pg(db.session):
+        return db.session.execute(text("DELETE FROM search_document WHERE project_id = :p"), {"p": project_id}).rowcount
+    return db.session.execute(text("DELETE FROM search_index WHERE project_id = :p"), {"p": project_id}).rowcount
+
+def backfill(conn, batch_size=1000):
+    # สตรีม Task/TaskUpdate ทั้งหมดเป็น batch (ใช้ตอน migrate / reindex)
+    n = 0
+    batch = []
+    # ระบุคอลัมน์เอง: migration 4 รันบน schema เก่า (ยังไม่มีคอลัมน์ที่ migration หลัง ๆ เพิ่ม)
+    task = Task.__table__
+    tasks = conn.execute(select(task.c.id, task.c.project_id, task.c.title, task.c.assignee_name)
+                         .execution_options(yield_per=batch_size))
+    for t in tasks:
+        batch.append(("task", t.id, t.project_id, t.id, f"{t.title} {t.assignee_name or ''}"))
+        if len(batch) >= batch_size:
+            _write(conn, batch); n += len(batch); batch = []
+    upd, task = TaskUpdate.__table__, Task.__table__
+    rows = conn.execute(
+        upd.join(task, task.c.id == upd.c.task_id)
+        .select().with_only_columns(upd.c.id, upd.c.task_id, upd.c.content, task.c.project_id)
+        .execution_options(yield_per=batch_size))
+    for r in rows:
+        batch.append(("update", r.id, r.project_id, r.task_id, r.content))
+        if len(batch) >= batch_size:
+            _write(conn, batch); n += len(batch); batch = []
+    for task_id, project_id, e in archive.iter_entries(conn):
+        batch.append(("update", e["id"], project_id, task_id, e["content"]))
+        if len(batch) >= batch_size:
+            _write(conn, batch); n += len(batch); batch = []
+    _write(conn, batch)
+    return n + len(batch)
+
+# --- query ---
+
+def encode_cursor(score, doc_id):
+    return f"{score!r}_{doc_id}"
+
+def decode_cursor(raw):
+    if not raw: return None
+    try:
+        score, _, doc_id = raw.rpartition('_')
+        return float(score), int(doc_id)
+    except ValueError:
+        return None
+
+def search(user_id, q, cursor=None, limit=20):
+    # ผลเรียงตามคะแนน (น้อย = ดีกว่า) แล้ว id; keyset บน (score, id) เฉพาะโปรเจกต์ที่ผู้ใช้เป็นสมาชิก
+    tokens = tokenize(q)
+    if not tokens:
+        return [], None
+    params = {"uid": user_id, "lim": limit + 1,
+              "has_cursor": 1 if cursor else 0,
+              "cs": cursor[0] if cursor else 0.0, "ci": cursor[1] if cursor else 0}
+    if _is_pg(db.session):
+        params["q"] = _tsquery_literal(tokens)
+        sql = (
+            "SELECT id, kind, project_id, task_id, score FROM ("
+            " SELECT d.id, d.kind, d.project_id, d.task_id,"
+            "  -CAST(ts_rank_cd(d.tsv, CAST(:q AS tsquery)) AS DOUBLE PRECISION) AS score"
+            " FROM search_document d"
+            " WHERE d.tsv @@ CAST(:q AS tsquery)"
+            "  AND d.project_id IN (SELECT project_id FROM project_member WHERE user_id = :uid)) r"
+            " WHERE :has_cursor = 0 OR r.score > :cs OR (r.score = :cs AND r.id > :ci)"
+            " ORDER BY r.score, r.id LIMIT :lim")
+    else:
+        params["q"] = " ".join('"%s"%s' % (tok.replace('"', '""'), " *" if _is_prefix(tok) else "")
+                               for tok in dict.fromkeys(tokens))
+        sql = (
+            "SELECT id, kind, project_id, task_id, score FROM ("
+            " SELECT search_index.rowid AS id, kind, project_id, task_id, bm25(search_index) AS score"
+            " FROM search_index WHERE search_index MATCH :q) r"
+            " WHERE r.project_id IN (SELECT project_id FROM project_member WHERE user_id = :uid)"
+            "  AND (:has_cursor = 0 OR r.score > :cs OR (r.score = :cs AND r.id > :ci))"
+            " ORDER BY r.score, r.id LIMIT :lim")
+    rows = db.session.execute(text(sql), params).all()
+    hits = rows[:limit]
+    next_cursor = encode_cursor(hits[-1].score, hits[-1].id) if len(rows) > limit else None
+    return hits, next_cursor
+
+@click.group('search')
+def search_cli():
+    """Full-text search index"""
+
+@search_cli.command('reindex')
+@with_appcontext
+def reindex_command():
+    with db.engine.begin() as conn:
+        create_schema(conn)
+        conn.execute(text("DELETE FROM search_document" if _is_pg(conn) else "DELETE FROM search_index"))
+        n = backfill(conn)
+    click.echo(f"indexed {n} documents")
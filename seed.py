@@ -0,0 +1,155 @@
+# seed.py
+# -*- coding: utf-8 -*-
+# สร้างข้อมูลจำลองขนาดใหญ่ (ผลเหมือนเดิมทุกครั้งด้วย --seed เดียวกัน) สำหรับ load test / bench.py
+# ใช้กับ DB ว่างเท่านั้น: `flask --app app schema upgrade && flask --app app seed --projects 50`
+# ผู้ใช้ทุกคนรหัสผ่านเดียวกัน (SEED_PASSWORD); user00001 เป็น owner ของโปรเจกต์ 1
+import random
+from datetime import datetime, timedelta
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func, select, text
+from models import db, User, Project, ProjectMember, Task, TaskUpdate, TaskUpdateLink, TaskFile
+from passwords import hash_password
+from summary import TASK_STATUSES, rebuild_project_summaries
+
+SEED_PASSWORD = "benchmark"
+
+_WORDS = ["ออกแบบ", "หน้า", "ระบบ", "ทดสอบ", "แก้ไข", "รายงาน", "ลูกค้า", "ประชุม", "เอกสาร", "ข้อมูล",
+          "login", "api", "deploy", "report", "dashboard", "invoice", "mobile", "review", "fix", "sync"]
+_FILES = [(".pdf", "application/pdf"), (".png", "image/png"), (".jpg", "image/jpeg"),
+          (".docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document"),
+          (".xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")]
+
+class _Writer:
+    # buffer ต่อ table แล้ว executemany ทีละก้อน; flush ตามลำดับ parent -> child ให้ FK ผ่านบน Postgres
+    ORDER = (User, Project, ProjectMember, Task, TaskUpdate, TaskUpdateLink, TaskFile)
+
+    def __init__(self, conn, batch_size):
+        self.conn, self.batch_size = conn, batch_size
+        self.rows = {m: [] for m in self.ORDER}
+        self.counts = dict.fromkeys((m.__tablename__ for m in self.ORDER), 0)
+
+    def add(self, model, row):
+        self.rows[model].append(row)
+        if len(self.rows[model]) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        for m in self.ORDER:
+            if self.rows[m]:
+                self.conn.execute(m.__table__.insert(), self.rows[m])
+                self.counts[m.__tablename__] += len(self.rows[m])
+                self.rows[m] = []
+
+def _sentence(rng, n):
+    return " ".join(rng.choice(_WORDS) for _ in range(n))
+
+def generate(conn, users=50, projects=20, members=8, tasks=40, updates=25,
+             links=0.3, files=0.2, days=120, seed=42, batch_size=1000, echo=None):
+    # links/files = จำนวนเฉลี่ยต่ออัปเดต (0.3 = ~30% ของอัปเดตมีลิงก์)
+    rng = random.Random(seed)
+    now = datetime.utcnow().replace(microsecond=0)
+    start = now - timedelta(days=days)
+    w = _Writer(conn, batch_size)
+    pw_hash = hash_password(SEED_PASSWORD)  # hash ครั้งเดียวใช้ทุกคน (scrypt ช้าโดยตั้งใจ)
+
+    for uid in range(1, users + 1):
+        w.add(User, {"id": uid, "username": f"user{uid:05d}", "display_name": f"User {uid}",
+                     "password_hash": pw_hash, "created_at": start})
+
+    task_id = update_id = link_id = file_id = member_id = 0
+    for pid in range(1, projects + 1):
+        owner = (pid - 1) % users + 1
+        created = start + timedelta(seconds=rng.randrange(days * 86400 // 4 or 1))
+        w.add(Project, {"id": pid, "name": f"Project {pid} {_sentence(rng, 2)}", "status": "in_progress",
+                        "join_code": f"S{pid:07d}", "created_by_id": owner, "created_at": created})
+        others = rng.sample([u for u in range(1, users + 1) if u != owner], min(members - 1, users - 1))
+        for i, uid in enumerate([owner] + others):
+            member_id += 1
+            role = "owner" if i == 0 else ("ba" if i == 1 else "member")
+            w.add(ProjectMember, {"id": member_id, "project_id": pid, "user_id": uid, "role": role,
+                                  "joined_at": created})
+        team = [owner] + others
+
+        for _ in range(tasks):
+            task_id += 1
+            span = (now - created).total_seconds()
+            ts = created + timedelta(seconds=rng.uniform(0, span / 2))
+            status, progress = "todo", 0
+            n_updates = max(0, int(rng.expovariate(1 / updates))) if updates else 0
+            stamps = sorted(ts + timedelta(seconds=rng.uniform(0, (now - ts).total_seconds()))
+                            for _ in range(n_updates))
+            task_updates = []
+            for at in stamps:
+                update_id += 1
+                upd = {"id": update_id, "task_id": task_id, "author_id": rng.choice(team),
+                       "content": _sentence(rng, rng.randint(3, 30)), "progress_percent": None,
+                       "status": None, "created_at": at}
+                if rng.random() < 0.4:
+                    progress = min(100, progress + rng.randint(5, 25))
+                    upd["progress_percent"] = progress
+                if rng.random() < 0.2:
+                    status = "done" if progress == 100 else rng.choice(TASK_STATUSES)
+                    upd["status"] = status
+                task_updates.append(upd)
+            w.add(Task, {"id": task_id, "project_id": pid, "title": _sentence(rng, rng.randint(2, 6)),
+                         "assignee_name": f"User {rng.choice(team)}", "progress_percent": progress,
+                         "last_updated": stamps[-1] if stamps else ts, "status": status,
+                         "created_by_id": rng.choice(team)})
+            for upd in task_updates:
+                w.add(TaskUpdate, upd)
+                for _ in range(int(links) + (rng.random() < links % 1)):
+                    link_id += 1
+                    w.add(TaskUpdateLink, {"id": link_id, "task_update_id": upd["id"], "title": None,
+                                           "url": f"https://example.com/{pid}/{upd['id']}/{link_id}",
+                                           "created_at": upd["created_at"]})
+                for _ in range(int(files) + (rng.random() < files % 1)):
+                    file_id += 1
+                    ext, ctype = rng.choice(_FILES)
+                    w.add(TaskFile, {"id": file_id, "task_id": task_id, "task_update_id": upd["id"],
+                                     "file_name": f"file{file_id}{ext}", "content_type": ctype,
+                                     "size_bytes": rng.randint(10_000, 5_000_000), "provider": "seed",
+                                     "public_id": None, "secure_url": f"https://example.com/f/{file_id}{ext}",
+                                     "created_at": upd["created_at"]})
+        if echo and pid % 10 == 0:
+            echo(f"  {pid}/{projects} projects")
+    w.flush()
+    return w.counts
+
+def _reset_sequences(conn):
+    # ใส่ id เองแล้ว sequence ของ Postgres ไม่ขยับตาม
+    for m in _Writer.ORDER:
+        t = m.__tablename__
+        conn.execute(text(f"SELECT setval(pg_get_serial_sequence('\"{t}\"', 'id'), "
+                          f"COALESCE((SELECT MAX(id) FROM \"{t}\"), 0) + 1, false)"))
+
+@click.command('seed')
+@click.option('--users', default=50, show_default=True)
+@click.option('--projects', default=20, show_default=True)
+@click.option('--members', default=8, show_default=True, help="สมาชิกต่อโปรเจกต์ (รวม owner)")
+@click.option('--tasks', default=40, show_default=True, help="งานต่อโปรเจกต์")
+@click.option('--updates', default=25, show_default=True, help="อัปเดตเฉลี่ยต่องาน")
+@click.option('--links', default=0.3, show_default=True, help="ลิงก์เฉลี่ยต่ออัปเดต")
+@click.option('--files', default=0.2, show_default=True, help="ไฟล์เฉลี่ยต่ออัปเดต")
+@click.option('--days', default=120, show_default=True, help="ช่วงเวลาย้อนหลังของข้อมูล")
+@click.option('--seed', 'seed_', default=42, show_default=True)
+@with_appcontext
+def seed_command(users, projects, members, tasks, updates, links, files, days, seed_):
+    """เติมข้อมูลจำลองลง DB ว่าง"""
+    import rollups, search, sync
+    if db.session.execute(select(func.count(User.id))).scalar():
+        raise click.ClickException("database is not empty; seed needs a fresh schema")
+    db.session.remove()
+    with db.engine.begin() as conn:
+        counts = generate(conn, users, projects, members, tasks, updates, links, files, days, seed_,
+                          echo=click.echo)
+        if conn.dialect.name == "postgresql":
+            _reset_sequences(conn)
+    rebuild_project_summaries()
+    db.session.commit()
+    with db.engine.begin() as conn:
+        search.backfill(conn)
+        rollups.backfill(conn)
+        sync.backfill(conn)
+    click.echo(" ".join(f"{k}={v}" for k, v in counts.items()))
+    click.echo(f"login: user00001 / {SEED_PASSWORD}")
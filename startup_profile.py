@@ -0,0 +1,45 @@
+# startup_profile.py
+# -*- coding: utf-8 -*-
+# วัดเวลา import ต่อโมดูลตอน boot (เทียบ cold start ของ gunicorn worker)
+# ใช้: `flask --app app startup-profile` หรือ `python startup_profile.py`
+import os, re, subprocess, sys, time
+import click
+
+_LINE_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$")
+
+def profile_imports(target="app", python=sys.executable):
+    # รันใน process ใหม่ด้วย -X importtime เพื่อไม่ให้ cache ของ process ปัจจุบันบิดตัวเลข
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [python, "-X", "importtime", "-c", f"import {target}"],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    wall = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr else "import failed")
+    rows = []
+    for line in proc.stderr.splitlines():
+        m = _LINE_RE.match(line)
+        if m:
+            self_us, cum_us, indent, name = m.groups()
+            rows.append((name, int(self_us), int(cum_us), len(indent) // 2))
+    return rows, wall
+
+def report(target="app", top=25, echo=print):
+    rows, wall = profile_imports(target)
+    total = next((cum for name, _s, cum, _d in rows if name == target), 0)
+    echo(f"{target}: import {total / 1000:.1f} ms, process wall {wall * 1000:.0f} ms")
+    echo(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for name, self_us, cum_us, depth in sorted(rows, key=lambda r: -r[2])[:top]:
+        echo(f"{cum_us / 1000:14.1f} {self_us / 1000:9.1f}  {'  ' * min(depth, 6)}{name}")
+    return rows
+
+@click.command('startup-profile')
+@click.option('--module', 'target', default="app", show_default=True)
+@click.option('--top', default=25, show_default=True)
+def startup_profile_command(target, top):
+    """รายงานเวลา import ต่อโมดูลของแอป"""
+    report(target, top, echo=click.echo)
+
+if __name__ == "__main__":
+    startup_profile_command()
@@ -0,0 +1,244 @@
+# storage.py
+# -*- coding: utf-8 -*-
+# ที่เก็บไฟล์แนบ เลือกตาม TaskFile.provider: "local" (ดิสก์ของเครื่อง ใช้ offline ได้), "cloudinary"
+# หรือคลาสเองผ่าน STORAGE_BACKEND="module.Class" (ต้องมี name/save/path/url/delete_batch แบบเดียวกัน)
+# ไม่ตั้ง STORAGE_BACKEND: มี CLOUDINARY_* ครบ -> cloudinary (prod), ไม่มี -> local (dev/offline)
+# local ต้องมีดิสก์ถาวร: ดิสก์ของ Render หายทุก deploy และ worker คนละเครื่องมองไม่เห็นไฟล์
+# อัปโหลดฝั่ง server เป็นก้อน ๆ ต่อได้ (resumable): สะสมในไฟล์ staging บนดิสก์ แล้ว save() ตอนครบ
+import importlib, os, shutil, time, zipfile
+from datetime import datetime, timedelta
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from utils import get_env, cloudinary_uploader, is_cloudinary_delete_enabled
+
+MAX_FILE_BYTES = 10 * 1024 * 1024
+CHUNK_MAX_BYTES = int(get_env("UPLOAD_CHUNK_MAX_BYTES", 2 * 1024 * 1024))
+COPY_BLOCK = 64 * 1024
+
+# นามสกุล -> (content type, ลายเซ็นต้นไฟล์, ไฟล์ที่ต้องมีใน zip สำหรับ Office)
+FILE_TYPES = {
+    ".png": ("image/png", b"\x89PNG\r\n\x1a\n", None),
+    ".jpg": ("image/jpeg", b"\xff\xd8\xff", None),
+    ".jpeg": ("image/jpeg", b"\xff\xd8\xff", None),
+    ".pdf": ("application/pdf", b"%PDF-", None),
+    ".docx": ("application/vnd.openxmlformats-officedocument.wordprocessingml.document", b"PK\x03\x04",
+              "word/document.xml"),
+    ".xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", b"PK\x03\x04",
+              "xl/workbook.xml"),
+}
+
+def file_ext(name):
+    return os.path.splitext((name or "").lower())[1]
+
+def sniff(path, file_name):
+    # ตรวจเนื้อไฟล์จริงว่าตรงกับนามสกุล; คืน content type หรือ None
+    spec = FILE_TYPES.get(file_ext(file_name))
+    if spec is None:
+        return None
+    content_type, magic, member = spec
+    with open(path, "rb") as fh:
+        if fh.read(len(magic)) != magic:
+            return None
+    if member:
+        try:
+            with zipfile.ZipFile(path) as zf:
+                if member not in zf.namelist():
+                    return None
+        except zipfile.BadZipFile:
+            return None
+    return content_type
+
+# --- staging (ไฟล์ที่อัปโหลดยังไม่ครบ) ---
+
+ROOT_MARKER = ".storage-root"   # มีไฟล์นี้ = root อยู่บนเครื่องนี้จริง (ไม่ใช่โฟลเดอร์ว่างของ process อื่น)
+
+def _root():
+    return get_env("STORAGE_LOCAL_ROOT") or os.path.join(current_app.instance_path, "uploads")
+
+def _claim_root():
+    # เรียกตอนเขียนไฟล์ลง root ครั้งแรก
+    root = _root()
+    marker = os.path.join(root, ROOT_MARKER)
+    if not os.path.exists(marker):
+        os.makedirs(root, exist_ok=True)
+        open(marker, "a").close()
+    return root
+
+def owns_root():
+    # process นี้เห็น root เดียวกับที่ web เขียนไฟล์ไหม (worker คนละ service จะไม่เห็น)
+    return os.path.isfile(os.path.join(_root(), ROOT_MARKER))
+
+def staging_path(upload_id):
+    d = os.path.join(_claim_root(), ".partial")
+    os.makedirs(d, exist_ok=True)
+    return os.path.join(d, upload_id)
+
+def staged_size(upload_id):
+    try:
+        return os.path.getsize(staging_path(upload_id))
+    except FileNotFoundError:
+        return 0
+
+def append_chunk(upload_id, offset, stream, limit):
+    # เขียนต่อท้ายที่ offset ทีละ block (หน่วยความจำคงที่); เกิน limit -> ตัดทิ้งกลับไปที่ offset แล้ว ValueError
+    path = staging_path(upload_id)
+    with open(path, "r+b" if os.path.exists(path) else "w+b") as fh:
+        fh.seek(offset)
+        fh.truncate()
+        written = 0
+        while True:
+            block = stream.read(COPY_BLOCK)
+            if not block:
+                break
+            written += len(block)
+            if offset + written > limit:
+                fh.truncate(offset)
+                raise ValueError("upload exceeds declared size")
+            fh.write(block)
+    return offset + written
+
+def discard(upload_id):
+    try:
+        os.remove(staging_path(upload_id))
+    except FileNotFoundError:
+        pass
+
+# --- backends ---
+
+class LocalStorage:
+    name = "local"
+
+    def _path(self, key):
+        root = os.path.abspath(_root())
+        path = os.path.abspath(os.path.join(root, key))
+        if not path.startswith(root + os.sep):
+            raise ValueError("invalid storage key")
+        return path
+
+    def save(self, staged, key, content_type):
+        # คืน (public_id, secure_url); local ไม่มี URL ภายนอก ดาวน์โหลดผ่าน /files/<id>
+        _claim_root()
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.move(staged, path)
+        return key, None
+
+    def path(self, key):
+        # ไฟล์บนดิสก์ (ส่งด้วย send_file/X-Sendfile ได้); None = ต้อง redirect ไป url()
+        p = self._path(key)
+        return p if os.path.exists(p) else None
+
+    def url(self, f):
+        return None
+
+    def can_delete(self):
+        return True
+
+    def can_drain(self):
+        return owns_root()
+
+    def delete_batch(self, public_ids, resource_type="raw"):
+        # ไม่เห็น root = ไม่รู้ว่าไฟล์หายจริงหรือแค่อยู่อีกเครื่อง -> ห้ามรายงานว่าลบแล้ว
+        if not owns_root():
+            return {key: "storage root is not on this machine" for key in public_ids}
+        out = {}
+        for key in public_ids:
+            try:
+                os.remove(self._path(key))
+                out[key] = None
+            except FileNotFoundError:
+                out[key] = None
+            except (OSError, ValueError) as e:
+                out[key] = str(e)
+        return out
+
+class CloudinaryStorage:
+    name = "cloudinary"
+
+    def save(self, staged, key, content_type):
+        # upload_large ส่งจากไฟล์บนดิสก์เป็นก้อน ๆ (ไม่โหลดทั้งไฟล์เข้าหน่วยความจำ)
+        try:
+            res = cloudinary_uploader().upload_large(staged, public_id=key, resource_type="raw")
+        finally:
+            os.remove(staged)
+        return res["public_id"], res["secure_url"]
+
+    def path(self, key):
+        return None
+
+    def url(self, f):
+        return f.secure_url
+
+    def can_delete(self):
+        return is_cloudinary_delete_enabled()
+
+    def can_drain(self):
+        return self.can_delete()
+
+    def delete_batch(self, public_ids, resource_type="raw"):
+        from outbox import CloudinaryDeleter
+        return CloudinaryDeleter().delete_batch(public_ids, resource_type=resource_type)
+
+_BUILTIN = {"local": LocalStorage, "cloudinary": CloudinaryStorage}
+_backends = {}
+
+def default_name():
+    # ที่เก็บสำหรับอัปโหลดใหม่
+    name = get_env("STORAGE_BACKEND")
+    if name:
+        return name
+    return "cloudinary" if get_env("CLOUDINARY_CLOUD_NAME") and is_cloudinary_delete_enabled() else "local"
+
+def backend(name=None):
+    # name = TaskFile.provider; None = ที่เก็บสำหรับอัปโหลดใหม่ (default_name)
+    name = name or default_name()
+    b = _backends.get(name)
+    if b is None:
+        if name in _BUILTIN:
+            b = _BUILTIN[name]()
+        elif "." in name:
+            mod, _, cls = name.rpartition(".")
+            b = getattr(importlib.import_module(mod), cls)()
+        else:
+            return None  # provider ที่ไม่รู้จัก (ข้อมูลเก่า/seed): ใช้ secure_url อย่างเดียว
+        _backends[name] = _backends[b.name] = b
+    return b
+
+def deletable_providers():
+    return [name for name in _BUILTIN if backend(name).can_delete()]
+
+def undrainable_providers():
+    # provider ที่ process นี้ลบให้ไม่ได้ (เช่น local จาก worker ที่ไม่มีดิสก์ของ web) -> ปล่อยค้างไว้ให้ process ที่ทำได้
+    return [name for name in _BUILTIN if not backend(name).can_drain()]
+
+def set_backend(name, b):
+    _backends[name] = b
+
+# --- CLI ---
+
+@click.group('storage')
+def storage_cli():
+    """ที่เก็บไฟล์แนบ"""
+
+@storage_cli.command('cleanup')
+@click.option('--hours', default=24, show_default=True, help="ลบอัปโหลดที่ค้างนานกว่านี้")
+@with_appcontext
+def cleanup_command(hours):
+    from models import db, FileUpload
+    cutoff = datetime.utcnow() - timedelta(hours=hours)
+    stale = FileUpload.query.filter(FileUpload.updated_at < cutoff).all()
+    for up in stale:
+        discard(up.id)
+        db.session.delete(up)
+    db.session.commit()
+    # ไฟล์ staging ที่ไม่มีแถวแล้ว (เช่น ล้มระหว่าง save)
+    d = os.path.join(_root(), ".partial")
+    orphans = 0
+    if os.path.isdir(d):
+        known = {u.id for u in FileUpload.query.with_entities(FileUpload.id)}
+        for name in os.listdir(d):
+            p = os.path.join(d, name)
+            if name not in known and os.path.getmtime(p) < time.time() - hours * 3600:
+                os.remove(p); orphans += 1
+    click.echo(f"removed {len(stale)} stale uploads, {orphans} orphan files")
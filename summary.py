@@ -0,0 +1,118 @@
+# summary.py
+# -*- coding: utf-8 -*-
+# ตัวนับสถานะงาน/สมาชิกต่อโปรเจกต์ (ProjectSummary) แบบอัปเดตทีละนิดในคำสั่งเขียนเดิม
+import click
+from flask.cli import with_appcontext
+from datetime import datetime
+from sqlalchemy import func, update
+from models import db, Project, Task, ProjectMember, ProjectSummary
+from replicas import use_primary
+from utils import upsert_insert
+
+TASK_STATUSES = ("todo", "doing", "done", "blocked")
+
+def _status_col(status):
+    return f"{status}_count" if status in TASK_STATUSES else None
+
+def _apply(project_id, deltas):
+    # UPDATE ... SET x = x + n (atomic); ถ้ายังไม่มีแถว summary ให้นับใหม่จากข้อมูลที่ flush แล้ว
+    deltas = {col: n for col, n in deltas.items() if col is not None and n}
+    if not deltas:
+        return
+    values = {col: getattr(ProjectSummary, col) + n for col, n in deltas.items()}
+    values['updated_at'] = datetime.utcnow()
+    res = db.session.execute(
+        update(ProjectSummary)
+        .where(ProjectSummary.project_id == project_id)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    if res.rowcount == 0:
+        rebuild_project_summaries([project_id])
+
+def task_added(project_id, status="todo"):
+    _apply(project_id, {_status_col(status): 1})
+
+def tasks_added(project_id, statuses, progress_sum=0):
+    # statuses = {status: จำนวน} (import ทีละ chunk)
+    deltas = {'progress_sum': progress_sum}
+    for st, n in statuses.items():
+        col = _status_col(st)
+        if col:
+            deltas[col] = deltas.get(col, 0) + n
+    _apply(project_id, deltas)
+
+def task_removed(project_id, status):
+    _apply(project_id, {_status_col(status): -1})
+
+def task_status_changed(project_id, old, new):
+    if old == new:
+        return
+    _apply(project_id, {_status_col(old): -1, _status_col(new): 1})
+
+def task_progress_changed(project_id, old, new):
+    _apply(project_id, {'progress_sum': (new or 0) - (old or 0)})
+
+def task_statuses_changed(project_id, changes, progress_delta=0):
+    # หลาย task ในโปรเจกต์เดียว -> UPDATE ครั้งเดียว; changes = [(old, new), ...]
+    deltas = {'progress_sum': progress_delta}
+    for old, new in changes:
+        if old == new:
+            continue
+        for col, n in ((_status_col(old), -1), (_status_col(new), 1)):
+            if col is not None:
+                deltas[col] = deltas.get(col, 0) + n
+    _apply(project_id, deltas)
+
+def member_added(project_id):
+    _apply(project_id, {'member_count': 1})
+
+def member_removed(project_id):
+    _apply(project_id, {'member_count': -1})
+
+def rebuild_project_summaries(project_ids=None):
+    # นับใหม่ทั้งหมดจาก Task/ProjectMember (ใช้ซ่อมหรือเติมให้โปรเจกต์เก่า) — ไม่ commit เอง
+    # upsert ทับค่าเดิม (ไม่ DELETE+INSERT): สอง request ที่เติมโปรเจกต์เดียวกันพร้อมกันไม่ชน primary key
+    use_primary()  # นับจาก primary เสมอ (อาจถูกเรียกใน GET ที่อ่านจาก replica)
+    sq = db.session.query(Task.project_id, Task.status, func.count(Task.id),
+                          func.coalesce(func.sum(Task.progress_percent), 0))
+    mq = db.session.query(ProjectMember.project_id, func.count(ProjectMember.id))
+    if project_ids is None:
+        # ทั้งระบบ: ทุกโปรเจกต์ได้แถว (รวมที่ไม่มี task/สมาชิกเหลือ -> ศูนย์)
+        project_ids = [pid for (pid,) in db.session.query(Project.id)]
+    else:
+        project_ids = list(project_ids)
+        sq = sq.filter(Task.project_id.in_(project_ids))
+        mq = mq.filter(ProjectMember.project_id.in_(project_ids))
+    if not project_ids:
+        return 0
+
+    now = datetime.utcnow()
+    zero = {f"{st}_count": 0 for st in TASK_STATUSES}
+    zero.update(member_count=0, progress_sum=0, updated_at=now)
+    rows = {pid: dict(zero, project_id=pid) for pid in project_ids}
+    for pid, cnt in mq.group_by(ProjectMember.project_id).all():
+        if pid in rows:
+            rows[pid]['member_count'] = cnt
+    for pid, st, cnt, progress in sq.group_by(Task.project_id, Task.status).all():
+        if pid not in rows:
+            continue  # แถวกำพร้า (SQLite ไม่บังคับ FK)
+        rows[pid]['progress_sum'] += progress
+        if st in TASK_STATUSES:
+            rows[pid][f"{st}_count"] = cnt
+
+    tbl = ProjectSummary.__table__
+    stmt = upsert_insert(db.session, tbl)
+    db.session.execute(
+        stmt.on_conflict_do_update(index_elements=[tbl.c.project_id],
+                                   set_={c: stmt.excluded[c] for c in zero}),
+        list(rows.values()))
+    return len(rows)
+
+@click.command('rebuild-summaries')
+@with_appcontext
+def rebuild_summaries_command():
+    """นับ ProjectSummary ใหม่ทั้งหมดจากตาราง Task/ProjectMember"""
+    n = rebuild_project_summaries()
+    db.session.commit()
+    click.echo(f"rebuilt {n} project summaries")
@@ -0,0 +1,179 @@
+# sync.py
+# -*- coding: utf-8 -*-
+# Delta sync: write path บันทึก (kind, ref_id, upsert|delete) ลง ChangeLog ใน transaction เดียวกัน
+# client ส่ง token (ตำแหน่งล่าสุดที่เห็น) กลับมาที่ /api/sync แล้วได้เฉพาะแถวที่เปลี่ยน + tombstone ของที่ถูกลบ
+# - ไม่มีอะไรใหม่ = query เดียวบน index (project_id|user_id, txid, seq)
+# - ลำดับ: Postgres จอง seq ก่อน commit -> transaction ที่จองทีหลังอาจ commit ก่อน ถ้าเดินตาม seq อย่างเดียว
+#   client จะข้ามแถวที่ commit ช้า จึงเรียงตาม (txid, seq) และส่งเฉพาะแถวของ transaction ที่ txid ต่ำกว่า xmin
+#   ของ snapshot ปัจจุบัน (จบหมดแล้ว ไม่มีแถวใหม่แทรกข้างหลังได้) — ไม่ต้องล็อก writer ทุกคนไว้คิวเดียว
+# - เข้าโปรเจกต์ใหม่ (project upsert ของผู้ใช้เอง) -> client ดึง ?project=<id>&since=0 เพื่อเอาข้อมูลเดิมทั้งหมด
+from datetime import datetime
+from sqlalchemy import select, func, or_, and_, literal, String, BigInteger
+from sqlalchemy.orm import aliased
+from models import db, ChangeLog, Project, ProjectMember, Task, TaskUpdate, TaskFile
+from utils import get_env
+import archive
+
+PAGE_SIZE = int(get_env("SYNC_PAGE_SIZE", 500))
+MAX_PAGE_SIZE = 1000
+UPSERT, DELETE = "upsert", "delete"
+
+# kind -> (ชื่อใน response, model, ฟิลด์ที่ขอได้)
+KINDS = {
+    "project": ("projects", Project, ("id", "name", "created_at")),
+    "member": ("members", ProjectMember, ("id", "project_id", "user_id", "role", "joined_at")),
+    "task": ("tasks", Task, ("id", "project_id", "title", "assignee_name", "status", "progress_percent",
+                             "last_updated")),
+    "update": ("updates", TaskUpdate, ("id", "task_id", "author_id", "content", "status", "progress_percent",
+                                       "created_at", "edited_at")),
+    "file": ("files", TaskFile, ("id", "task_id", "task_update_id", "file_name", "content_type", "size_bytes",
+                                 "created_at")),
+}
+_KIND_OF = {plural: kind for kind, (plural, _m, _f) in KINDS.items()}
+
+# --- write path ---
+
+def _txid():
+    # transaction ปัจจุบัน (Postgres); SQLite เขียนทีละคนอยู่แล้ว seq = ลำดับ commit
+    return func.txid_current() if db.engine.dialect.name == "postgresql" else literal(0, BigInteger)
+
+def record(project_id, kind, ref_ids, op=UPSERT, user_id=None):
+    # เรียกก่อน commit ของ write path; ref_ids = id เดียวหรือหลาย id
+    if isinstance(ref_ids, int):
+        ref_ids = (ref_ids,)
+    if not ref_ids:
+        return
+    now = datetime.utcnow()
+    db.session.execute(ChangeLog.__table__.insert().values(txid=_txid()), [
+        {"project_id": project_id, "user_id": user_id, "kind": kind, "ref_id": ref_id, "op": op, "created_at": now}
+        for ref_id in ref_ids
+    ])
+
+def project_deleted(project_id):
+    # เรียกใน purge ก่อนลบสมาชิก: log เดิมของโปรเจกต์ไม่มีใครอ่านได้แล้ว เหลือ tombstone ให้สมาชิกทุกคน
+    db.session.execute(ChangeLog.__table__.delete().where(ChangeLog.project_id == project_id))
+    db.session.execute(ChangeLog.__table__.insert().from_select(
+        ["project_id", "user_id", "kind", "ref_id", "op", "created_at", "txid"],
+        select(ProjectMember.project_id, ProjectMember.user_id, literal("project", String),
+               ProjectMember.project_id, literal(DELETE, String), literal(datetime.utcnow()), _txid())
+        .where(ProjectMember.project_id == project_id)))
+
+def backfill(conn):
+    # ตอนเปิดใช้: ทุกแถวที่มีอยู่เป็น upsert หนึ่งครั้ง (since=0 จึงได้ข้อมูลครบ)
+    cols = ["project_id", "kind", "ref_id", "op", "created_at"]
+    upsert = literal(UPSERT, String)
+    sources = (
+        select(Project.id, literal("project", String), Project.id, upsert, Project.created_at),
+        select(ProjectMember.project_id, literal("member", String), ProjectMember.id, upsert, ProjectMember.joined_at),
+        select(Task.project_id, literal("task", String), Task.id, upsert, Task.last_updated),
+        select(Task.project_id, literal("update", String), TaskUpdate.id, upsert, TaskUpdate.created_at)
+        .join(Task, Task.id == TaskUpdate.task_id),
+        select(Task.project_id, literal("file", String), TaskFile.id, upsert, TaskFile.created_at)
+        .join(Task, Task.id == TaskFile.task_id),
+    )
+    for src in sources:
+        conn.execute(ChangeLog.__table__.insert().from_select(cols, src))
+
+def compact():
+    # เหลือรายการล่าสุดตามลำดับ (txid, seq) ต่อ (ผู้เห็น, kind, ref_id): client ที่ token เก่ากว่าก็ยังได้รายการนั้นอยู่ดี
+    # seq ไม่ถูกใช้ซ้ำ (autoincrement) token ที่ client ถืออยู่จึงยังใช้ได้
+    cl = ChangeLog.__table__
+    newer = aliased(ChangeLog)
+    superseded = (select(newer.seq)
+                  .where(newer.project_id == cl.c.project_id, newer.kind == cl.c.kind, newer.ref_id == cl.c.ref_id,
+                         or_(newer.user_id == cl.c.user_id, and_(newer.user_id.is_(None), cl.c.user_id.is_(None))),
+                         or_(newer.txid > cl.c.txid, and_(newer.txid == cl.c.txid, newer.seq > cl.c.seq)))
+                  .exists())
+    return db.session.execute(cl.delete().where(superseded)).rowcount
+
+# --- read path ---
+
+def parse_token(raw):
+    # token = "<txid>.<seq>" ของแถวล่าสุดที่ client เห็น ("<seq>" อย่างเดียว = txid 0); ว่าง = เริ่มใหม่ทั้งหมด
+    if raw in (None, ""):
+        return (0, 0)
+    txid, _, seq = raw.rpartition(".")
+    try:
+        since = (int(txid or 0), int(seq))
+    except ValueError:
+        raise ValueError("invalid sync token")
+    if min(since) < 0:
+        raise ValueError("invalid sync token")
+    return since
+
+def format_token(txid, seq):
+    return f"{txid}.{seq}" if txid else str(seq)
+
+def parse_fields(args):
+    # ?fields[tasks]=id,status,progress_percent -> {"task": ("id", "status", "progress_percent")}
+    out = {}
+    for key, value in args.items():
+        if not (key.startswith("fields[") and key.endswith("]")):
+            continue
+        kind = _KIND_OF.get(key[7:-1])
+        if kind is None:
+            raise ValueError(f"unknown type {key[7:-1]!r}")
+        names = tuple(dict.fromkeys(n.strip() for n in value.split(",") if n.strip()))
+        unknown = [n for n in names if n not in KINDS[kind][2]]
+        if unknown:
+            raise ValueError(f"unknown field(s) for {key[7:-1]}: {', '.join(unknown)}")
+        out[kind] = tuple(dict.fromkeys(("id",) + names))   # id ต้องมีเสมอ
+    return out
+
+def _json(v):
+    return v.isoformat() if isinstance(v, datetime) else v
+
+def _load(kind, ids, names):
+    model = KINDS[kind][1]
+    stmt = select(*[getattr(model, n) for n in names]).where(model.id.in_(ids))
+    found = {r[0]: dict(zip(names, map(_json, r))) for r in db.session.execute(stmt)}
+    missing = [i for i in ids if i not in found]
+    if kind == "update" and missing:
+        # อัปเดตของ task ที่ archive แล้ว ไม่ได้ถูกลบ
+        for upd_id, (task_id, e) in archive.find_updates(missing).items():
+            found[upd_id] = {n: task_id if n == "task_id" else e[n] for n in names}
+    return found
+
+def changes(user_id, since=(0, 0), project_id=None, limit=PAGE_SIZE, fields=None):
+    # since = parse_token(); project_id=None = ทุกโปรเจกต์ที่เป็นสมาชิก + tombstone ส่วนตัว (ออก/ถูกลบโปรเจกต์)
+    # คนเรียกต้องตรวจสมาชิกของ project_id เอง
+    fields = fields or {}
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    txid, seq = since
+    stmt = (select(ChangeLog.txid, ChangeLog.seq, ChangeLog.kind, ChangeLog.ref_id, ChangeLog.op)
+            .where(or_(ChangeLog.txid > txid, and_(ChangeLog.txid == txid, ChangeLog.seq > seq))))
+    if db.engine.dialect.name == "postgresql":
+        # เฉพาะ transaction ที่จบหมดแล้ว (ที่ยังไม่ commit อาจได้ตำแหน่งก่อนแถวที่ส่งไปแล้ว)
+        stmt = stmt.where(ChangeLog.txid < func.txid_snapshot_xmin(func.txid_current_snapshot()))
+    if project_id is not None:
+        stmt = stmt.where(ChangeLog.project_id == project_id,
+                          or_(ChangeLog.user_id.is_(None), ChangeLog.user_id == user_id))
+    else:
+        mine = select(ProjectMember.project_id).where(ProjectMember.user_id == user_id)
+        stmt = stmt.where(or_(and_(ChangeLog.user_id.is_(None), ChangeLog.project_id.in_(mine)),
+                              ChangeLog.user_id == user_id))
+    rows = db.session.execute(stmt.order_by(ChangeLog.txid, ChangeLog.seq).limit(limit + 1)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    out = {"token": format_token(*((rows[-1].txid, rows[-1].seq) if rows else since)), "has_more": has_more}
+    if not rows:
+        return out
+
+    # หลายรายการของแถวเดียวกันในหน้านี้ เอาอันล่าสุด
+    latest = {}
+    for r in rows:
+        latest[(r.kind, r.ref_id)] = r.op
+    deleted = {}
+    for kind, (plural, _model, allowed) in KINDS.items():
+        refs = [ref for (k, ref), op in latest.items() if k == kind and op == UPSERT]
+        gone = [ref for (k, ref), op in latest.items() if k == kind and op == DELETE]
+        if refs:
+            found = _load(kind, refs, fields.get(kind, allowed))
+            out[plural] = [found[ref] for ref in refs if ref in found]
+            # upsert ที่หาแถวไม่เจอ = ถูกลบหลังบันทึก (tombstone ตามมาทีหลังอยู่แล้ว) ส่งเป็นลบไปเลย
+            gone += [ref for ref in refs if ref not in found]
+        if gone:
+            deleted[plural] = gone
+    if deleted:
+        out["deleted"] = deleted
+    return out
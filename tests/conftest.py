@@ -0,0 +1,52 @@
+# tests/conftest.py
+# -*- coding: utf-8 -*-
+# ทุก test ได้ SQLite ไฟล์ใหม่ใน tmp_path (ผ่าน create_app + migrations จริง)
+import os, sys, tempfile
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# app.py สร้าง app ตอน import: อย่าให้ชี้ instance/app.db
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "import.db")
+os.environ.setdefault("SECRET_KEY", "test")
+
+from app import create_app
+from migrations import upgrade
+from utils import membership_cache
+import fragments
+
+@pytest.fixture(autouse=True)
+def _process_caches():
+    # cache ระดับ process ข้าม test ไม่ได้ (id ซ้ำกันทุก DB)
+    membership_cache.clear()
+    fragments.cache.clear()
+    yield
+
+@pytest.fixture
+def make_app(tmp_path, monkeypatch):
+    def make(db_path=None, migrate=True, **env):
+        monkeypatch.setenv("DATABASE_URL", "sqlite:///" + str(db_path or tmp_path / "app.db"))
+        for k, v in env.items():
+            monkeypatch.setenv(k, v)
+        app = create_app()
+        app.config["TESTING"] = True
+        if migrate:
+            with app.app_context():
+                upgrade(echo=lambda *a: None)
+        return app
+    return make
+
+@pytest.fixture
+def app(make_app):
+    # ไม่ค้าง app context ไว้: แต่ละ request ต้องได้ flask.g ใหม่ (memo ต่อ request)
+    return make_app()
+
+@pytest.fixture
+def register(app):
+    def register(username, password="password123", display_name=None, on=None):
+        # on = app อื่นที่ test สร้างเองด้วย make_app
+        client = (on or app).test_client()
+        client.post("/auth/register", data={"username": username, "password": password,
+                                            "display_name": display_name or username.title()})
+        return client
+    return register
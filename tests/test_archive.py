@@ -0,0 +1,48 @@
+# tests/test_archive.py
+# -*- coding: utf-8 -*-
+# archive job ย้ายเฉพาะแถวที่อยู่ในก้อน: อัปเดตที่ commit เข้ามาระหว่าง job ไม่หายไปเงียบ ๆ
+from datetime import datetime, timedelta
+import pytest
+from models import db, Task, TaskUpdate, TaskArchive
+import archive
+
+@pytest.fixture
+def done_project(app, register):
+    c = register("owner")
+    c.post("/projects/create", data={"name": "P"})
+    c.post("/projects/1/tasks/create", data={"title": "T"})
+    for i in range(3):
+        c.post("/tasks/1/updates", data={"content": f"งาน {i}"})
+    c.post("/tasks/1/status", data={"status": "done"})
+    with app.app_context():
+        db.session.execute(db.update(Task).values(last_updated=datetime.utcnow() - timedelta(days=40)))
+        db.session.commit()
+    return c
+
+def test_update_committed_mid_job_is_not_deleted(app, done_project, monkeypatch):
+    pack = archive.pack
+    def pack_then_late_write(entries):
+        # writer อีก connection commit แถวใหม่หลังจาก job อ่านรายการไปแล้ว
+        with db.engine.begin() as conn:
+            conn.execute(TaskUpdate.__table__.insert(),
+                         {"task_id": 1, "author_id": 1, "content": "มาทีหลัง", "created_at": datetime.utcnow()})
+        return pack(entries)
+    monkeypatch.setattr(archive, "pack", pack_then_late_write)
+    with app.app_context():
+        r = archive.archive_projects(30)
+        assert (r["tasks"], r["updates"]) == (1, 4)
+        assert [u.content for u in TaskUpdate.query.filter_by(task_id=1)] == ["มาทีหลัง"]
+        assert db.session.get(TaskArchive, 1).update_count == 4
+
+def test_task_touched_after_selection_is_skipped(app, done_project, monkeypatch):
+    with app.app_context():
+        selected = archive.done_projects(30)
+        assert selected == [1]
+        # ถูกแก้หลังจาก job เลือกโปรเจกต์ไปแล้ว
+        db.session.execute(db.update(Task).values(last_updated=datetime.utcnow()))
+        db.session.commit()
+        monkeypatch.setattr(archive, "done_projects", lambda days: selected)
+        r = archive.archive_projects(30)
+        assert r["tasks"] == 0
+        assert TaskArchive.query.count() == 0
+        assert TaskUpdate.query.filter_by(task_id=1).count() == 4
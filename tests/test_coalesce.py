@@ -0,0 +1,42 @@
+# tests/test_coalesce.py
+# -*- coding: utf-8 -*-
+# อัปเดตอัตโนมัติที่กดรัว ๆ รวมเป็นแถวเดียว: created_at (cursor ของ feed) ไม่ขยับ เวลาแก้อยู่ใน edited_at
+from datetime import datetime, timedelta
+from models import db, TaskUpdate
+import coalesce
+
+def _updates(app, task_id=1):
+    with app.app_context():
+        return [(u.id, u.progress_percent, u.created_at, u.edited_at) for u in
+                TaskUpdate.query.filter_by(task_id=task_id).order_by(TaskUpdate.created_at, TaskUpdate.id)]
+
+def test_merge_keeps_created_at_and_refreshes_card(app, register):
+    c = register("owner")
+    c.post("/projects/create", data={"name": "P"})
+    c.post("/projects/1/tasks/create", data={"title": "T"})
+    c.post("/tasks/1/progress", data={"progress": 10})
+    [(uid, _p, created, edited)] = _updates(app)
+    assert edited is None
+    assert "อัปเดตความคืบหน้าเป็น 10%" in c.get("/tasks/1").get_data(as_text=True)
+
+    c.post("/tasks/1/progress", data={"progress": 40})
+    [(uid2, prog, created2, edited2)] = _updates(app)
+    assert (uid2, prog, created2) == (uid, 40, created)
+    assert edited2 is not None and edited2 >= created
+    # การ์ดที่ cache ไว้ต้อง render ใหม่ (version มี edited_at)
+    assert "อัปเดตความคืบหน้าเป็น 40%" in c.get("/tasks/1").get_data(as_text=True)
+
+def test_compact_keeps_first_created_at(app, register):
+    c = register("owner")
+    c.post("/projects/create", data={"name": "P"})
+    c.post("/projects/1/tasks/create", data={"title": "T"})
+    t0 = datetime.utcnow() - timedelta(days=1)
+    with app.app_context():
+        db.session.execute(TaskUpdate.__table__.insert(), [
+            {"task_id": 1, "author_id": 1, "content": coalesce.content_for(None, p), "status": None,
+             "progress_percent": p, "created_at": t0 + timedelta(seconds=60 * i)}
+            for i, p in enumerate((10, 20, 30))])
+        db.session.commit()
+        assert coalesce.compact(window=120) == {"tasks": 1, "removed": 2}
+    [(_id, prog, created, edited)] = _updates(app)
+    assert (prog, created, edited) == (30, t0, t0 + timedelta(seconds=120))
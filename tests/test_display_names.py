@@ -0,0 +1,49 @@
+# tests/test_display_names.py
+# -*- coding: utf-8 -*-
+# จำนวน query ของหน้าที่แสดงชื่อสมาชิก/ผู้เขียนต้องไม่โตตามจำนวนแถว (ไม่มี N+1)
+import pytest
+from sqlalchemy import event
+from models import db, Project
+
+@pytest.fixture
+def count_queries(app):
+    def count(client, url):
+        n = [0]
+        def on_execute(*_a):
+            n[0] += 1
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, "before_cursor_execute", on_execute)
+        try:
+            r = client.get(url)
+        finally:
+            event.remove(engine, "before_cursor_execute", on_execute)
+        assert r.status_code == 200, url
+        return n[0], r.get_data(as_text=True)
+    return count
+
+def _add_members(app, register, owner, start, n):
+    with app.app_context():
+        code = db.session.get(Project, 1).join_code
+    for i in range(start, start + n):
+        c = register(f"member{i:03d}", display_name=f"สมาชิก {i}")
+        c.post("/projects/join", data={"join_code": code})
+        c.post("/tasks/1/updates", data={"content": f"อัปเดตจาก {i}"})
+        owner.post("/tasks/1/updates", data={"content": f"เจ้าของตอบ {i}"})
+
+PAGES = ("/projects/1", "/tasks/1", "/tasks/1/updates?before=", "/updates/1")
+
+def test_query_count_constant_as_members_and_authors_grow(app, register, count_queries):
+    owner = register("owner", display_name="เจ้าของ")
+    owner.post("/projects/create", data={"name": "P"})
+    owner.post("/projects/1/tasks/create", data={"title": "T"})
+
+    _add_members(app, register, owner, 1, 1)
+    few = {url: count_queries(owner, url)[0] for url in PAGES}
+    _add_members(app, register, owner, 2, 9)
+    many = {url: count_queries(owner, url) for url in PAGES}
+
+    assert {url: n for url, (n, _html) in many.items()} == few
+    assert "สมาชิก 10" in many["/projects/1"][1] and "เจ้าของ" in many["/projects/1"][1]
+    assert "สมาชิก 10" in many["/tasks/1"][1]
+    assert "สมาชิก 1" in many["/updates/1"][1]
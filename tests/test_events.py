@@ -0,0 +1,51 @@
+# tests/test_events.py
+# -*- coding: utf-8 -*-
+import threading
+import events
+
+def _project(register):
+    c = register("alice")
+    c.post("/projects/create", data={"name": "P"})
+    return c
+
+def test_stream_over_cap_asks_client_to_retry(register, monkeypatch):
+    c = _project(register)
+    monkeypatch.setattr(events, "_streams", threading.BoundedSemaphore(1))
+    events._streams.acquire()
+    r = c.get("/projects/1/events")
+    # ต้องเป็น 200: EventSource เลิกต่อถาวรเมื่อได้ status อื่น
+    assert r.status_code == 200
+    assert r.mimetype == "text/event-stream"
+    assert r.get_data(as_text=True).startswith("retry: ")
+
+def test_events_published_after_commit_only(app, register):
+    c = _project(register)
+    c.post("/projects/1/tasks/create", data={"title": "T"})
+    b = events.backend()
+    since = b.last_id()
+    c.post("/tasks/1/progress", data={"progress": 50})
+    got = b.listen(("task:1",), since, timeout=0)
+    assert [ev["progress"] for _seq, _ch, ev in got if ev["type"] == "task"] == [50]
+
+def _update_events(b, task_id, since):
+    return [ev["update_id"] for _seq, _ch, ev in b.listen((f"task:{task_id}",), since, timeout=0)
+            if ev["type"] == "update"]
+
+def test_status_progress_and_bulk_push_feed_cards(register):
+    # คนอื่นที่เปิด feed อยู่ต้องเห็นการ์ด "เปลี่ยนสถานะ/%" โดยไม่ต้องรีเฟรช (รวมถึงการ์ดที่ถูกรวม)
+    c = _project(register)
+    c.post("/projects/1/tasks/create", data={"title": "A"})
+    c.post("/projects/1/tasks/create", data={"title": "B"})
+    b = events.backend()
+    since = b.last_id()
+    c.post("/tasks/1/status", data={"status": "doing"})
+    first = _update_events(b, 1, since)
+    assert len(first) == 1
+    since = b.last_id()
+    c.post("/tasks/1/progress", data={"progress": 30})
+    assert _update_events(b, 1, since) == first  # รวมเข้าแถวเดิม -> client แทนการ์ดเดิม
+
+    since = b.last_id()
+    c.post("/tasks/bulk", json={"tasks": [{"id": 1, "status": "done"}, {"id": 2, "progress": 40}]})
+    new1, new2 = _update_events(b, 1, since), _update_events(b, 2, since)
+    assert len(new1) == 1 and len(new2) == 1 and new1 != first
@@ -0,0 +1,62 @@
+# tests/test_migrations.py
+# -*- coding: utf-8 -*-
+import sqlite3
+from sqlalchemy import inspect, text
+from migrations import MIGRATIONS, upgrade, pending
+from models import db
+
+# schema ของ commit แรก (db.create_all ตอน import) ก่อนมีตัวรัน migration
+BASELINE_SCHEMA = """
+CREATE TABLE user (id INTEGER NOT NULL, username VARCHAR(20) NOT NULL, display_name VARCHAR(80) NOT NULL,
+    password_hash VARCHAR(255) NOT NULL, created_at DATETIME, PRIMARY KEY (id));
+CREATE TABLE project (id INTEGER NOT NULL, name VARCHAR(140) NOT NULL, status VARCHAR(32), join_code VARCHAR(8),
+    created_by_id INTEGER NOT NULL, created_at DATETIME, PRIMARY KEY (id),
+    FOREIGN KEY(created_by_id) REFERENCES user (id));
+CREATE TABLE project_member (id INTEGER NOT NULL, project_id INTEGER NOT NULL, user_id INTEGER NOT NULL,
+    role VARCHAR(16), joined_at DATETIME, PRIMARY KEY (id),
+    FOREIGN KEY(project_id) REFERENCES project (id), FOREIGN KEY(user_id) REFERENCES user (id));
+CREATE TABLE task (id INTEGER NOT NULL, project_id INTEGER NOT NULL, title VARCHAR(200) NOT NULL,
+    assignee_name VARCHAR(120), progress_percent INTEGER, last_updated DATETIME, status VARCHAR(32),
+    reference_url VARCHAR(500), created_by_id INTEGER NOT NULL, PRIMARY KEY (id),
+    FOREIGN KEY(project_id) REFERENCES project (id), FOREIGN KEY(created_by_id) REFERENCES user (id));
+CREATE TABLE task_update (id INTEGER NOT NULL, task_id INTEGER NOT NULL, author_id INTEGER NOT NULL,
+    content TEXT NOT NULL, progress_percent INTEGER, status VARCHAR(32), created_at DATETIME, PRIMARY KEY (id),
+    FOREIGN KEY(task_id) REFERENCES task (id), FOREIGN KEY(author_id) REFERENCES user (id));
+CREATE TABLE task_update_link (id INTEGER NOT NULL, task_update_id INTEGER NOT NULL, title VARCHAR(200),
+    url VARCHAR(1000) NOT NULL, created_at DATETIME, PRIMARY KEY (id),
+    FOREIGN KEY(task_update_id) REFERENCES task_update (id));
+CREATE TABLE task_file (id INTEGER NOT NULL, task_id INTEGER NOT NULL, task_update_id INTEGER,
+    file_name VARCHAR(255) NOT NULL, content_type VARCHAR(120), size_bytes INTEGER, provider VARCHAR(32),
+    public_id VARCHAR(255), secure_url VARCHAR(1000), created_at DATETIME, PRIMARY KEY (id),
+    FOREIGN KEY(task_id) REFERENCES task (id), FOREIGN KEY(task_update_id) REFERENCES task_update (id));
+INSERT INTO user VALUES (1, 'alice', 'Alice', 'x', '2024-01-01 00:00:00');
+INSERT INTO project VALUES (1, 'เว็บลูกค้า', 'in_progress', 'ABCD1234', 1, '2024-01-01 00:00:00');
+INSERT INTO project_member VALUES (1, 1, 1, 'owner', '2024-01-01 00:00:00');
+INSERT INTO task VALUES (1, 1, 'ออกแบบหน้าแรก', 'Bob', 40, '2024-01-03 00:00:00', 'doing', NULL, 1);
+INSERT INTO task_update VALUES (1, 1, 1, 'เริ่มร่างหน้าแรก', 40, 'doing', '2024-01-02 00:00:00');
+INSERT INTO task_update_link VALUES (1, 1, NULL, 'https://example.com/mock', '2024-01-02 00:00:00');
+"""
+
+def test_upgrade_from_baseline_schema(make_app, tmp_path):
+    path = tmp_path / "baseline.db"
+    with sqlite3.connect(path) as conn:
+        conn.executescript(BASELINE_SCHEMA)
+    app = make_app(db_path=path, migrate=False)
+    with app.app_context():
+        ran = upgrade(echo=lambda *a: None)
+        assert ran == [v for v, _n, _fn in MIGRATIONS]
+        assert pending() == []
+        insp = inspect(db.engine)
+        assert "archived" in {c["name"] for c in insp.get_columns("task")}
+        assert insp.has_table("task_archive") and insp.has_table("change_log")
+        # backfill ของ migration เก่าได้ข้อมูลเดิมครบ
+        assert db.session.execute(text("SELECT COUNT(*) FROM search_index")).scalar() == 2
+        assert db.session.execute(text("SELECT COUNT(*) FROM task_daily_rollup")).scalar() == 1
+        assert db.session.execute(text("SELECT COUNT(*) FROM change_log")).scalar() == 4
+        assert db.session.execute(text("SELECT archived FROM task WHERE id = 1")).scalar() == 0
+        # รันซ้ำไม่ทำอะไร
+        assert upgrade(echo=lambda *a: None) == []
+
+def test_fresh_database_upgrade(app):
+    with app.app_context():
+        assert pending() == []
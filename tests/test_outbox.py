@@ -0,0 +1,86 @@
+# tests/test_outbox.py
+# -*- coding: utf-8 -*-
+from datetime import datetime, timedelta
+import pytest
+import outbox
+import storage
+from models import db, FileDeletion
+
+@pytest.fixture
+def ctx(app):
+    with app.app_context():
+        yield
+
+def _due_now():
+    # ข้ามเวลา backoff ไปเลย
+    FileDeletion.query.update({"next_attempt_at": datetime.utcnow() - timedelta(seconds=1)})
+    db.session.commit()
+
+def test_enqueue_then_drain_deletes_in_batches(ctx):
+    outbox.enqueue([f"file-{i}" for i in range(outbox.BATCH_SIZE + 5)] + ["", None])
+    db.session.commit()
+    assert outbox.queue_stats() == {"pending": outbox.BATCH_SIZE + 5, "due": outbox.BATCH_SIZE + 5,
+                                    "retrying": 0, "failed": 0}
+    fake = outbox.FakeDeleter()
+    stats = outbox.drain_once(deleter=fake)
+    assert stats == {"claimed": outbox.BATCH_SIZE + 5, "deleted": outbox.BATCH_SIZE + 5, "retried": 0, "failed": 0}
+    assert sorted(len(ids) for _rtype, ids in fake.batches) == [5, outbox.BATCH_SIZE]
+    assert FileDeletion.query.count() == 0
+
+def test_failed_ids_retry_with_backoff_then_give_up(ctx):
+    outbox.enqueue(["ok", "broken"])
+    db.session.commit()
+    fake = outbox.FakeDeleter(fail={"broken"})
+    assert outbox.drain_once(deleter=fake)["retried"] == 1
+    row = FileDeletion.query.one()
+    assert (row.public_id, row.attempts, row.last_error) == ("broken", 1, "fake failure")
+    assert row.next_attempt_at > datetime.utcnow() + timedelta(seconds=outbox.BACKOFF_BASE_SECONDS - 5)
+    # ยังไม่ถึงเวลา: ไม่ถูกหยิบ
+    assert outbox.drain_once(deleter=fake)["claimed"] == 0
+    assert outbox.queue_stats()["retrying"] == 1
+    for _ in range(outbox.MAX_ATTEMPTS - 1):
+        _due_now()
+        outbox.drain_once(deleter=fake)
+    row = FileDeletion.query.one()
+    assert (row.status, row.attempts) == ("failed", outbox.MAX_ATTEMPTS)
+    assert outbox.queue_stats()["failed"] == 1
+    # backoff โตแบบ exponential แต่ไม่เกินเพดาน
+    assert outbox._backoff(2) == 2 * outbox._backoff(1)
+    assert outbox._backoff(50) == timedelta(seconds=outbox.BACKOFF_MAX_SECONDS)
+
+def test_batch_exception_retries_every_row(ctx):
+    outbox.enqueue(["a", "b"])
+    db.session.commit()
+    stats = outbox.drain_once(deleter=outbox.FakeDeleter(raise_exc=TimeoutError("cdn down")))
+    assert stats["retried"] == 2
+    assert {r.last_error for r in FileDeletion.query} == {"TimeoutError: cdn down"}
+    _due_now()
+    assert outbox.drain_once(deleter=outbox.FakeDeleter())["deleted"] == 2
+
+def test_local_deletions_wait_for_the_process_that_owns_the_disk(ctx, tmp_path, monkeypatch):
+    # worker อีก service: root ว่างไม่มี marker -> ไม่หยิบ และ backend ไม่รายงานว่าลบแล้ว
+    monkeypatch.setenv("STORAGE_LOCAL_ROOT", str(tmp_path / "uploads"))
+    outbox.enqueue(["p/1/a.pdf"], provider="local")
+    db.session.commit()
+    assert outbox.drain_once()["claimed"] == 0
+    assert storage.backend("local").delete_batch(["p/1/a.pdf"])["p/1/a.pdf"] is not None
+    assert FileDeletion.query.one().attempts == 0
+
+    # web (เครื่องที่มีไฟล์) ลบได้จริง
+    staged = tmp_path / "staged"
+    staged.write_bytes(b"%PDF-1.4")
+    storage.backend("local").save(str(staged), "p/1/a.pdf", "application/pdf")
+    assert storage.owns_root()
+    assert outbox.drain_once()["deleted"] == 1
+    assert not (tmp_path / "uploads" / "p" / "1" / "a.pdf").exists()
+
+def test_default_backend_follows_cloudinary_credentials(monkeypatch):
+    for k in ("STORAGE_BACKEND", "CLOUDINARY_CLOUD_NAME", "CLOUDINARY_API_KEY", "CLOUDINARY_API_SECRET"):
+        monkeypatch.delenv(k, raising=False)
+    assert storage.default_name() == "local"
+    monkeypatch.setenv("CLOUDINARY_CLOUD_NAME", "demo")
+    monkeypatch.setenv("CLOUDINARY_API_KEY", "k")
+    monkeypatch.setenv("CLOUDINARY_API_SECRET", "s")
+    assert storage.default_name() == "cloudinary"
+    monkeypatch.setenv("STORAGE_BACKEND", "local")
+    assert storage.default_name() == "local"
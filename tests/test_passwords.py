@@ -0,0 +1,27 @@
+# tests/test_passwords.py
+# -*- coding: utf-8 -*-
+import threading
+import passwords
+
+def test_login_over_cap_fails_fast(register, app, monkeypatch):
+    register("alice")
+    monkeypatch.setattr(passwords, "_slots", threading.BoundedSemaphore(1))
+    passwords._slots.acquire()      # มี login อื่นถือโควตาอยู่
+    r = app.test_client().post("/auth/login", data={"username": "alice", "password": "password123"})
+    assert r.status_code == 429
+    assert r.headers["Retry-After"] == str(passwords.RETRY_AFTER_SECONDS)
+    passwords._slots.release()
+    r = app.test_client().post("/auth/login", data={"username": "alice", "password": "password123"})
+    assert r.status_code == 302 and r.headers["Location"].endswith("/projects")
+
+def test_unknown_username_still_verifies_a_hash(register, app, monkeypatch):
+    register("alice")
+    seen = []
+    real = passwords.check_password_hash
+    monkeypatch.setattr(passwords, "check_password_hash", lambda h, raw: seen.append(h) or real(h, raw))
+    c = app.test_client()
+    c.post("/auth/login", data={"username": "alice", "password": "wrong-password"})
+    c.post("/auth/login", data={"username": "nobody", "password": "wrong-password"})
+    assert len(seen) == 2
+    assert seen[1] == passwords.dummy_hash()
+    assert seen[0].split("$", 1)[0] == seen[1].split("$", 1)[0]     # cost เดียวกัน
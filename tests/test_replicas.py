@@ -0,0 +1,76 @@
+# tests/test_replicas.py
+# -*- coding: utf-8 -*-
+# primary/replica เป็น SQLite สองไฟล์: "replicate" = copy ไฟล์ แล้วแก้ replica ให้ต่างเพื่อดูว่าอ่านจากไหน
+import shutil, sqlite3
+import pytest
+from sqlalchemy import text
+import replicas
+from models import db
+
+@pytest.fixture
+def pair(make_app, register, tmp_path, monkeypatch):
+    primary, replica = tmp_path / "primary.db", tmp_path / "replica.db"
+    app = make_app(db_path=primary, REPLICA_DATABASE_URL=f"sqlite:///{replica}")
+    client = register("alice", on=app)
+    client.post("/projects/create", data={"name": "จาก primary"})
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+    shutil.copy(primary, replica)
+    with sqlite3.connect(replica) as conn:
+        conn.execute("UPDATE project SET name = 'จาก replica'")
+    monkeypatch.setattr(replicas, "_state", {})
+    return app, client, primary, replica
+
+def _name(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT name FROM project WHERE id = 1").fetchone()[0]
+
+def test_get_reads_replica_after_sticky_window(pair, monkeypatch):
+    app, client, _primary, _replica = pair
+    monkeypatch.setattr(replicas, "STICKY_SECONDS", 0)
+    client.post("/projects/1/tasks/create", data={"title": "T"})
+    assert "จาก replica" in client.get("/projects").get_data(as_text=True)
+
+def test_read_your_writes_uses_primary(pair, monkeypatch):
+    app, client, _primary, _replica = pair
+    monkeypatch.setattr(replicas, "STICKY_SECONDS", 60)
+    client.post("/projects/1/tasks/create", data={"title": "T"})
+    assert "จาก primary" in client.get("/projects").get_data(as_text=True)
+
+def test_replica_down_falls_back_to_primary(make_app, register, tmp_path, monkeypatch):
+    monkeypatch.setattr(replicas, "_state", {})
+    monkeypatch.setattr(replicas, "STICKY_SECONDS", 0)
+    app = make_app(db_path=tmp_path / "primary.db",
+                   REPLICA_DATABASE_URL=f"sqlite:///{tmp_path / 'missing' / 'replica.db'}")
+    client = register("alice", on=app)
+    client.post("/projects/create", data={"name": "จาก primary"})
+    r = client.get("/projects")
+    assert r.status_code == 200 and "จาก primary" in r.get_data(as_text=True)
+
+@pytest.mark.parametrize("sql", [
+    "UPDATE project SET name = 'x'",
+    "  delete from project_member where 1 = 0",
+    "INSERT INTO search_index (rowid, body) VALUES (1, 'x')",
+    "SELECT id FROM project WHERE id = 1 FOR UPDATE",
+    "SELECT pg_advisory_xact_lock(1)",
+])
+def test_text_writes_route_to_primary(pair, sql):
+    app, _client, _primary, _replica = pair
+    with app.test_request_context("/projects", method="GET"):
+        assert db.session.get_bind(clause=text(sql)) is db.engines[None]
+
+def test_text_update_lands_on_primary(pair, monkeypatch):
+    app, _client, primary, replica = pair
+    monkeypatch.setattr(replicas, "STICKY_SECONDS", 0)
+    with app.test_request_context("/projects", method="GET"):
+        db.session.execute(text("UPDATE project SET name = 'แก้ด้วย text' WHERE id = 1"))
+        db.session.commit()
+    assert _name(primary) == "แก้ด้วย text"
+    assert _name(replica) == "จาก replica"
+
+def test_text_select_routes_to_replica(pair, monkeypatch):
+    app, _client, _primary, _replica = pair
+    monkeypatch.setattr(replicas, "STICKY_SECONDS", 0)
+    with app.test_request_context("/projects", method="GET"):
+        assert db.session.execute(text("SELECT name FROM project WHERE id = 1")).scalar() == "จาก replica"
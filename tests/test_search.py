@@ -0,0 +1,30 @@
+# tests/test_search.py
+# -*- coding: utf-8 -*-
+# อัปเดตที่ระบบเขียน (เปลี่ยนสถานะ/%) ค้นเจอทันทีหลังเขียน เหมือนหลัง reindex
+from models import db
+import search
+
+def _update_hits(app, q):
+    with app.app_context():
+        hits, _next = search.search(1, q)
+        return sorted(h.task_id for h in hits if h.kind == "update")
+
+def test_system_updates_are_searchable_right_after_write(app, register):
+    c = register("owner")
+    c.post("/projects/create", data={"name": "P"})
+    c.post("/projects/1/tasks/create", data={"title": "A"})
+    c.post("/projects/1/tasks/create", data={"title": "B"})
+    c.post("/tasks/1/status", data={"status": "blocked"})
+    c.post("/tasks/bulk", json={"tasks": [{"id": 2, "status": "blocked"}]})
+    live = _update_hits(app, "blocked")
+    assert live == [1, 2]
+
+    # แถวที่ถูกรวมถูก index ใหม่ด้วยข้อความล่าสุด
+    c.post("/tasks/1/progress", data={"progress": 35})
+    assert _update_hits(app, "35") == [1]
+
+    with app.app_context():
+        with db.engine.begin() as conn:
+            conn.execute(db.text("DELETE FROM search_index"))
+            search.backfill(conn)
+    assert _update_hits(app, "blocked") == live
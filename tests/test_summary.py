@@ -0,0 +1,44 @@
+# tests/test_summary.py
+# -*- coding: utf-8 -*-
+# ProjectSummary: เติมแถวที่ขาดจาก GET /projects และ rebuild ทับแถวเดิมได้ (upsert ไม่ชน primary key)
+from models import db, ProjectSummary
+import summary
+
+def _setup(register):
+    owner = register("owner")
+    owner.post("/projects/create", data={"name": "P"})
+    for title in ("a", "b", "c"):
+        owner.post("/projects/1/tasks/create", data={"title": title})
+    owner.post("/tasks/2/status", data={"status": "doing"})
+    owner.post("/tasks/3/status", data={"status": "doing"})
+    return owner
+
+def _counts(app):
+    with app.app_context():
+        sm = db.session.get(ProjectSummary, 1)
+        return sm and (sm.todo_count, sm.doing_count, sm.member_count)
+
+def test_projects_page_fills_missing_summary(app, register):
+    owner = _setup(register)
+    expected = _counts(app)
+    assert expected == (1, 2, 1)
+    with app.app_context():
+        db.session.query(ProjectSummary).delete()
+        db.session.commit()
+    assert _counts(app) is None
+
+    r = owner.get("/projects")
+    assert r.status_code == 200
+    assert _counts(app) == expected
+
+def test_rebuild_overwrites_existing_row(app, register):
+    _setup(register)
+    with app.app_context():
+        db.session.query(ProjectSummary).update({"todo_count": 99, "doing_count": -5, "member_count": 0})
+        db.session.commit()
+        # เหมือนสอง request เติมโปรเจกต์เดียวกัน: ครั้งที่สองเจอแถวที่มีแล้ว
+        assert summary.rebuild_project_summaries([1]) == 1
+        assert summary.rebuild_project_summaries([1]) == 1
+        db.session.commit()
+        assert db.session.query(ProjectSummary).count() == 1
+    assert _counts(app) == (1, 2, 1)
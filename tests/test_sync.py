@@ -0,0 +1,43 @@
+# tests/test_sync.py
+# -*- coding: utf-8 -*-
+# token ของ delta sync เดินตาม (txid, seq): แถวที่ได้ seq ก่อนแต่ transaction ใหม่กว่า ต้องไม่ถูกข้าม
+import pytest
+from models import db, ChangeLog
+import sync
+
+def test_token_round_trip():
+    assert sync.parse_token(None) == (0, 0)
+    assert sync.parse_token("42") == (0, 42)
+    assert sync.parse_token(sync.format_token(901, 7)) == (901, 7)
+    assert sync.format_token(0, 42) == "42"
+    for bad in ("abc", "1.x", "-1", "3.-2"):
+        with pytest.raises(ValueError):
+            sync.parse_token(bad)
+
+def test_changes_follow_transaction_order(app, register):
+    c = register("owner")
+    c.post("/projects/create", data={"name": "P"})
+    c.post("/projects/1/tasks/create", data={"title": "A"})
+    c.post("/projects/1/tasks/create", data={"title": "B"})
+    tok = c.get("/api/sync").get_json()["token"]
+    with app.app_context():
+        # transaction 200 จอง seq ก่อน แต่ 100 (seq ทีหลัง) จบก่อน -> 100 ต้องมาก่อน
+        db.session.execute(ChangeLog.__table__.insert(), [
+            {"project_id": 1, "kind": "task", "ref_id": 2, "op": "upsert", "txid": 200},
+            {"project_id": 1, "kind": "task", "ref_id": 1, "op": "upsert", "txid": 100},
+        ])
+        db.session.commit()
+    first = c.get(f"/api/sync?since={tok}&limit=1").get_json()
+    assert [t["id"] for t in first["tasks"]] == [1] and first["has_more"]
+    assert sync.parse_token(first["token"])[0] == 100
+    second = c.get(f"/api/sync?since={first['token']}").get_json()
+    assert [t["id"] for t in second["tasks"]] == [2] and not second["has_more"]
+
+def test_compact_keeps_latest_in_transaction_order(app):
+    with app.app_context():
+        db.session.execute(ChangeLog.__table__.insert(), [
+            {"project_id": 1, "kind": "task", "ref_id": 1, "op": "upsert", "txid": 200},
+            {"project_id": 1, "kind": "task", "ref_id": 1, "op": "delete", "txid": 100},
+        ])
+        assert sync.compact() == 1
+        assert [r.op for r in ChangeLog.query] == ["upsert"]
@@ -0,0 +1,23 @@
+# tests/test_transfer.py
+# -*- coding: utf-8 -*-
+import csv, io
+from models import db, Task
+
+def test_csv_export_neutralises_formulas_and_round_trips(app, register):
+    c = register("alice")
+    c.post("/projects/create", data={"name": "P"})
+    c.post("/projects/1/tasks/create", data={"title": '=HYPERLINK("http://evil.example","คลิก")',
+                                             "assignee_name": "@bob"})
+    c.post("/tasks/1/updates", data={"content": "-2+3 ไม่ใช่สูตร"})
+    c.post("/tasks/1/updates", data={"content": "ข้อความธรรมดา"})
+    body = c.get("/projects/1/export.csv").get_data(as_text=True).lstrip("﻿")
+    rows = list(csv.DictReader(io.StringIO(body)))
+    assert rows[0]["title"] == '\'=HYPERLINK("http://evil.example","คลิก")'
+    assert rows[0]["assignee_name"] == "'@bob"
+    assert sorted(r["update_content"] for r in rows) == ["'-2+3 ไม่ใช่สูตร", "ข้อความธรรมดา"]
+    # นำเข้าไฟล์ที่ export ได้ค่าเดิม
+    c.post("/projects/1/import", data={"file": (io.BytesIO(body.encode("utf-8")), "tasks.csv")},
+           content_type="multipart/form-data")
+    with app.app_context():
+        t = db.session.get(Task, 2)
+        assert (t.title, t.assignee_name) == ('=HYPERLINK("http://evil.example","คลิก")', "@bob")
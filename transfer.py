@@ -0,0 +1,176 @@
+# transfer.py
+# -*- coding: utf-8 -*-
+# Export งาน + ประวัติอัปเดตของโปรเจกต์เป็น CSV/JSON แบบ stream (yield_per; หน่วยความจำคงที่)
+# และ import งานจาก CSV ทีละ chunk (ตรวจ -> executemany -> commit ต่อ chunk)
+import csv, io, json
+from datetime import datetime
+from sqlalchemy import select
+from models import db, Task, TaskUpdate, TaskArchive, User
+import archive
+import events
+import rollups
+import search
+import summary
+import sync
+
+EXPORT_BATCH_SIZE = 1000
+IMPORT_CHUNK_SIZE = 500
+IMPORT_MAX_ERRORS = 50
+
+EXPORT_COLUMNS = ["task_id", "title", "assignee_name", "status", "progress_percent", "last_updated",
+                  "update_id", "update_created_at", "update_author", "update_status",
+                  "update_progress_percent", "update_content"]
+
+# --- export ---
+
+def _rows(project_id):
+    # 1 แถวต่ออัปเดต (งานที่ยังไม่มีอัปเดต = 1 แถว ช่อง update ว่าง) เรียงตามงานแล้วตามเวลา
+    stmt = (select(Task.id, Task.title, Task.assignee_name, Task.status, Task.progress_percent, Task.last_updated,
+                   TaskUpdate.id, TaskUpdate.created_at, User.display_name, TaskUpdate.status,
+                   TaskUpdate.progress_percent, TaskUpdate.content)
+            .outerjoin(TaskUpdate, TaskUpdate.task_id == Task.id)
+            .outerjoin(User, User.id == TaskUpdate.author_id)
+            .where(Task.project_id == project_id)
+            .order_by(Task.id, TaskUpdate.created_at, TaskUpdate.id)
+            .execution_options(yield_per=EXPORT_BATCH_SIZE))
+    archived = set(db.session.execute(select(Task.id).where(Task.project_id == project_id,
+                                                            Task.archived.is_(True))).scalars())
+    authors = {}
+    for r in db.session.execute(stmt):
+        if r[0] in archived and r[6] is None:
+            yield from _archived_rows(r, authors)
+        else:
+            yield r
+
+def _archived_rows(task_row, authors):
+    # task ที่ archive แล้ว: แตกก้อนทีละ task (ไม่จำไว้ทั้ง export) แล้วคืนแถวรูปเดียวกับ _rows
+    data = db.session.execute(select(TaskArchive.data).where(TaskArchive.task_id == task_row[0])).scalar()
+    entries = archive.unpack(data) if data is not None else []
+    if not entries:
+        yield task_row
+        return
+    need = {e["author_id"] for e in entries} - authors.keys()
+    if need:
+        authors.update(db.session.execute(select(User.id, User.display_name).where(User.id.in_(need))).all())
+    for e in entries:
+        yield (*task_row[:6], e["id"], datetime.fromisoformat(e["created_at"]), authors.get(e["author_id"]),
+               e["status"], e["progress_percent"], e["content"])
+
+def _iso(ts):
+    return ts.isoformat(sep=" ", timespec="seconds") if ts else None
+
+# ข้อความที่ผู้ใช้พิมพ์เองขึ้นต้นด้วยตัวเหล่านี้ Excel/Sheets จะตีความเป็นสูตร (CSV injection)
+_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+def _cell(v):
+    # ใส่ ' นำหน้าให้แสดงเป็นข้อความ; import_csv ถอดออกให้ (ไฟล์ export นำเข้าคืนได้ตรง ๆ)
+    return "'" + v if v and v.startswith(_FORMULA_PREFIXES) else (v or "")
+
+def _uncell(v):
+    return v[1:] if v and v.startswith("'") and v[1:].startswith(_FORMULA_PREFIXES) else v
+
+def export_csv(project_id):
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    buf.write("\ufeff")   # BOM ให้ Excel อ่านภาษาไทยถูก
+    w.writerow(EXPORT_COLUMNS)
+    for n, r in enumerate(_rows(project_id), start=1):
+        w.writerow([r[0], _cell(r[1]), _cell(r[2]), r[3], r[4], _iso(r[5]),
+                    r[6] or "", _iso(r[7]) or "", _cell(r[8]), r[9] or "",
+                    "" if r[10] is None else r[10], _cell(r[11])])
+        if n % EXPORT_BATCH_SIZE == 0:
+            yield buf.getvalue()
+            buf.seek(0); buf.truncate()
+    yield buf.getvalue()
+
+def export_json(project_id):
+    # [{task..., "updates": [...]}, ...] ประกอบจากแถวที่เรียงตาม task แล้ว ถือไว้ทีละงาน
+    yield "["
+    current, first = None, True
+    for r in _rows(project_id):
+        if current is None or current["id"] != r[0]:
+            if current is not None:
+                yield ("" if first else ",") + json.dumps(current, ensure_ascii=False)
+                first = False
+            current = {"id": r[0], "title": r[1], "assignee_name": r[2], "status": r[3],
+                       "progress_percent": r[4], "last_updated": _iso(r[5]), "updates": []}
+        if r[6] is not None:
+            current["updates"].append({"id": r[6], "created_at": _iso(r[7]), "author": r[8], "status": r[9],
+                                       "progress_percent": r[10], "content": r[11]})
+    if current is not None:
+        yield ("" if first else ",") + json.dumps(current, ensure_ascii=False)
+    yield "]"
+
+# --- import ---
+
+def _parse_row(raw):
+    # คืน (row, None) หรือ (None, error)
+    title = _uncell((raw.get("title") or "").strip())
+    if not title:
+        return None, "missing title"
+    if len(title) > 200:
+        return None, "title longer than 200 characters"
+    assignee = _uncell((raw.get("assignee_name") or "").strip()) or None
+    if assignee and len(assignee) > 120:
+        return None, "assignee_name longer than 120 characters"
+    status = (raw.get("status") or "todo").strip().lower()
+    if status not in summary.TASK_STATUSES:
+        return None, f"unknown status {status!r}"
+    prog = (raw.get("progress_percent") or "0").strip()
+    try:
+        prog = int(prog)
+    except ValueError:
+        return None, f"progress_percent {prog!r} is not a number"
+    if not 0 <= prog <= 100:
+        return None, "progress_percent must be 0-100"
+    return {"title": title, "assignee_name": assignee, "status": status, "progress_percent": prog}, None
+
+def _insert_chunk(project_id, user_id, rows):
+    now = datetime.utcnow()
+    for r in rows:
+        r.update(project_id=project_id, created_by_id=user_id, last_updated=now)
+    ids = db.session.execute(
+        Task.__table__.insert().returning(Task.__table__.c.id, sort_by_parameter_order=True), rows).scalars().all()
+    statuses = {}
+    for r in rows:
+        statuses[r["status"]] = statuses.get(r["status"], 0) + 1
+    summary.tasks_added(project_id, statuses, sum(r["progress_percent"] for r in rows))
+    for tid, r in zip(ids, rows):
+        r["id"] = tid
+    search.index_tasks(rows)
+    rollups.record_tasks([(r["id"], project_id, r["status"], r["progress_percent"], 0) for r in rows], ts=now)
+    sync.record(project_id, "task", ids)
+    events.publish((f"project:{project_id}",), {"type": "task_created", "count": len(rows)})
+    db.session.commit()
+    return len(ids)
+
+def import_csv(project_id, user_id, stream, chunk_size=IMPORT_CHUNK_SIZE):
+    # stream = ไฟล์ binary; ต้องมีหัวคอลัมน์ title (อื่น ๆ ไม่บังคับ) รับไฟล์จาก export ได้ตรง ๆ
+    # แถวที่ผิดรายงานพร้อมเลขบรรทัดแล้วข้าม ไม่หยุดทั้งไฟล์
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8-sig", newline=""))
+    if not reader.fieldnames or "title" not in [f.strip() for f in reader.fieldnames]:
+        raise ValueError("CSV must have a 'title' column")
+    reader.fieldnames = [f.strip() for f in reader.fieldnames]
+    result = {"imported": 0, "skipped": 0, "errors": []}
+    chunk, last_source_id = [], None
+    for raw in reader:
+        # ไฟล์ export เรียงตามงาน: แถวต่อ ๆ ไปของ task_id เดิมคือแถวอัปเดต
+        source_id = (raw.get("task_id") or "").strip()
+        if source_id and source_id == last_source_id:
+            continue
+        last_source_id = source_id or None
+        if not any((v or "").strip() for v in raw.values() if isinstance(v, str)):
+            continue
+        row, error = _parse_row(raw)
+        if error:
+            result["skipped"] += 1
+            if len(result["errors"]) < IMPORT_MAX_ERRORS:
+                result["errors"].append((reader.line_num, error))
+            continue
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            result["imported"] += _insert_chunk(project_id, user_id, chunk)
+            chunk = []
+    if chunk:
+        result["imported"] += _insert_chunk(project_id, user_id, chunk)
+    return result
@@ -1,14 +1,31 @@
 import os, re
+from datetime import datetime
 from functools import wraps
-from flask import session, redirect, url_for, abort
-from models import User, ProjectMember
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+from flask import session, redirect, url_for, abort, g
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db, User, ProjectMember
 
 USERNAME_RE = re.compile(r"^[a-z0-9_]{3,20}$")
 
+def upsert_insert(bind, table):
+    # INSERT ที่มี on_conflict_do_update ตาม dialect (Postgres ใน prod, SQLite ตอน dev/test)
+    engine = bind.get_bind() if hasattr(bind, "get_bind") else bind
+    return (postgresql.insert if engine.dialect.name == "postgresql" else sqlite.insert)(table)
+
 def current_user():
+    # memo ต่อ request บน flask.g (login_required / must_be_project_member / view เรียกซ้ำได้ฟรี)
     uid = session.get('uid')
     if not uid: return None
-    return User.query.get(uid)
+    cached = g.get('_current_user')
+    if cached is not None and cached[0] == uid:
+        return cached[1]
+    u = User.query.get(uid)
+    g._current_user = (uid, u)
+    return u
 
 def login_required(f):
     @wraps(f)
@@ -21,10 +38,56 @@ def login_required(f):
 def must_be_project_member(project_id):
     u = current_user()
     if not u: return abort(401)
-    mem = ProjectMember.query.filter_by(project_id=project_id, user_id=u.id).first()
+    mem = get_membership(project_id, u.id)
     if not mem: return abort(403)
     return mem
 
+def get_membership(project_id, user_id):
+    # ลำดับการหา: flask.g (ต่อ request) -> process cache (TTL สั้น) -> DB
+    per_request = g.setdefault('_memberships', {})
+    key = (project_id, user_id)
+    if key in per_request:
+        return per_request[key]
+    hit = membership_cache.get(key)
+    if hit is not None:
+        mem_id, role = hit
+        # object ชั่วคราว (ไม่ผูก session) มีแค่ข้อมูลที่ view ใช้
+        mem = ProjectMember(id=mem_id, project_id=project_id, user_id=user_id, role=role)
+    else:
+        mem = ProjectMember.query.filter_by(project_id=project_id, user_id=user_id).first()
+        if mem:
+            membership_cache.set(key, (mem.id, mem.role))
+    per_request[key] = mem
+    return mem
+
+def forget_membership(project_id, user_id=None):
+    # เรียกหลัง join/leave/delete project; user_id=None = ล้างทั้งโปรเจกต์
+    per_request = g.get('_memberships')
+    if user_id is None:
+        membership_cache.discard_where(lambda k: k[0] == project_id)
+        if per_request:
+            for k in [k for k in per_request if k[0] == project_id]:
+                per_request.pop(k)
+    else:
+        membership_cache.discard((project_id, user_id))
+        if per_request:
+            per_request.pop((project_id, user_id), None)
+
+def display_names(user_ids):
+    # {user_id: display_name} ของผู้ใช้ที่หน้านี้ต้องแสดง (สมาชิก / ผู้เขียนโพสต์)
+    # รวม id ทั้งหน้าแล้ว IN query ครั้งเดียว; จำบน flask.g เรียกซ้ำใน request เดียวกันไม่ query อีก
+    memo = g.setdefault('_display_names', {})
+    me = g.get('_current_user')
+    if me is not None and me[1] is not None:
+        memo.setdefault(me[0], me[1].display_name)
+    wanted = {uid for uid in user_ids if uid is not None}
+    todo = wanted - memo.keys()
+    if todo:
+        memo.update(db.session.execute(select(User.id, User.display_name).where(User.id.in_(todo))).all())
+        for uid in todo:
+            memo.setdefault(uid, None)   # ผู้ใช้ถูกลบ: ไม่ต้องถามซ้ำ
+    return {uid: memo[uid] for uid in wanted}
+
 def is_allowed_username(username: str) -> bool:
     return bool(USERNAME_RE.match(username or ""))
 
@@ -34,3 +97,78 @@ def get_env(name: str, default=None):
 
 def is_cloudinary_delete_enabled():
     return bool(get_env("CLOUDINARY_API_KEY") and get_env("CLOUDINARY_API_SECRET"))
+
+_cloudinary_uploader = None
+
+def cloudinary_uploader():
+    # import + config Cloudinary SDK ตอนใช้ครั้งแรก (ไม่ถ่วงเวลา boot ของ gunicorn worker)
+    global _cloudinary_uploader
+    if _cloudinary_uploader is None:
+        import cloudinary, cloudinary.uploader
+        cloud_name = get_env("CLOUDINARY_CLOUD_NAME")
+        if cloud_name:
+            cloudinary.config(
+                cloud_name=cloud_name,
+                api_key=get_env("CLOUDINARY_API_KEY"),
+                api_secret=get_env("CLOUDINARY_API_SECRET"),
+                secure=True
+            )
+        _cloudinary_uploader = cloudinary.uploader
+    return _cloudinary_uploader
+
+def encode_cursor(created_at, row_id) -> str:
+    # keyset cursor "<iso datetime>_<id>" สำหรับเลื่อนหน้าแบบ (created_at, id)
+    return f"{created_at.isoformat()}_{row_id}"
+
+def decode_cursor(raw):
+    if not raw: return None
+    try:
+        ts, _, rid = raw.rpartition('_')
+        return datetime.fromisoformat(ts), int(rid)
+    except ValueError:
+        return None
+
+class TTLCache:
+    # LRU ขนาดจำกัด + หมดอายุตามเวลา ใช้ร่วมกันทั้ง process (thread-safe)
+    def __init__(self, maxsize=1024, ttl=10.0):
+        self.maxsize, self.ttl = maxsize, ttl
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        if self.ttl <= 0: return None
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is None: return None
+            expires, value = hit
+            if expires < monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.ttl <= 0 or self.maxsize <= 0: return
+        with self._lock:
+            self._data[key] = (monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def discard_where(self, pred):
+        with self._lock:
+            for k in [k for k in self._data if pred(k)]:
+                del self._data[k]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+membership_cache = TTLCache(
+    maxsize=int(get_env("MEMBERSHIP_CACHE_SIZE", 4096)),
+    ttl=float(get_env("MEMBERSHIP_CACHE_TTL", 10)),
+)
@@ -1,9 +1,14 @@
 from flask import Blueprint, render_template, request, redirect, url_for, session, flash
 from models import db, User
 from utils import is_allowed_username
+import passwords
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/auth')
 
+def _busy(template):
+    # hash เต็มโควตา: ตอบทันที (ไม่ redirect ให้ต้องวนกลับมาอีกรอบ)
+    return render_template(template), 429, {'Retry-After': str(passwords.RETRY_AFTER_SECONDS)}
+
 @auth_bp.get('/login')
 def login_page():
     return render_template('auth_login.html')
@@ -13,7 +18,17 @@ def login_post():
     username = (request.form.get('username') or '').strip().lower()
     password = request.form.get('password') or ''
     u = User.query.filter_by(username=username).first()
-    if not u or not u.check_password(password):
+    try:
+        # ไม่มีผู้ใช้นี้ก็ verify กับ hash หลอก: เวลาตอบเท่ากันทั้งสองกรณี
+        ok = passwords.verify_password_bounded(u.password_hash if u else passwords.dummy_hash(), password) and bool(u)
+        if ok and u.password_needs_rehash():
+            # ค่า hash เปลี่ยน (method/cost) -> อัปเกรดตอนรู้รหัสจริง
+            u.password_hash = passwords.hash_password_bounded(password)
+            db.session.commit()
+    except passwords.HashBusy:
+        flash("ระบบกำลังยุ่ง ลองเข้าสู่ระบบใหม่อีกครั้ง", "error")
+        return _busy('auth_login.html')
+    if not ok:
         flash("ชื่อผู้ใช้หรือรหัสผ่านไม่ถูกต้อง", "error")
         return redirect(url_for('auth.login_page'))
     session['uid'] = u.id
@@ -37,8 +52,12 @@ def register_post():
     if User.query.filter_by(username=username).first():
         flash("ชื่อผู้ใช้นี้ถูกใช้แล้ว", "error")
         return redirect(url_for('auth.register_page'))
-    u = User(username=username, display_name=display_name)
-    u.set_password(password)
+    try:
+        pw_hash = passwords.hash_password_bounded(password)
+    except passwords.HashBusy:
+        flash("ระบบกำลังยุ่ง ลองสมัครใหม่อีกครั้ง", "error")
+        return _busy('auth_register.html')
+    u = User(username=username, display_name=display_name, password_hash=pw_hash)
     db.session.add(u); db.session.commit()
     session['uid'] = u.id
     return redirect(url_for('main.projects'))
@@ -1,8 +1,17 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, abort
+from flask import Blueprint, render_template, request, redirect, url_for, flash, abort, current_app, Response, stream_with_context, session
 from sqlalchemy import func
-from models import db, Project, ProjectMember, Task, TaskFile, TaskUpdate, TaskUpdateLink
-from utils import current_user, login_required, must_be_project_member, is_cloudinary_delete_enabled
-import cloudinary, cloudinary.uploader
+from models import db, Project, ProjectMember, ProjectSummary, Task, TaskFile, TaskUpdate, TaskUpdateLink, TaskDailyRollup, ProjectDailyRollup, FileUpload, TaskArchive
+from utils import current_user, login_required, must_be_project_member, get_membership, forget_membership, display_names
+import archive
+import events
+import http_cache
+import outbox
+import rollups
+import search
+import storage
+import summary
+import sync
+import transfer
 
 main_bp = Blueprint('main', __name__)
 
@@ -23,33 +32,52 @@ def derive_project_status(task_statuses):
         return 'blocked'
     return 'in_progress'
 
+def derive_summary_status(summary):
+    # เหมือน derive_project_status แต่คิดจากตัวนับใน ProjectSummary
+    if summary is None:
+        return 'in_progress'
+    total = summary.todo_count + summary.doing_count + summary.done_count + summary.blocked_count
+    if total == 0:
+        return 'in_progress'
+    if summary.done_count == total:
+        return 'done'
+    if summary.blocked_count and not summary.doing_count:
+        return 'blocked'
+    return 'in_progress'
+
 @main_bp.get('/projects')
 @login_required
 def projects():
     u = current_user()
-    # projects the user is member of
-    proj_rows = db.session.query(Project).join(ProjectMember, Project.id==ProjectMember.project_id)         .filter(ProjectMember.user_id==u.id).order_by(Project.created_at.desc()).all()
+    # validator: ชุดโปรเจกต์ที่เป็นสมาชิก + เวลาแก้ summary ล่าสุด
+    n_mem, pid_sum, summary_at = db.session.query(
+        func.count(ProjectMember.id), func.coalesce(func.sum(ProjectMember.project_id), 0),
+        func.max(ProjectSummary.updated_at))         .outerjoin(ProjectSummary, ProjectSummary.project_id==ProjectMember.project_id)         .filter(ProjectMember.user_id==u.id).one()
+    cached = http_cache.not_modified(n_mem, pid_sum, summary_at, last_modified=summary_at)
+    if cached: return cached
 
-    # map project -> role for the current user
-    roles = dict(db.session.query(ProjectMember.project_id, ProjectMember.role)                 .filter(ProjectMember.user_id==u.id).all())
+    # projects the user is member of + role + summary counters (one indexed join)
+    rows = db.session.query(Project, ProjectMember.role, ProjectSummary)         .join(ProjectMember, Project.id==ProjectMember.project_id)         .outerjoin(ProjectSummary, ProjectSummary.project_id==Project.id)         .filter(ProjectMember.user_id==u.id).order_by(Project.created_at.desc()).all()
 
-    # collect task statuses per project
-    pids = [p.id for p in proj_rows] or [-1]
-    task_rows = db.session.query(Task.project_id, Task.status)                .filter(Task.project_id.in_(pids)).all()
-    task_map = {}
-    for pid, st in task_rows:
-        task_map.setdefault(pid, []).append(st)
+    # โปรเจกต์เก่าที่ยังไม่มี summary -> นับให้ครั้งเดียว
+    missing = [p.id for p, _role, sm in rows if sm is None]
+    if missing:
+        summary.rebuild_project_summaries(missing)
+        db.session.commit()
+        filled = {sm.project_id: sm for sm in ProjectSummary.query.filter(ProjectSummary.project_id.in_(missing))}
+        rows = [(p, role, sm or filled.get(p.id)) for p, role, sm in rows]
+
+    proj_rows = [p for p, _role, _sm in rows]
+    roles = {p.id: role for p, role, _sm in rows}
+    member_counts = {p.id: (sm.member_count if sm else 0) for p, _role, sm in rows}
 
     # derive project status and counts
-    proj_status = {p.id: derive_project_status(task_map.get(p.id, [])) for p in proj_rows}
+    proj_status = {p.id: derive_summary_status(sm) for p, _role, sm in rows}
     done = sum(1 for pid,s in proj_status.items() if s=='done')
     inprog = sum(1 for pid,s in proj_status.items() if s=='in_progress')
     blocked = sum(1 for pid,s in proj_status.items() if s=='blocked')
     total = len(proj_rows)
 
-    # member counts per project
-    member_counts = dict(db.session.query(ProjectMember.project_id, func.count(ProjectMember.id))                         .filter(ProjectMember.project_id.in_(pids)).group_by(ProjectMember.project_id).all())
-
     return render_template('projects.html',
                            projects=proj_rows, counts=member_counts,
                            total=total, done=done, inprog=inprog, blocked=blocked,
@@ -65,7 +93,12 @@ def create_project():
         return redirect(url_for('main.projects'))
     p = Project(name=name, created_by_id=u.id)
     db.session.add(p); db.session.flush()
-    db.session.add(ProjectMember(project_id=p.id, user_id=u.id, role="owner"))
+    owner = ProjectMember(project_id=p.id, user_id=u.id, role="owner")
+    db.session.add(owner)
+    db.session.add(ProjectSummary(project_id=p.id, member_count=1))
+    db.session.flush()
+    sync.record(p.id, "project", p.id)
+    sync.record(p.id, "member", owner.id)
     db.session.commit()
     return redirect(url_for('main.project_detail', project_id=p.id))
 
@@ -79,44 +112,80 @@ def join_project():
         return redirect(url_for('main.projects'))
     u = current_user()
     if not ProjectMember.query.filter_by(project_id=p.id, user_id=u.id).first():
-        db.session.add(ProjectMember(project_id=p.id, user_id=u.id))
+        mem = ProjectMember(project_id=p.id, user_id=u.id)
+        db.session.add(mem)
+        db.session.flush()
+        summary.member_added(p.id)
+        sync.record(p.id, "member", mem.id)
+        # เฉพาะคนที่เข้า: โปรเจกต์ใหม่ -> client ดึงข้อมูลเดิมด้วย ?project=<id>&since=0
+        sync.record(p.id, "project", p.id, user_id=u.id)
         db.session.commit()
+        forget_membership(p.id, u.id)
     return redirect(url_for('main.project_detail', project_id=p.id))
 
+DELETE_CHUNK_SIZE = 500
+
+def _chunked_ids(query, chunk_size):
+    # ดึง id ทีละก้อน (เฉพาะคอลัมน์ id ไม่โหลด ORM object) จนกว่าจะหมด
+    while True:
+        ids = [r[0] for r in query.limit(chunk_size).all()]
+        if not ids:
+            return
+        yield ids
+
+def _bulk_delete(model, *criteria):
+    return db.session.query(model).filter(*criteria).delete(synchronize_session=False)
+
+def purge_project(project_id, chunk_size=DELETE_CHUNK_SIZE):
+    # Cascade delete แบบ set-based: links -> files -> updates -> tasks -> members -> project
+    # commit ทีละ chunk เพื่อไม่ถือ lock นาน; แถว project ลบท้ายสุดจึงเรียกซ้ำได้ถ้าล้มกลางทาง
+    removed = dict.fromkeys(('task_update_link', 'task_file', 'task_update', 'task', 'task_archive', 'rollup',
+                             'project_member', 'project_summary', 'search', 'project'), 0)
+    project_tasks = db.session.query(Task.id).filter(Task.project_id == project_id)
+
+    def drop_files(*criteria):
+        # คิวลบไฟล์จริงใน storage (เฉพาะ provider ที่ลบได้) ก่อนลบแถว
+        outbox.enqueue_task_files(*criteria)
+        removed['task_file'] += _bulk_delete(TaskFile, *criteria)
+
+    update_ids = db.session.query(TaskUpdate.id).filter(TaskUpdate.task_id.in_(project_tasks.scalar_subquery()))
+    for ids in _chunked_ids(update_ids, chunk_size):
+        removed['task_update_link'] += _bulk_delete(TaskUpdateLink, TaskUpdateLink.task_update_id.in_(ids))
+        drop_files(TaskFile.task_update_id.in_(ids))
+        removed['task_update'] += _bulk_delete(TaskUpdate, TaskUpdate.id.in_(ids))
+        db.session.commit()
+
+    for ids in _chunked_ids(project_tasks, chunk_size):
+        drop_files(TaskFile.task_id.in_(ids))
+        for (upload_id,) in db.session.query(FileUpload.id).filter(FileUpload.task_id.in_(ids)):
+            storage.discard(upload_id)
+        _bulk_delete(FileUpload, FileUpload.task_id.in_(ids))
+        removed['rollup'] += _bulk_delete(TaskDailyRollup, TaskDailyRollup.task_id.in_(ids))
+        removed['task_archive'] += _bulk_delete(TaskArchive, TaskArchive.task_id.in_(ids))
+        removed['task'] += _bulk_delete(Task, Task.id.in_(ids))
+        db.session.commit()
+
+    sync.project_deleted(project_id)
+    removed['project_member'] = _bulk_delete(ProjectMember, ProjectMember.project_id == project_id)
+    removed['project_summary'] = _bulk_delete(ProjectSummary, ProjectSummary.project_id == project_id)
+    removed['rollup'] += _bulk_delete(ProjectDailyRollup, ProjectDailyRollup.project_id == project_id)
+    removed['search'] = search.remove_project(project_id)
+    removed['project'] = _bulk_delete(Project, Project.id == project_id)
+    db.session.commit()
+    return removed
+
 @main_bp.post('/projects/<int:project_id>/delete')
 @login_required
 def delete_project(project_id):
     # only owner can delete
     mem = must_be_project_member(project_id)
     if mem.role != 'owner': abort(403)
-    # Cascade delete: files -> updates/links -> tasks -> members -> project
-    # delete cloud files if keys provided
-    files = TaskFile.query.join(Task, Task.id==TaskFile.task_id)            .filter(Task.project_id==project_id).all()
-    if is_cloudinary_delete_enabled():
-        for f in files:
-            try:
-                if f.public_id:
-                    cloudinary.uploader.destroy(f.public_id, invalidate=True, resource_type="raw")
-            except Exception:
-                pass
-    for f in files: db.session.delete(f)
-
-    updates = TaskUpdate.query.join(Task, Task.id==TaskUpdate.task_id)              .filter(Task.project_id==project_id).all()
-    for urow in updates: db.session.delete(urow)
-
-    links = TaskUpdateLink.query.join(TaskUpdate, TaskUpdate.id==TaskUpdateLink.task_update_id)            .join(Task, Task.id==TaskUpdate.task_id).filter(Task.project_id==project_id).all()
-    for l in links: db.session.delete(l)
-
-    tasks = Task.query.filter_by(project_id=project_id).all()
-    for t in tasks: db.session.delete(t)
-
-    members = ProjectMember.query.filter_by(project_id=project_id).all()
-    for m in members: db.session.delete(m)
-
-    p = Project.query.get_or_404(project_id)
-    db.session.delete(p)
-    db.session.commit()
-    flash("ลบโปรเจกต์และข้อมูลทั้งหมดแล้ว ✓", "ok")
+    Project.query.get_or_404(project_id)
+    removed = purge_project(project_id)
+    forget_membership(project_id)
+    current_app.logger.info("deleted project %s: %s", project_id, removed)
+    flash(f"ลบโปรเจกต์และข้อมูลทั้งหมดแล้ว ✓ (งาน {removed['task']}, อัปเดต {removed['task_update']}, "
+          f"ไฟล์ {removed['task_file']}, ลิงก์ {removed['task_update_link']})", "ok")
     return redirect(url_for('main.projects'))
 
 @main_bp.post('/projects/<int:project_id>/leave')
@@ -128,7 +197,12 @@ def leave_project(project_id):
     if mem.role == 'owner':
         flash("Owner ต้องใช้ปุ่ม 'ลบโปรเจกต์' เท่านั้น", "error")
         return redirect(url_for('main.projects'))
-    db.session.delete(mem); db.session.commit()
+    sync.record(project_id, "member", mem.id, op=sync.DELETE)
+    sync.record(project_id, "project", project_id, op=sync.DELETE, user_id=u.id)
+    db.session.delete(mem); db.session.flush()
+    summary.member_removed(project_id)
+    db.session.commit()
+    forget_membership(project_id, u.id)
     flash("ออกจากโปรเจกต์แล้ว ✓", "ok")
     return redirect(url_for('main.projects'))
 
@@ -137,14 +211,128 @@ def leave_project(project_id):
 def project_detail(project_id):
     mem = must_be_project_member(project_id)
     p = Project.query.get_or_404(project_id)
+    # validator: จำนวน/เวลาแก้ task ล่าสุด + เวอร์ชันสมาชิก (ProjectSummary)
+    n_tasks, tasks_at = db.session.query(func.count(Task.id), func.max(Task.last_updated))         .filter(Task.project_id==p.id).one()
+    sm = db.session.get(ProjectSummary, p.id)
+    summary_at = sm.updated_at if sm else None
+    cached = http_cache.not_modified(mem.role, p.name, n_tasks, tasks_at, summary_at,
+                                     sm.member_count if sm else None,
+                                     last_modified=max(filter(None, (tasks_at, summary_at)), default=None))
+    if cached: return cached
+
     tasks = Task.query.filter_by(project_id=p.id).order_by(Task.last_updated.desc()).all()
     members = ProjectMember.query.filter_by(project_id=p.id).all()
     is_manager = mem.role in ('owner','ba')
     return render_template('project_detail.html',
                            project=p, tasks=tasks, members=members,
+                           names=display_names(m.user_id for m in members),
                            is_manager=is_manager,
                            invite_link=url_for('main.create_invite', project_id=p.id))
 
+@main_bp.get('/projects/<int:project_id>/events')
+@login_required
+def project_events(project_id):
+    must_be_project_member(project_id)
+    return events.stream((f"project:{project_id}",), request.headers.get('Last-Event-ID'))
+
+@main_bp.get('/projects/<int:project_id>/export.<fmt>')
+@login_required
+def export_project(project_id, fmt):
+    must_be_project_member(project_id)
+    if fmt == 'csv':
+        gen, mimetype = transfer.export_csv(project_id), 'text/csv; charset=utf-8'
+    elif fmt == 'json':
+        gen, mimetype = transfer.export_json(project_id), 'application/json'
+    else:
+        abort(404)
+    return Response(stream_with_context(gen), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename="project-{project_id}-tasks.{fmt}"',
+        'X-Accel-Buffering': 'no',
+    })
+
+IMPORT_MAX_BYTES = 10 * 1024 * 1024
+
+@main_bp.post('/projects/<int:project_id>/import')
+@login_required
+def import_tasks(project_id):
+    mem = must_be_project_member(project_id)
+    if mem.role not in ('owner', 'ba'): abort(403)
+    f = request.files.get('file')
+    if not f or not f.filename:
+        flash("กรุณาเลือกไฟล์ CSV", "error")
+        return redirect(url_for('main.project_detail', project_id=project_id))
+    if (request.content_length or 0) > IMPORT_MAX_BYTES:
+        flash("ไฟล์ใหญ่เกิน 10MB", "error")
+        return redirect(url_for('main.project_detail', project_id=project_id))
+    try:
+        result = transfer.import_csv(project_id, current_user().id, f.stream)
+    except (ValueError, UnicodeDecodeError) as e:
+        db.session.rollback()
+        flash(f"อ่านไฟล์ไม่ได้: {e}", "error")
+        return redirect(url_for('main.project_detail', project_id=project_id))
+    flash(f"นำเข้างานแล้ว {result['imported']} งาน" + (f", ข้าม {result['skipped']} แถว" if result['skipped'] else ""),
+          "ok" if result['imported'] else "error")
+    for line, error in result['errors'][:5]:
+        flash(f"บรรทัด {line}: {error}", "error")
+    return redirect(url_for('main.project_detail', project_id=project_id))
+
+BURNUP_MAX_DAYS = 366
+
+@main_bp.get('/projects/<int:project_id>/burnup.json')
+@login_required
+def project_burnup(project_id):
+    # อ่านจาก ProjectDailyRollup อย่างเดียว (ไม่แตะ TaskUpdate)
+    must_be_project_member(project_id)
+    days = max(1, min(BURNUP_MAX_DAYS, request.args.get('days', 90, type=int)))
+    return {"project_id": project_id, "days": rollups.project_series(project_id, days)}
+
+@main_bp.get('/api/sync')
+def sync_changes():
+    # ?since=<token>&project=<id>&limit=&fields[tasks]=id,status -> {token, has_more, tasks: [...], deleted: {...}}
+    # ไม่โหลด User: poll ที่ไม่มีอะไรใหม่ = query ChangeLog เดียว (membership มาจาก cache)
+    uid = session.get('uid')
+    if not uid:
+        return {"error": "login required"}, 401
+    try:
+        since = sync.parse_token(request.args.get('since'))
+        fields = sync.parse_fields(request.args)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    project_id = request.args.get('project', type=int)
+    if project_id is not None and not get_membership(project_id, uid):
+        return {"error": "not a project member"}, 403
+    limit = request.args.get('limit', sync.PAGE_SIZE, type=int)
+    resp = sync.changes(uid, since, project_id=project_id, limit=limit, fields=fields)
+    return resp, 200, {'Cache-Control': 'no-store'}
+
+@main_bp.get('/search')
+@login_required
+def search_page():
+    u = current_user()
+    q = (request.args.get('q') or '').strip()
+    cursor = search.decode_cursor(request.args.get('after'))
+    hits, next_cursor = search.search(u.id, q, cursor) if q else ([], None)
+
+    # เติมชื่องาน/เนื้อหาอัปเดต/ชื่อโปรเจกต์แบบ batch (ไม่ query ทีละแถว)
+    task_ids = {h.task_id for h in hits}
+    update_ids = [h.id // 2 for h in hits if h.kind == 'update']
+    tasks = {t.id: t for t in Task.query.filter(Task.id.in_(task_ids))} if task_ids else {}
+    updates = {x.id: x for x in TaskUpdate.query.filter(TaskUpdate.id.in_(update_ids))} if update_ids else {}
+    if any(t.archived for t in tasks.values()):
+        for upd_id, (task_id, e) in archive.find_updates([i for i in update_ids if i not in updates]).items():
+            updates[upd_id] = archive.to_update(task_id, e)
+    project_names = dict(db.session.query(Project.id, Project.name)
+                         .filter(Project.id.in_({h.project_id for h in hits}))) if hits else {}
+    results = []
+    for h in hits:
+        t = tasks.get(h.task_id)
+        upd = updates.get(h.id // 2) if h.kind == 'update' else None
+        if not t or (h.kind == 'update' and not upd):
+            continue
+        results.append({'kind': h.kind, 'task': t, 'upd': upd,
+                        'project_name': project_names.get(h.project_id, '')})
+    return render_template('search.html', q=q, results=results, next_cursor=next_cursor)
+
 @main_bp.get('/projects/<int:project_id>/invite')
 @login_required
 def create_invite(project_id):
@@ -1,25 +1,24 @@
 # views_tasks.py
 # -*- coding: utf-8 -*-
-import cloudinary, cloudinary.uploader
-from flask import Blueprint, render_template, request, redirect, url_for, flash, abort
+import archive
+import coalesce
+import events
+import http_cache
+import outbox
+import rollups
+import search
+import storage
+import summary
+import sync
+import secrets
+from flask import Blueprint, render_template, request, redirect, url_for, flash, abort, send_file
+from sqlalchemy import or_, and_, update, select, func
 from datetime import datetime
-from models import db, Task, TaskUpdate, TaskFile, TaskUpdateLink, ProjectMember, Task as TaskModel
-from utils import current_user, login_required, must_be_project_member, is_cloudinary_delete_enabled, get_env
+from models import db, Task, TaskUpdate, TaskFile, TaskUpdateLink, ProjectMember, FileUpload, Task as TaskModel
+from utils import current_user, login_required, must_be_project_member, get_membership, get_env, encode_cursor, decode_cursor, display_names
 
 tasks_bp = Blueprint('tasks', __name__)
 
-# --- Cloudinary config (สำหรับลบไฟล์/อ่านค่า) ---
-api_key = get_env("CLOUDINARY_API_KEY")
-api_secret = get_env("CLOUDINARY_API_SECRET")
-cloud_name = get_env("CLOUDINARY_CLOUD_NAME")
-if cloud_name:
-    cloudinary.config(
-        cloud_name=cloud_name,
-        api_key=api_key,
-        api_secret=api_secret,
-        secure=True
-    )
-
 # --- Helper ---
 def _task_and_membership(task_id):
     t = Task.query.get_or_404(task_id)
@@ -49,44 +48,114 @@ def create_task(project_id):
         last_updated=datetime.utcnow()
     )
     db.session.add(t)
+    db.session.flush()
+    summary.task_added(project_id, t.status)
+    rollups.record(t, updates=0)
+    search.index_task(t)
+    sync.record(project_id, "task", t.id)
+    events.task_changed(t, kind="task_created")
     db.session.commit()
     flash("สร้างงานแล้ว ✓", "ok")
     return redirect(url_for('main.project_detail', project_id=project_id))
 
 # --- Task Feed ---
-@tasks_bp.get('/tasks/<int:task_id>')
-@login_required
-def task_feed(task_id):
-    t, mem = _task_and_membership(task_id)
-
-    updates = (
-        TaskUpdate.query
-        .filter_by(task_id=t.id)
-        .order_by(TaskUpdate.created_at.desc())
-        .all()
-    )
-    files = (
-        TaskFile.query
-        .filter_by(task_id=t.id)
-        .order_by(TaskFile.created_at.desc())
+FEED_PAGE_SIZE = 20
+
+def _feed_window(task_id, cursor=None, limit=FEED_PAGE_SIZE, archived=False):
+    # ดึงอัปเดตทีละหน้าแบบ keyset (created_at, id) แล้วโหลดลิงก์/ไฟล์เฉพาะ id ในหน้านี้
+    if archived:
+        return _archived_window(task_id, cursor, limit)
+    q = TaskUpdate.query.filter(TaskUpdate.task_id == task_id)
+    if cursor:
+        ts, rid = cursor
+        q = q.filter(or_(TaskUpdate.created_at < ts,
+                         and_(TaskUpdate.created_at == ts, TaskUpdate.id < rid)))
+    rows = (
+        q.order_by(TaskUpdate.created_at.desc(), TaskUpdate.id.desc())
+        .limit(limit + 1)
         .all()
     )
+    updates = rows[:limit]
+    next_cursor = encode_cursor(updates[-1].created_at, updates[-1].id) if len(rows) > limit else None
 
-    # ลิงก์ต่ออัปเดต
     links_map = {}
+    files_by_update = {}
     if updates:
         ids = [u.id for u in updates]
         for l in TaskUpdateLink.query.filter(TaskUpdateLink.task_update_id.in_(ids)).all():
             links_map.setdefault(l.task_update_id, []).append(l)
+        files = (
+            TaskFile.query
+            .filter(TaskFile.task_update_id.in_(ids))
+            .order_by(TaskFile.created_at.desc())
+            .all()
+        )
+        for f in files:
+            files_by_update.setdefault(f.task_update_id, []).append(f)
 
-    # ไฟล์ต่ออัปเดต (ไว้แสดงใต้โพสต์)
+    return updates, links_map, files_by_update, next_cursor
+
+def _files_for(file_ids_by_update):
+    # {update_id: [file_id]} จาก archive -> {update_id: [TaskFile]} (ไฟล์ยังอยู่ตาราง hot)
+    ids = [fid for fids in file_ids_by_update.values() for fid in fids]
+    if not ids:
+        return {}
+    owner = {fid: uid for uid, fids in file_ids_by_update.items() for fid in fids}
     files_by_update = {}
-    for f in files:
-        if f.task_update_id:
-            files_by_update.setdefault(f.task_update_id, []).append(f)
+    for f in TaskFile.query.filter(TaskFile.id.in_(ids)).order_by(TaskFile.created_at.desc()):
+        files_by_update.setdefault(owner[f.id], []).append(f)
+    return files_by_update
+
+def _archived_window(task_id, cursor, limit):
+    # หน้าเดียวกับ _feed_window แต่อ่านจาก TaskArchive (แตกก้อนครั้งเดียวต่อ request)
+    items, more = archive.page(task_id, cursor, limit)
+    updates = [archive.to_update(task_id, e) for e in items]
+    links_map = {e["id"]: archive.to_links(e) for e in items if e["links"]}
+    files_by_update = _files_for({e["id"]: e["files"] for e in items})
+    next_cursor = encode_cursor(updates[-1].created_at, updates[-1].id) if more else None
+    return updates, links_map, files_by_update, next_cursor
+
+def _update_or_archived(update_id):
+    # (update, links, files) จากตาราง hot หรือจาก archive ของ task ที่เก็บไปแล้ว
+    u = TaskUpdate.query.get(update_id)
+    if u is not None:
+        links = TaskUpdateLink.query.filter_by(task_update_id=u.id).all()
+        files = TaskFile.query.filter_by(task_update_id=u.id).order_by(TaskFile.created_at.desc()).all()
+        return u, links, files
+    found = archive.find_updates([update_id]).get(update_id)
+    if found is None:
+        abort(404)
+    task_id, e = found
+    return archive.to_update(task_id, e), archive.to_links(e), _files_for({e["id"]: e["files"]}).get(e["id"], [])
+
+@tasks_bp.get('/tasks/<int:task_id>')
+@login_required
+def task_feed(task_id):
+    t, mem = _task_and_membership(task_id)
+
+    # validator: เวลาแก้ task + id อัปเดต/ไฟล์ล่าสุด (+จำนวนไฟล์ เผื่อมีการลบ) ใน query เดียว
+    stamp = db.session.query(
+        select(func.max(TaskUpdate.id)).where(TaskUpdate.task_id == t.id).scalar_subquery(),
+        select(func.max(TaskFile.id)).where(TaskFile.task_id == t.id).scalar_subquery(),
+        select(func.count(TaskFile.id)).where(TaskFile.task_id == t.id).scalar_subquery(),
+    ).one()
+    cached = http_cache.not_modified(mem.role, t.title, t.status, t.progress_percent, t.last_updated, *stamp,
+                                     last_modified=t.last_updated)
+    if cached: return cached
+
+    updates, links_map, files_by_update, next_cursor = _feed_window(t.id, archived=t.archived)
 
     # ไฟล์ที่ยังไม่ผูกกับโพสต์ (เผื่อแสดง/ย้ายในหน้า)
-    loose_files = [f for f in files if not f.task_update_id]
+    loose_files = (
+        TaskFile.query
+        .filter(TaskFile.task_id == t.id, TaskFile.task_update_id.is_(None))
+        .order_by(TaskFile.created_at.desc())
+        .all()
+    )
+    if t.archived:
+        # ไฟล์ของโพสต์ที่ archive แล้วไม่ใช่ไฟล์ลอย
+        in_archive = archive.archived_file_ids(t.id)
+        loose_files = [f for f in loose_files if f.id not in in_archive]
 
     is_manager = mem.role in ("owner", "ba")
 
@@ -94,15 +163,35 @@ def task_feed(task_id):
         'task_feed.html',
         task=t,
         updates=updates,
-        files=files,                  # รวมทั้งงาน (เผื่อใช้ที่อื่น)
         links_map=links_map,
         files_by_update=files_by_update,
+        names=display_names(u.author_id for u in updates),
         loose_files=loose_files,      # <- เพิ่มให้ template ใช้ได้
+        next_cursor=next_cursor,
         is_manager=is_manager,
-        cloudinary_cloud_name=get_env("CLOUDINARY_CLOUD_NAME"),
-        cloudinary_upload_preset=get_env("CLOUDINARY_UPLOAD_PRESET"),
+        upload_chunk_bytes=storage.CHUNK_MAX_BYTES,
     )
 
+# --- Older updates (โหลดเพิ่มตอนเลื่อนลง) ---
+@tasks_bp.get('/tasks/<int:task_id>/updates')
+@login_required
+def task_feed_page(task_id):
+    t, _mem = _task_and_membership(task_id)
+    cursor = decode_cursor(request.args.get('before'))
+    if request.args.get('before') and not cursor:
+        return {"error": "bad cursor"}, 400
+
+    updates, links_map, files_by_update, next_cursor = _feed_window(t.id, cursor, archived=t.archived)
+    html = render_template(
+        '_feed_updates.html',
+        task=t,
+        updates=updates,
+        links_map=links_map,
+        files_by_update=files_by_update,
+        names=display_names(u.author_id for u in updates),
+    )
+    return {"html": html, "next_cursor": next_cursor, "count": len(updates)}
+
 # --- Create Update ---
 @tasks_bp.post('/tasks/<int:task_id>/updates')
 @login_required
@@ -118,7 +207,9 @@ def create_update(task_id):
         flash("กรุณาเขียนรายละเอียดอัปเดต", "error")
         return redirect(url_for('tasks.task_feed', task_id=t.id))
 
+    archive.ensure_hot(t)
     upd = TaskUpdate(task_id=t.id, author_id=u.id, content=content)
+    old_status, old_progress = t.status, t.progress_percent
 
     # อนุญาตเฉพาะ owner/ba ในการปรับ %/สถานะ
     if mem.role in ("owner", "ba"):
@@ -136,6 +227,9 @@ def create_update(task_id):
     t.last_updated = datetime.utcnow()
     db.session.add(upd)
     db.session.flush()  # ต้องได้ upd.id เพื่อผูกลิงก์
+    summary.task_status_changed(t.project_id, old_status, t.status)
+    summary.task_progress_changed(t.project_id, old_progress, t.progress_percent)
+    rollups.record(t)
 
     # แนบลิงก์ (หนึ่งบรรทัดต่อ 1 ลิงก์)
     for line in links_text.splitlines():
@@ -143,15 +237,130 @@ def create_update(task_id):
         if url and (url.startswith("http://") or url.startswith("https://")):
             db.session.add(TaskUpdateLink(task_update_id=upd.id, url=url))
 
+    search.index_update(upd, t.project_id)
+    sync.record(t.project_id, "task", t.id)
+    sync.record(t.project_id, "update", upd.id)
+    events.task_changed(t)
+    events.update_changed(t.id, upd.id)
     db.session.commit()
     flash("โพสต์อัปเดตแล้ว ✓", "ok")
     return redirect(url_for('tasks.task_feed', task_id=t.id))
 
-# --- Register uploaded file (ถูกเรียกหลังอัปโหลด Cloudinary สำเร็จ) ---
+# --- Resumable upload (ผ่าน server -> storage) ---
+# POST /tasks/<id>/uploads            เริ่ม: file_name, size_bytes, task_update_id -> {upload_id, offset, chunk_size}
+# PATCH /uploads/<upload_id>          ส่งก้อนถัดไป: header Upload-Offset + body เป็น bytes ล้วน
+# HEAD /uploads/<upload_id>           ถามว่าได้ถึงไหนแล้ว (header Upload-Offset) เพื่อส่งต่อหลังหลุด
+@tasks_bp.post('/tasks/<int:task_id>/uploads')
+@login_required
+def start_upload(task_id):
+    t, _mem = _task_and_membership(task_id)
+    file_name = (request.form.get('file_name') or '').strip()[:255]
+    try:
+        size = int(request.form.get('size_bytes') or 0)
+        task_update_id = int(request.form.get('task_update_id') or 0) or None
+    except ValueError:
+        return {"error": "invalid fields"}, 400
+    if not file_name or size <= 0:
+        return {"error": "missing fields"}, 400
+    if storage.file_ext(file_name) not in storage.FILE_TYPES:
+        return {"error": "unsupported file type"}, 400
+    if size > storage.MAX_FILE_BYTES:
+        return {"error": "file too large"}, 400
+    if task_update_id:
+        archive.ensure_hot(t)
+        if not TaskUpdate.query.filter_by(id=task_update_id, task_id=t.id).first():
+            return {"error": "update not found"}, 404
+    up = FileUpload(id=secrets.token_hex(16), task_id=t.id, task_update_id=task_update_id,
+                    user_id=current_user().id, file_name=file_name, size_bytes=size)
+    db.session.add(up)
+    db.session.commit()
+    return {"upload_id": up.id, "offset": 0, "chunk_size": storage.CHUNK_MAX_BYTES}, 201
+
+def _own_upload(upload_id):
+    up = FileUpload.query.get_or_404(upload_id)
+    if up.user_id != current_user().id:
+        abort(404)
+    must_be_project_member(Task.query.get_or_404(up.task_id).project_id)
+    return up
+
+@tasks_bp.route('/uploads/<upload_id>', methods=['HEAD'])
+@login_required
+def upload_status(upload_id):
+    up = _own_upload(upload_id)
+    return "", 200, {"Upload-Offset": str(storage.staged_size(up.id)), "Upload-Length": str(up.size_bytes),
+                     "Cache-Control": "no-store"}
+
+@tasks_bp.route('/uploads/<upload_id>', methods=['PATCH'])
+@login_required
+def upload_chunk(upload_id):
+    up = _own_upload(upload_id)
+    current = storage.staged_size(up.id)
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+    except ValueError:
+        return {"error": "missing Upload-Offset"}, 400
+    if offset != current:
+        # ก้อนซ้ำ/ข้าม: บอก offset จริงให้ client ส่งต่อจากตรงนั้น
+        return {"error": "offset mismatch", "offset": current}, 409
+    if (request.content_length or 0) > storage.CHUNK_MAX_BYTES:
+        return {"error": "chunk too large", "offset": current}, 413
+    try:
+        received = storage.append_chunk(up.id, offset, request.stream, up.size_bytes)
+    except ValueError:
+        return {"error": "upload exceeds declared size", "offset": current}, 413
+    up.received_bytes = received
+    up.updated_at = datetime.utcnow()
+    if received < up.size_bytes:
+        db.session.commit()
+        return {"offset": received}
+
+    # ครบแล้ว: ตรวจชนิดจากเนื้อไฟล์จริง -> ย้ายเข้า storage -> สร้าง TaskFile
+    staged = storage.staging_path(up.id)
+    content_type = storage.sniff(staged, up.file_name)
+    if content_type is None:
+        storage.discard(up.id)
+        db.session.delete(up)
+        db.session.commit()
+        return {"error": "file content does not match its type"}, 400
+    b = storage.backend()
+    key = f"tasks/{up.task_id}/{up.id}{storage.file_ext(up.file_name)}"
+    public_id, secure_url = b.save(staged, key, content_type)
+    tf = TaskFile(task_id=up.task_id, task_update_id=up.task_update_id, file_name=up.file_name,
+                  content_type=content_type, size_bytes=received, provider=b.name,
+                  public_id=public_id, secure_url=secure_url)
+    db.session.add(tf)
+    db.session.delete(up)
+    db.session.flush()
+    sync.record(Task.query.get(up.task_id).project_id, "file", tf.id)
+    if tf.task_update_id:
+        events.update_changed(up.task_id, tf.task_update_id)
+    db.session.commit()
+    return {"ok": True, "offset": received, "file_id": tf.id}
+
+# --- Download (Range / X-Sendfile สำหรับไฟล์ local; provider อื่น redirect ไป URL ของมัน) ---
+@tasks_bp.get('/files/<int:file_id>')
+@login_required
+def download_file(file_id):
+    f = TaskFile.query.get_or_404(file_id)
+    must_be_project_member(Task.query.get_or_404(f.task_id).project_id)
+    b = storage.backend(f.provider)
+    path = b.path(f.public_id) if b and f.public_id else None
+    if path is None:
+        url = (b.url(f) if b else None) or f.secure_url
+        if not url:
+            abort(404)
+        return redirect(url)
+    inline = (f.content_type or '').startswith('image/') or f.content_type == 'application/pdf'
+    resp = send_file(path, mimetype=f.content_type or None, as_attachment=not inline,
+                     download_name=f.file_name, conditional=True, etag=True)
+    resp.headers['Cache-Control'] = 'private, max-age=3600'
+    return resp
+
+# --- Register uploaded file (legacy: browser อัปโหลดตรงไป Cloudinary แล้วค่อยแจ้ง) ---
 @tasks_bp.post('/tasks/<int:task_id>/files/register')
 @login_required
 def register_uploaded_file(task_id):
-    _t, _mem = _task_and_membership(task_id)
+    t, _mem = _task_and_membership(task_id)
 
     file_name = request.form.get('file_name')
     content_type = request.form.get('content_type')
@@ -160,13 +369,19 @@ def register_uploaded_file(task_id):
     secure_url = request.form.get('secure_url')
     task_update_id = request.form.get('task_update_id')  # optional
 
-    allowed_exts = ('.png', '.jpg', '.jpeg', '.pdf', '.docx', '.xlsx')
     if not (file_name and secure_url):
         return {"error": "missing fields"}, 400
-    if not file_name.lower().endswith(allowed_exts):
+    if storage.file_ext(file_name) not in storage.FILE_TYPES:
         return {"error": "unsupported file type"}, 400
-    if size_bytes > 10 * 1024 * 1024:
+    if size_bytes > storage.MAX_FILE_BYTES:
         return {"error": "file too large"}, 400
+    # ต้องเป็นไฟล์ใน cloud ของเราเอง และ public_id ตรงกับ URL (ไม่รับลิงก์ภายนอกมาแอบอ้าง)
+    cloud = get_env("CLOUDINARY_CLOUD_NAME")
+    if not (cloud and public_id and secure_url.startswith(f"https://res.cloudinary.com/{cloud}/")
+            and public_id in secure_url):
+        return {"error": "invalid file reference"}, 400
+    if task_update_id:
+        archive.ensure_hot(t)
 
     tf = TaskFile(
         task_id=task_id,
@@ -179,6 +394,10 @@ def register_uploaded_file(task_id):
         secure_url=secure_url
     )
     db.session.add(tf)
+    db.session.flush()
+    sync.record(t.project_id, "file", tf.id)
+    if tf.task_update_id:
+        events.update_changed(task_id, tf.task_update_id)
     db.session.commit()
     return {"ok": True, "file_id": tf.id}
 
@@ -196,13 +415,14 @@ def delete_file(task_id, file_id):
         flash("คุณไม่มีสิทธิ์ลบไฟล์นี้", "error")
         return redirect(url_for('tasks.task_feed', task_id=t.id))
 
-    if is_cloudinary_delete_enabled() and f.public_id:
-        try:
-            cloudinary.uploader.destroy(f.public_id, invalidate=True, resource_type="raw")
-        except Exception:
-            # ไม่ให้ error จาก Cloudinary ทำให้ flow ล่ม
-            pass
+    # ลบไฟล์จริงใน storage ทีหลังผ่าน outbox (อยู่ transaction เดียวกับการลบแถว)
+    b = storage.backend(f.provider)
+    if f.public_id and b and b.can_delete():
+        outbox.enqueue([f.public_id], provider=b.name)
 
+    if f.task_update_id:
+        events.update_changed(t.id, f.task_update_id)
+    sync.record(t.project_id, "file", f.id, op=sync.DELETE)
     db.session.delete(f)
     db.session.commit()
     flash("ลบไฟล์แล้ว ✓", "ok")
@@ -218,14 +438,19 @@ def change_status(task_id):
 
     status = request.form.get('status')
     if status in ("todo", "doing", "done", "blocked"):
+        archive.ensure_hot(t)
+        old_status = t.status
         t.status = status
         t.last_updated = datetime.utcnow()
-        db.session.add(TaskUpdate(
-            task_id=t.id,
-            author_id=current_user().id,
-            content=f"เปลี่ยนสถานะเป็น {status}",
-            status=status
-        ))
+        # กดเปลี่ยนรัว ๆ: แก้แถวอัตโนมัติล่าสุดแทนการเพิ่มแถว (coalesce.py)
+        upd, merged = coalesce.write(t, current_user().id, status=status, now=t.last_updated)
+        summary.task_status_changed(t.project_id, old_status, status)
+        rollups.record(t, updates=0 if merged else 1)
+        sync.record(t.project_id, "task", t.id)
+        sync.record(t.project_id, "update", upd.id)
+        search.index_update(upd, t.project_id)
+        events.task_changed(t)
+        events.update_changed(t.id, upd.id)  # แถวที่ถูกรวม: client แทนการ์ดเดิมด้วย id เดียวกัน
         db.session.commit()
         flash("อัปเดตสถานะแล้ว ✓", "ok")
 
@@ -244,25 +469,173 @@ def change_progress(task_id):
     except Exception:
         pv = t.progress_percent
 
+    archive.ensure_hot(t)
+    old_progress = t.progress_percent
     t.progress_percent = pv
     t.last_updated = datetime.utcnow()
-    db.session.add(TaskUpdate(
-        task_id=t.id,
-        author_id=current_user().id,
-        content=f"อัปเดตความคืบหน้าเป็น {pv}%",
-        progress_percent=pv
-    ))
+    upd, merged = coalesce.write(t, current_user().id, progress=pv, now=t.last_updated)
+    summary.task_progress_changed(t.project_id, old_progress, pv)
+    rollups.record(t, updates=0 if merged else 1)
+    sync.record(t.project_id, "task", t.id)
+    sync.record(t.project_id, "update", upd.id)
+    search.index_update(upd, t.project_id)
+    events.task_changed(t)
+    events.update_changed(t.id, upd.id)
     db.session.commit()
     flash("อัปเดตเปอร์เซ็นต์แล้ว ✓", "ok")
     return redirect(url_for('tasks.task_feed', task_id=t.id))
 
+# --- Bulk status/progress (หลาย task ในคำขอเดียว) ---
+BULK_MAX_TASKS = 500
+
+def _parse_bulk_items(payload):
+    # [{"id": 1, "status": "done", "progress": 80}, ...] -> {task_id: (status|None, progress|None)}
+    items = {}
+    for raw in (payload or {}).get('tasks') or []:
+        try:
+            tid = int(raw.get('id'))
+        except (TypeError, ValueError, AttributeError):
+            return None
+        status = raw.get('status') or None
+        if status is not None and status not in summary.TASK_STATUSES:
+            return None
+        prog = raw.get('progress')
+        if prog in (None, ""):
+            prog = None
+        else:
+            try:
+                prog = max(0, min(100, int(prog)))
+            except (TypeError, ValueError):
+                return None
+        items[tid] = (status, prog)
+    return items
+
+@tasks_bp.post('/tasks/bulk')
+@login_required
+def bulk_update_tasks():
+    items = _parse_bulk_items(request.get_json(silent=True))
+    if items is None:
+        return {"error": "invalid payload"}, 400
+    if not items:
+        return {"ok": True, "updated": 0}
+    if len(items) > BULK_MAX_TASKS:
+        return {"error": f"too many tasks (max {BULK_MAX_TASKS})"}, 400
+
+    tasks = Task.query.filter(Task.id.in_(list(items))).all()
+    if len(tasks) != len(items):
+        return {"error": "task not found"}, 404
+
+    # ตรวจสิทธิ์ครั้งเดียวต่อโปรเจกต์ (ต้องเป็น owner/ba ทุกโปรเจกต์ ไม่งั้นไม่ทำเลย)
+    u = current_user()
+    for pid in {t.project_id for t in tasks}:
+        mem = get_membership(pid, u.id)
+        if not mem or mem.role not in ("owner", "ba"):
+            abort(403)
+
+    now = datetime.utcnow()
+    task_rows, audit_rows, status_changes, progress_deltas = [], [], {}, {}
+    for t in tasks:
+        status, prog = items[t.id]
+        new_status = status if status and status != t.status else None
+        new_prog = prog if prog is not None and prog != t.progress_percent else None
+        if new_status is None and new_prog is None:
+            continue
+        archive.ensure_hot(t)
+        if new_status is not None:
+            status_changes.setdefault(t.project_id, []).append((t.status, new_status))
+        if new_prog is not None:
+            progress_deltas[t.project_id] = progress_deltas.get(t.project_id, 0) + new_prog - (t.progress_percent or 0)
+        # คีย์ครบทุกแถวเพื่อให้เป็น executemany ก้อนเดียว
+        task_rows.append({
+            "id": t.id,
+            "status": new_status or t.status,
+            "progress_percent": t.progress_percent if new_prog is None else new_prog,
+            "last_updated": now,
+        })
+        audit_rows.append({
+            "task_id": t.id,
+            "author_id": u.id,
+            "content": coalesce.content_for(new_status, new_prog),
+            "status": new_status,
+            "progress_percent": new_prog,
+            "created_at": now,
+        })
+
+    if task_rows:
+        # executemany ทั้งคู่ ใน transaction เดียว
+        db.session.execute(update(Task), task_rows)
+        # RETURNING ไม่ขอเรียงตามพารามิเตอร์ (SQLite ไม่มี sentinel -> จะแตกเป็นทีละแถว); จับคู่ด้วย task_id แทน
+        # (หนึ่ง task ต่อหนึ่งแถวอยู่แล้ว)
+        tu = TaskUpdate.__table__
+        audit_ids = {tid: uid for uid, tid in
+                     db.session.execute(tu.insert().returning(tu.c.id, tu.c.task_id), audit_rows).all()}
+        for pid in set(status_changes) | set(progress_deltas):
+            summary.task_statuses_changed(pid, status_changes.get(pid, []), progress_deltas.get(pid, 0))
+        project_of = {t.id: t.project_id for t in tasks}
+        rollups.record_tasks([(r["id"], project_of[r["id"]], r["status"], r["progress_percent"], 1)
+                              for r in task_rows], ts=now)
+        for pid in {project_of[r["id"]] for r in task_rows}:
+            sync.record(pid, "task", [r["id"] for r in task_rows if project_of[r["id"]] == pid])
+            sync.record(pid, "update", [audit_ids[r["task_id"]] for r in audit_rows
+                                        if project_of[r["task_id"]] == pid])
+        search.index_updates([(audit_ids[r["task_id"]], project_of[r["task_id"]], r["task_id"], r["content"])
+                              for r in audit_rows])
+        events.tasks_changed(task_rows, project_of)
+        for tid, upd_id in audit_ids.items():
+            events.update_changed(tid, upd_id)
+        db.session.commit()
+    return {"ok": True, "updated": len(task_rows)}
+
+# --- Progress history (จาก TaskDailyRollup) ---
+@tasks_bp.get('/tasks/<int:task_id>/progress.json')
+@login_required
+def task_progress_history(task_id):
+    t, _mem = _task_and_membership(task_id)
+    days = max(1, min(366, request.args.get('days', 90, type=int)))
+    return {"task_id": t.id, "days": rollups.task_series(t.id, days)}
+
+# --- Live events (SSE) ---
+@tasks_bp.get('/tasks/<int:task_id>/events')
+@login_required
+def task_events(task_id):
+    t, _mem = _task_and_membership(task_id)
+    return events.stream((f"task:{t.id}",), request.headers.get('Last-Event-ID'))
+
+# --- การ์ดอัปเดตเดียว (ให้หน้า feed ดึงมาแทน/แทรกเมื่อมี event) ---
+@tasks_bp.get('/updates/<int:update_id>/card')
+@login_required
+def update_card(update_id):
+    u, links, files = _update_or_archived(update_id)
+    t = Task.query.get_or_404(u.task_id)
+    must_be_project_member(t.project_id)
+    return render_template('_feed_updates.html', task=t, updates=[u],
+                           links_map={u.id: links}, files_by_update={u.id: files},
+                           names=display_names((u.author_id,)))
+
 # --- Update detail ---
 @tasks_bp.get('/updates/<int:update_id>')
 @login_required
 def update_detail(update_id):
-    u = TaskUpdate.query.get_or_404(update_id)
+    u = TaskUpdate.query.get(update_id)
+    if u is None:
+        # task ที่ archive แล้ว: อ่านจากก้อนบีบอัด
+        u, links, files = _update_or_archived(update_id)
+        must_be_project_member(TaskModel.query.get_or_404(u.task_id).project_id)
+        cached = http_cache.not_modified(u.id, u.content, u.status, u.progress_percent,
+                                         len(links), max((f.id for f in files), default=None), len(files))
+        if cached: return cached
+        return render_template('update_detail.html', update=u, links=links, files=files,
+                               names=display_names((u.author_id,)))
     task = TaskModel.query.get_or_404(u.task_id)
     must_be_project_member(task.project_id)
+    stamp = db.session.query(
+        select(func.count(TaskUpdateLink.id)).where(TaskUpdateLink.task_update_id == u.id).scalar_subquery(),
+        select(func.max(TaskFile.id)).where(TaskFile.task_update_id == u.id).scalar_subquery(),
+        select(func.count(TaskFile.id)).where(TaskFile.task_update_id == u.id).scalar_subquery(),
+    ).one()
+    cached = http_cache.not_modified(u.id, u.content, u.status, u.progress_percent, *stamp)
+    if cached: return cached
     links = TaskUpdateLink.query.filter_by(task_update_id=u.id).all()
     files = TaskFile.query.filter_by(task_update_id=u.id).all()
-    return render_template('update_detail.html', update=u, links=links, files=files)
+    return render_template('update_detail.html', update=u, links=links, files=files,
+                           names=display_names((u.author_id,)))